@@ -0,0 +1,5 @@
+import sys
+
+from auditrevenue.cli import main
+
+sys.exit(main())
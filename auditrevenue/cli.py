@@ -0,0 +1,486 @@
+"""
+Kommandozeile für Gegenkontoanalyse und Arbeitspapier zur Umsatzanalyse.
+
+    python -m auditrevenue network  --journal data/Musterjournal.xlsx --output data/graph.html
+    python -m auditrevenue worksheet --vorjahr vj.xlsx --berichtsjahr bj.xlsx \\
+        --mapping data/Mustermapping.xlsx --output data/Umsatzanalyse.xlsx
+
+Zwischenstände (eingelesenes und aufbereitetes Journal, Aggregat, Kategorien)
+werden im Arbeitsverzeichnis ``--workdir`` abgelegt, geschlüsselt über den
+Inhalt der Eingabedateien und die Parameter. Ein erneuter Lauf setzt bei der
+ersten Stufe ohne gültigen Zwischenstand auf; nach Änderung von ``--schwelle``
+wird der abgelegte Graph nur umgefärbt und neu gezeichnet.
+"""
+
+import argparse
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from instrumentation.run_report import profiled_run, stage
+from revenue_worksheet.build import TEMPLATE_PATH
+from revenue_worksheet.intermediates import hash_file, hash_parts, is_cached, load_or_compute
+
+__all__ = ["main", "read_journal", "run_network", "run_worksheet", "EXCEL_ENGINES", "NETWORK_STAGES"]
+
+
+# Spalten und Datentypen wie im Musterjournal
+DEFAULT_COLUMNS = {
+    "kto_nr":     ("KONTO_NR", "string"),
+    "kto_name":   ("KONTO_BEZ", "string"),
+    "gkto_nr":    ("GKTO_NR", "string"),
+    "gkto_name":  ("GKTO_BEZ", "string"),
+    "soll":       ("SOLL", "float32"),
+    "haben":      ("HABEN", "float32"),
+    "saldo":      ("SALDO_S_H", "float32"),
+    "journal_nr": ("JOURNAL_NR", "string"),
+    "datum":      ("BELEG_DAT", "string"),
+}
+
+NETWORK_STAGES = ["load", "prepare", "aggregate", "categorize", "graph", "render"]
+
+
+# "auto": calamine (python-calamine, in Rust), sonst openpyxl
+EXCEL_ENGINES = ("auto", "calamine", "openpyxl")
+
+
+def _read_excel(path: Path, columns: dict, engine: str) -> pd.DataFrame:
+    """
+    Liest nur die gegebenen Spalten und wandelt sie beim Einlesen in die
+    Datentypen um. ``engine="auto"`` versucht calamine und fällt auf openpyxl
+    zurück, wenn python-calamine fehlt oder die Datei nicht lesen kann.
+    """
+    if engine not in EXCEL_ENGINES:
+        raise ValueError(f"Unbekannte Excel-Engine '{engine}', erlaubt: {', '.join(EXCEL_ENGINES)}")
+    if engine != "openpyxl":
+        try:
+            import python_calamine  # noqa: F401
+        except ImportError:
+            if engine == "calamine":
+                raise ImportError("Die Excel-Engine calamine benötigt python-calamine (pip install python-calamine).")
+        else:
+            try:
+                return pd.read_excel(path, usecols=list(columns), dtype=columns, engine="calamine")
+            except Exception as exc:
+                if engine == "calamine":
+                    raise
+                print(f"{path.name}: calamine fehlgeschlagen ({exc}), lese mit openpyxl.")
+    return pd.read_excel(path, usecols=list(columns), dtype=columns, engine="openpyxl")
+
+
+def read_journal(path, columns: dict, engine: str = "auto") -> pd.DataFrame:
+    """Liest einen Journalexport (xlsx, csv oder parquet) mit den gegebenen Spalten und Datentypen.
+    ``engine`` wählt den Excel-Leser (siehe ``EXCEL_ENGINES``)."""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix in {".xlsx", ".xlsm"}:
+        return _read_excel(path, columns, engine)
+    if suffix == ".csv":
+        return pd.read_csv(path, usecols=list(columns), dtype=columns)
+    if suffix in {".parquet", ".pq"}:
+        return pd.read_parquet(path, columns=list(columns)).astype(columns)
+    raise ValueError(f"Nicht unterstütztes Dateiformat: {path.suffix}")
+
+
+def _journal_key(path, columns: dict) -> str:
+    # ohne Engine: calamine und openpyxl liefern dasselbe Journal
+    return hash_parts(hash_file(path), sorted(columns.items()))
+
+
+def _load_journals(paths: dict, columns: dict, workdir, refresh: bool = False, engine: str = "auto",
+                   max_workers: Optional[int] = None) -> dict:
+    """
+    Liest mehrere Journale (``{name: pfad}``, Pfad ``None`` wird übersprungen)
+    mit Zwischenstand im ``workdir`` (Schlüssel aus Dateiinhalt und Spalten).
+    Journale ohne Zwischenstand werden gleichzeitig in eigenen Prozessen
+    eingelesen, da das Parsen der xlsx-Dateien den GIL hält.
+    """
+    keys = {name: _journal_key(path, columns) for name, path in paths.items() if path is not None}
+    lesen = [name for name, key in keys.items() if refresh or not is_cached(workdir, "journal", key)]
+    parallel = len(lesen) > 1 and max_workers != 1
+    journals = {}
+    with stage("load_journals") as s:
+        if parallel:
+            with ProcessPoolExecutor(max_workers=min(len(lesen), max_workers or len(lesen))) as pool:
+                futures = {name: pool.submit(read_journal, paths[name], columns, engine) for name in lesen}
+                journals = {name: future.result() for name, future in futures.items()}
+        for name, key in keys.items():
+            if name in journals:
+                df = journals[name]
+                journals[name] = load_or_compute(workdir, "journal", key, lambda: df, refresh=True)
+            else:
+                journals[name] = load_or_compute(
+                    workdir, "journal", key, lambda: read_journal(paths[name], columns, engine), refresh
+                )
+        s.rows_out = sum(len(df) for df in journals.values())
+        s.extra["parallel"] = len(lesen) if parallel else 1
+    return {name: journals[name] for name in keys}
+
+
+def run_network(
+    journal_path,
+    output_path,
+    cols: dict,
+    workdir=None,
+    schwelle: float = 15000,
+    rerun_from: Optional[str] = None,
+    until: str = "render",
+    run_report_path=None,
+    kategorisierer=None,
+    periode: Optional[str] = None,
+    analytics: bool = False,
+    div_modus: str = "fehler",
+    excel_engine: str = "auto",
+    renderer: str = "pyvis",
+    max_gegenkonten: Optional[int] = 20,
+    drilldown: bool = True,
+    max_workers: Optional[int] = None,
+) -> Optional[pd.DataFrame]:
+    """
+    Gegenkontoanalyse in Stufen mit Zwischenständen im ``workdir``.
+
+    ``rerun_from`` berechnet ab dieser Stufe neu (ignoriert vorhandene
+    Zwischenstände), ``until`` bricht nach dieser Stufe ab. Mit ``periode``
+    ("M" oder "Q") wird zusätzlich der Periodenwürfel gebildet und der Graph
+    erhält einen Schieberegler über die Perioden. ``analytics`` ergänzt
+    Netzwerkkennzahlen und Risikohinweise. ``div_modus`` "proportional" teilt
+    Buchungssätze mit mehreren Div-Zeilen anteilig auf. ``excel_engine`` wählt
+    den Leser für xlsx-Journale, ``renderer`` ("pyvis" oder "webgl") das
+    Zeichnen des Graphen. Tooltips nennen die ``max_gegenkonten`` größten
+    Gegenkonten je Seite; mit ``drilldown`` wird je Konto eine Seite mit allen
+    Gegenkonten neben ``output_path`` geschrieben (mit ``max_workers``
+    Prozessen). Gibt das kategorisierte Aggregat zurück, sofern es berechnet
+    wurde.
+    """
+    from network_analysis.aggregate_journal import (
+        get_nodes_and_edges_by_aggregating_journal,
+        get_nodes_and_edges_from_period_cube,
+    )
+    from network_analysis.categorize_kto import categorize_kto
+    from network_analysis.generate_kto_rahmen import generate_kto_rahmen
+    from network_analysis.generate_network import build_network, get_network_graph
+    from network_analysis.period_cube import get_period_cube
+    from network_analysis.prepare_journal import prepare_journal
+
+    refresh_ab = NETWORK_STAGES.index(rerun_from) if rerun_from else len(NETWORK_STAGES)
+    refresh = {name: i >= refresh_ab for i, name in enumerate(NETWORK_STAGES)}
+    stop = NETWORK_STAGES.index(until)
+    journal_cols = ["kto_nr", "kto_name", "gkto_nr", "gkto_name", "soll", "haben", "saldo", "journal_nr"]
+    args = [cols[c][0] for c in journal_cols]
+    kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, _ = args
+    datum = None
+    if periode is not None:
+        journal_cols = journal_cols + ["datum"]
+        datum = cols["datum"][0]
+    columns = dict(cols[c] for c in journal_cols)
+
+    # Schlüssel aller Stufen vorab (ohne Daten), geladen wird nur, was tatsächlich gebraucht wird
+    key = _journal_key(journal_path, columns)
+    journal = _Checkpoint(workdir, "journal", key, lambda: read_journal(journal_path, columns, excel_engine),
+                          refresh["load"], "load_journal")
+    key = hash_parts(key, "prepare", args, periode, div_modus)
+    prepared = _Checkpoint(
+        workdir, "prepared", key,
+        lambda: prepare_journal(journal.get().copy(), *args, datum=datum, periode=periode or "M", div_modus=div_modus),
+        refresh["prepare"], "prepare_journal",
+    )
+    key = hash_parts(key, "aggregate")
+    cube = _Checkpoint(
+        workdir, "cube", key,
+        lambda: get_period_cube(prepared.get(), kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo),
+        refresh["aggregate"], "period_cube",
+    )
+    if periode is not None:
+        # mit Perioden ist das Aggregat die Summe des Würfels über alle Perioden
+        aggregate = _Checkpoint(
+            workdir, "aggregate", key,
+            lambda: get_nodes_and_edges_from_period_cube(cube.get(), *args[:7]),
+            refresh["aggregate"],
+        )
+    else:
+        aggregate = _Checkpoint(
+            workdir, "aggregate", key,
+            lambda: get_nodes_and_edges_by_aggregating_journal(prepared.get(), *args[:7]),
+            refresh["aggregate"],
+        )
+    key = hash_parts(key, "categorize", _get_kategorisierer_key(kategorisierer, workdir))
+
+    def _categorize():
+        agg = aggregate.get()
+        kto_rahmen = generate_kto_rahmen(agg, kto_nr, kto_name)
+        return categorize_kto(
+            kto_rahmen, kto_nr, kto_name,
+            agg, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo,
+            kategorisierer=kategorisierer,
+        )
+
+    categorized = _Checkpoint(workdir, "categorized", key, _categorize, refresh["categorize"], "categorize_kto")
+    # Kontenseiten hängen nur vom kategorisierten Aggregat ab, nicht von der Schwelle
+    drilldown_key = None if workdir is None or refresh["categorize"] else hash_parts(key, "drilldown")
+    # Graph ohne Schwelle, eine neue Schwelle färbt ihn beim Zeichnen nur um
+    key = hash_parts(key, "graph", max_gegenkonten)
+    graph = _Checkpoint(
+        workdir, "graph", key,
+        lambda: get_network_graph(categorized.get(), *args[:7], "kto_kategorie", max_gegenkonten=max_gegenkonten),
+        refresh["graph"],
+    )
+
+    with profiled_run(run_report_path):
+        if until != "render":
+            stufen = {"load": journal, "prepare": prepared, "aggregate": aggregate, "categorize": categorized,
+                      "graph": graph}
+            stufen[until].ensure()
+            if periode is not None and stop >= NETWORK_STAGES.index("aggregate"):
+                cube.ensure()
+            if stop < NETWORK_STAGES.index("categorize"):
+                return None
+            return categorized.get()
+
+        build_network(
+            categorized.get(), kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo,
+            "kto_kategorie", str(output_path), schwelle, cube=cube.get() if periode is not None else None,
+            analytics=analytics, renderer=renderer, G=graph.get(),
+            max_gegenkonten=max_gegenkonten, drilldown=drilldown, max_workers=max_workers,
+            drilldown_key=drilldown_key,
+        )
+    return categorized.get()
+
+
+class _Checkpoint:
+    """
+    Zwischenstand ``name`` einer Stufe von ``run_network`` (siehe ``load_or_compute``),
+    erst bei Bedarf aus dem ``workdir`` geladen bzw. mit ``compute`` berechnet.
+    ``compute`` holt sich die vorhergehenden Stufen selbst, ältere Zwischenstände
+    werden also nur gelesen, wenn eine spätere Stufe fehlt.
+    """
+
+    def __init__(self, workdir, name: str, key: str, compute, refresh: bool = False,
+                 stage_name: Optional[str] = None):
+        self.workdir = workdir
+        self.name = name
+        self.key = key
+        self.compute = compute
+        self.refresh = refresh
+        self.stage_name = stage_name
+        self._value = None
+        self._loaded = False
+
+    def ensure(self) -> None:
+        """Stellt sicher, dass der Zwischenstand vorliegt, ohne einen vorhandenen zu laden."""
+        if self.refresh or not is_cached(self.workdir, self.name, self.key):
+            self.get()
+
+    def get(self):
+        if not self._loaded:
+            if self.stage_name is None:
+                self._value = load_or_compute(self.workdir, self.name, self.key, self.compute, self.refresh)
+            else:
+                with stage(self.stage_name) as s:
+                    self._value = load_or_compute(self.workdir, self.name, self.key, self.compute, self.refresh)
+                    s.rows_out = len(self._value)
+            self._loaded = True
+        return self._value
+
+
+def _get_kategorisierer_key(kategorisierer, workdir) -> Optional[str]:
+    """Schlüssel des Kategorisierers für die Zwischenstände: Modul und qualifizierter Name."""
+    if kategorisierer is None:
+        return None
+    modul = getattr(kategorisierer, "__module__", type(kategorisierer).__module__)
+    name = getattr(kategorisierer, "__qualname__", type(kategorisierer).__qualname__)
+    if workdir is not None and "<lambda>" in name:
+        raise ValueError(
+            "Ein lambda als `kategorisierer` lässt sich nicht eindeutig als Zwischenstand ablegen; "
+            "bitte eine benannte Funktion verwenden oder ohne `workdir` rechnen."
+        )
+    return f"{modul}.{name}"
+
+
+def run_worksheet(
+    vorjahr_path,
+    berichtsjahr_path,
+    mapping_path,
+    output_path,
+    cols: dict,
+    folgejahr_path=None,
+    template_path=TEMPLATE_PATH,
+    workdir=None,
+    mus_sample_size: int = 10,
+    cut_off_sample_size: int = 10,
+    materiality: int = 0,
+    refresh: bool = False,
+    run_report_path=None,
+    betragsanalyse: bool = False,
+    geschaeftsjahresende: str = "12-31",
+    cut_off_tage: tuple = (16, 15),
+    excel_engine: str = "auto",
+    stichtag: Optional[str] = None,
+    jet: bool = False,
+) -> None:
+    """Arbeitspapier zur Umsatzanalyse; eingelesene Journale und Zwischenergebnisse je Jahr im ``workdir``.
+    ``betragsanalyse`` ergänzt Ziffern- und Betragsverteilung der Umsatzbuchungen, ``geschaeftsjahresende``
+    bzw. ``stichtag`` und ``cut_off_tage`` (Tage vor und nach dem Stichtag) bestimmen das Cut-off-Fenster. Die Journale
+    ohne Zwischenstand werden gleichzeitig eingelesen, xlsx mit ``excel_engine``. Mit ``jet`` laufen die Journal
+    Entry Tests über das aufbereitete Journal des Berichtsjahres (Tabellenblatt "JET", siehe ``Engagement``)."""
+    from auditrevenue.engagement import Engagement
+
+    journal_cols = ["kto_nr", "kto_name", "gkto_nr", "gkto_name", "soll", "haben", "saldo", "journal_nr", "datum"]
+    columns = dict(cols[c] for c in journal_cols)
+    cache_dir = None if workdir is None else Path(workdir) / "worksheet"
+
+    with profiled_run(run_report_path):
+        journals = _load_journals(
+            {"vorjahr": vorjahr_path, "berichtsjahr": berichtsjahr_path, "folgejahr": folgejahr_path},
+            columns, workdir, refresh, excel_engine,
+        )
+
+        if refresh and cache_dir is not None and cache_dir.exists():
+            for path in cache_dir.glob("*.pkl"):
+                path.unlink()
+
+        engagement = Engagement(journals, cols, mapping=mapping_path, template=template_path, cache_dir=cache_dir)
+        engagement.build_working_paper(
+            output_path,
+            jet=jet,
+            mus_sample_size=mus_sample_size,
+            cut_off_sample_size=cut_off_sample_size,
+            materiality=materiality,
+            betragsanalyse=betragsanalyse,
+            geschaeftsjahresende=geschaeftsjahresende,
+            stichtag=stichtag,
+            cut_off_tage=tuple(cut_off_tage),
+        )
+
+
+def _add_column_arguments(parser: argparse.ArgumentParser, names: list) -> None:
+    group = parser.add_argument_group("Spalten des Journals")
+    for name in names:
+        col, dtype = DEFAULT_COLUMNS[name]
+        group.add_argument(f"--col-{name.replace('_', '-')}", dest=f"col_{name}", default=col,
+                           help=f"Spaltenname (Standard: {col}, Typ {dtype})")
+
+
+def _get_columns(args: argparse.Namespace) -> dict:
+    return {
+        name: (getattr(args, f"col_{name}", col), dtype)
+        for name, (col, dtype) in DEFAULT_COLUMNS.items()
+    }
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="auditrevenue", description="Gegenkontoanalyse und Umsatzanalyse")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    net = sub.add_parser("network", help="Gegenkontoanalyse als Netzwerkgraph")
+    net.add_argument("--journal", type=Path, required=True, help="Journalexport (xlsx, csv, parquet)")
+    net.add_argument("--output", type=Path, default=Path("graph.html"), help="Ausgabe HTML")
+    net.add_argument("--workdir", type=Path, default=Path(".auditrevenue"), help="Verzeichnis der Zwischenstände")
+    net.add_argument("--schwelle", type=float, default=15000, help="Wesentlichkeitsschwelle der Kanten")
+    net.add_argument("--rerun-from", choices=NETWORK_STAGES, help="ab dieser Stufe neu berechnen")
+    net.add_argument("--until", choices=NETWORK_STAGES, default="render", help="nach dieser Stufe aufhören")
+    net.add_argument("--periode", choices=["M", "Q"], help="Schieberegler je Monat (M) oder Quartal (Q)")
+    net.add_argument("--analytics", action="store_true", help="Netzwerkkennzahlen und Risikohinweise")
+    net.add_argument("--div-modus", choices=["fehler", "proportional"], default="fehler",
+                     help="Buchungssätze mit mehreren Div-Zeilen: abbrechen oder anteilig aufteilen")
+    net.add_argument("--excel-engine", choices=EXCEL_ENGINES, default="auto",
+                     help="Leser für xlsx (auto: calamine, sonst openpyxl)")
+    net.add_argument("--renderer", choices=["pyvis", "webgl"], default="pyvis",
+                     help="Zeichnen mit vis-network (pyvis) oder WebGL für große Graphen")
+    net.add_argument("--tooltip-gegenkonten", type=int, default=20,
+                     help="höchstens so viele Gegenkonten je Seite im Tooltip eines Kontos")
+    net.add_argument("--ohne-kontenseiten", action="store_true",
+                     help="keine Seite mit allen Gegenkonten je Konto schreiben")
+    net.add_argument("--max-workers", type=int, help="Prozesse zum Schreiben der Kontenseiten")
+    net.add_argument("--run-report", type=Path, help="JSON mit Laufzeiten je Stufe")
+    _add_column_arguments(net, ["kto_nr", "kto_name", "gkto_nr", "gkto_name", "soll", "haben", "saldo", "journal_nr", "datum"])
+
+    ws = sub.add_parser("worksheet", help="Arbeitspapier zur Umsatzanalyse")
+    ws.add_argument("--vorjahr", type=Path, required=True, help="Journal des Vorjahres")
+    ws.add_argument("--berichtsjahr", type=Path, required=True, help="Journal des Berichtsjahres")
+    ws.add_argument("--folgejahr", type=Path, help="Journal des Folgejahres (Cut-off Januar)")
+    ws.add_argument("--mapping", type=Path, required=True, help="Mappingtabelle (xlsx)")
+    ws.add_argument("--template", type=Path, default=TEMPLATE_PATH, help="Vorlage des Arbeitspapiers")
+    ws.add_argument("--output", type=Path, default=Path("Umsatzanalyse.xlsx"), help="Ausgabe xlsx")
+    ws.add_argument("--workdir", type=Path, default=Path(".auditrevenue"), help="Verzeichnis der Zwischenstände")
+    ws.add_argument("--mus-sample-size", type=int, default=10)
+    ws.add_argument("--cut-off-sample-size", type=int, default=10)
+    ws.add_argument("--materiality", type=int, default=0)
+    ws.add_argument("--geschaeftsjahresende", default="12-31", help="Monat-Tag des Abschlussstichtags (Standard 12-31)")
+    ws.add_argument("--stichtag", help="Abschlussstichtag (JJJJ-MM-TT), sonst aus den Belegdaten bestimmt")
+    ws.add_argument("--cut-off-tage", type=int, nargs=2, default=[16, 15], metavar=("VOR", "NACH"),
+                    help="Cut-off-Fenster in Tagen vor und nach dem Stichtag (Standard 16 15 = 15.12. bis 15.01.)")
+    ws.add_argument("--refresh", action="store_true", help="Zwischenstände ignorieren und neu berechnen")
+    ws.add_argument("--betragsanalyse", action="store_true", help="Benford- und Betragsverteilung je Sparte und Monat")
+    ws.add_argument("--jet", action="store_true", help="Journal Entry Tests des Berichtsjahres (Tabellenblatt JET)")
+    ws.add_argument("--excel-engine", choices=EXCEL_ENGINES, default="auto",
+                    help="Leser für xlsx (auto: calamine, sonst openpyxl)")
+    ws.add_argument("--run-report", type=Path, help="JSON mit Laufzeiten je Stufe")
+    _add_column_arguments(ws, list(DEFAULT_COLUMNS))
+
+    srv = sub.add_parser("serve", help="Lokaler Analyse-Server (benötigt fastapi und uvicorn)")
+    srv.add_argument("--host", default="127.0.0.1")
+    srv.add_argument("--port", type=int, default=8765)
+    srv.add_argument("--workdir", type=Path, default=Path(".auditrevenue"), help="Verzeichnis der Zwischenstände")
+    srv.add_argument("--max-engagements", type=int, default=4, help="höchstens so viele Mandate im Speicher")
+    srv.add_argument("--idle-timeout", type=float, default=3600, help="Mandate ohne Zugriff nach Sekunden verwerfen")
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    cols = _get_columns(args)
+
+    if args.command == "serve":
+        from auditrevenue.service import serve
+
+        serve(args.host, args.port, args.max_engagements, args.idle_timeout, args.workdir)
+    elif args.command == "network":
+        run_network(
+            args.journal,
+            args.output,
+            cols,
+            workdir=args.workdir,
+            schwelle=args.schwelle,
+            rerun_from=args.rerun_from,
+            until=args.until,
+            run_report_path=args.run_report,
+            periode=args.periode,
+            analytics=args.analytics,
+            div_modus=args.div_modus,
+            excel_engine=args.excel_engine,
+            renderer=args.renderer,
+            max_gegenkonten=args.tooltip_gegenkonten,
+            drilldown=not args.ohne_kontenseiten,
+            max_workers=args.max_workers,
+        )
+    else:
+        run_worksheet(
+            args.vorjahr,
+            args.berichtsjahr,
+            args.mapping,
+            args.output,
+            cols,
+            folgejahr_path=args.folgejahr,
+            template_path=args.template,
+            workdir=args.workdir,
+            mus_sample_size=args.mus_sample_size,
+            cut_off_sample_size=args.cut_off_sample_size,
+            materiality=args.materiality,
+            refresh=args.refresh,
+            run_report_path=args.run_report,
+            betragsanalyse=args.betragsanalyse,
+            geschaeftsjahresende=args.geschaeftsjahresende,
+            cut_off_tage=args.cut_off_tage,
+            excel_engine=args.excel_engine,
+            stichtag=args.stichtag,
+            jet=args.jet,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
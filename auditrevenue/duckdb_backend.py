@@ -0,0 +1,263 @@
+"""
+Ausführung der in SQL formulierbaren Stufen in einer eingebetteten DuckDB.
+
+    backend = DuckDBBackend("journal.parquet", memory_limit="4GB")
+    agg = backend.get_nodes_and_edges("KONTO_NR", "KONTO_BEZ", "GKTO_NR", "GKTO_BEZ", "SOLL", "HABEN", "SALDO_S_H")
+
+Das Journal (Parquet- oder CSV-Dateien bzw. ein DataFrame) wird nicht in den
+Speicher geladen, sondern von DuckDB parallel und bei Bedarf auf der Platte
+(``temp_directory``) verarbeitet. Die Methoden liefern dieselben pandas-Ergebnisse
+wie die entsprechenden Funktionen (Aggregation nach Konto und Gegenkonto,
+Kontenrahmen, Spiegelpaar- und Saldenprüfung, Mapping und Monatsübersicht);
+abgeholt werden nur die (kleinen) Ergebnisse. Bei einem DataFrame als Journal
+erhalten die Ergebnisspalten dessen dtypes (z.B. ``string``). Benötigt das
+optionale Paket duckdb.
+"""
+
+from pathlib import Path
+from typing import Optional, Union
+
+import pandas as pd
+
+from network_analysis.check_journal import _report_saldo_je_journalnummer, check_if_sum_soll_and_sum_haben_are_equal
+from revenue_worksheet.build import _compile_mapping
+
+__all__ = ["DuckDBBackend"]
+
+# Zeilenposition im Journal; legt "first" und die Reihenfolge der Ausgaben fest
+_ZEILE = "__zeile"
+
+
+def _q(name) -> str:
+    """Spaltenname als SQL-Bezeichner."""
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _first(col) -> str:
+    """Erster nicht fehlender Wert in Journalreihenfolge (wie ``groupby().agg("first")``)."""
+    return f"arg_min({_q(col)}, {_ZEILE}) FILTER (WHERE {_q(col)} IS NOT NULL) AS {_q(col)}"
+
+
+def _isclose(a: str, b: str, atol: float) -> str:
+    """``np.isclose(a, b, atol=atol)`` in SQL, fehlende Werte sind nicht gleich."""
+    return f"coalesce(abs({a} - ({b})) <= {float(atol)} + 1e-05 * abs({b}), false)"
+
+
+class DuckDBBackend:
+    """
+    Journal als Sicht "journal" einer DuckDB-Verbindung.
+
+    ``journal`` ist ein Pfad bzw. eine Liste von Pfaden (.parquet/.pq oder .csv,
+    ``csv_options`` z.B. ``{"all_varchar": True}`` für ``read_csv``) oder ein
+    DataFrame. ``memory_limit``, ``threads`` und ``temp_directory`` werden als
+    DuckDB-Einstellungen gesetzt.
+    """
+
+    def __init__(
+        self,
+        journal: Union[str, Path, list, pd.DataFrame],
+        database: str = ":memory:",
+        memory_limit: Optional[str] = None,
+        threads: Optional[int] = None,
+        temp_directory: Optional[Union[str, Path]] = None,
+        csv_options: Optional[dict] = None,
+    ):
+        try:
+            import duckdb
+        except ImportError as e:
+            raise ImportError("Für das DuckDB-Backend wird das Paket duckdb benötigt.") from e
+
+        self.con = duckdb.connect(database)
+        # dtypes des Journals, damit die Ergebnisse denen der pandas-Funktionen gleichen
+        self._dtypes = journal.dtypes.to_dict() if isinstance(journal, pd.DataFrame) else {}
+        for name, wert in (("memory_limit", memory_limit), ("threads", threads), ("temp_directory", temp_directory)):
+            if wert is not None:
+                self.con.execute(f"SET {name} = '{wert}'")
+        self._register("journal", journal, csv_options or {})
+
+    def _register(self, name: str, quelle, csv_options: dict) -> None:
+        if isinstance(quelle, pd.DataFrame):
+            self.con.register(f"{name}_df", quelle)
+            scan = f"{name}_df"
+        else:
+            pfade = [Path(p) for p in (quelle if isinstance(quelle, (list, tuple)) else [quelle])]
+            suffixe = {p.suffix.lower() for p in pfade}
+            liste = "[" + ", ".join("'" + str(p).replace("'", "''") + "'" for p in pfade) + "]"
+            if suffixe <= {".parquet", ".pq"}:
+                scan = f"read_parquet({liste})"
+            elif suffixe == {".csv"}:
+                optionen = "".join(f", {k} = {self._literal(v)}" for k, v in csv_options.items())
+                scan = f"read_csv({liste}{optionen})"
+            else:
+                raise ValueError(f"Nicht unterstütztes Dateiformat: {', '.join(sorted(suffixe))}")
+        self.con.execute(
+            f"CREATE OR REPLACE VIEW {name} AS SELECT *, row_number() OVER () - 1 AS {_ZEILE} FROM {scan}"
+        )
+
+    @staticmethod
+    def _literal(wert) -> str:
+        if isinstance(wert, bool):
+            return "true" if wert else "false"
+        if isinstance(wert, (int, float)):
+            return str(wert)
+        if isinstance(wert, dict):
+            return "{" + ", ".join(f"{DuckDBBackend._literal(k)}: {DuckDBBackend._literal(v)}" for k, v in wert.items()) + "}"
+        if isinstance(wert, (list, tuple)):
+            return "[" + ", ".join(DuckDBBackend._literal(v) for v in wert) + "]"
+        return "'" + str(wert).replace("'", "''") + "'"
+
+    def _columns(self, relation: str) -> list:
+        return [zeile[0] for zeile in self.con.execute(f"DESCRIBE {relation}").fetchall()]
+
+    def _fetch(self, sql: str, params: Optional[list] = None) -> pd.DataFrame:
+        return self.con.execute(sql, params or []).df()
+
+    def _restore_dtypes(self, df: pd.DataFrame, weitere: Optional[dict] = None) -> pd.DataFrame:
+        """Castet die Spalten von ``df`` auf die dtypes der gleichnamigen Journalspalten (bzw. ``weitere``)."""
+        quelle = {**self._dtypes, **(weitere or {})}
+        dtypes = {c: quelle[c] for c in df.columns if c in quelle and df[c].dtype != quelle[c]}
+        return df.astype(dtypes) if dtypes else df
+
+    def grouped_by_kto_and_gkto(self, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo,
+                                runden: bool = True, quelle: str = "journal", als: str = "agg") -> pd.DataFrame:
+        """
+        Wie ``_get_journal_grouped_by_kto_and_gkto``; das Aggregat bleibt zusätzlich
+        als Tabelle ``als`` für die weiteren Prüfungen in DuckDB.
+        """
+        k, g = _q(kto_nr), _q(gkto_nr)
+        summen = ", ".join(f"coalesce(sum({_q(c)}), 0) AS {_q(c)}" for c in (soll, haben, saldo))
+        self.con.execute(f"""
+            CREATE OR REPLACE TABLE {als} AS
+            SELECT *, row_number() OVER (ORDER BY {k}, {g}) - 1 AS {_ZEILE} FROM (
+                SELECT {k}, {g}, {_first(kto_name)}, {_first(gkto_name)}, {summen}
+                FROM {quelle}
+                WHERE {k} IS NOT NULL AND {g} IS NOT NULL
+                GROUP BY {k}, {g}
+            )
+        """)
+        agg = self._restore_dtypes(self._fetch(f"SELECT * EXCLUDE ({_ZEILE}) FROM {als} ORDER BY {_ZEILE}"))
+        if runden:
+            for col in (soll, haben, saldo):
+                agg[col] = agg[col].round(2)
+        return agg
+
+    def check_if_only_mirror_pairs(self, kto_nr, gkto_nr, soll, haben, saldo, quelle: str = "agg",
+                                   atol: float = 0.1) -> None:
+        """Wie ``check_if_only_mirror_pairs`` über das Aggregat ``quelle`` (Selbstverknüpfung statt Graph)."""
+        k, g = _q(kto_nr), _q(gkto_nr)
+        gleich = " AND ".join([
+            _isclose(f"a.{_q(saldo)}", f"-b.{_q(saldo)}", atol),
+            _isclose(f"a.{_q(soll)}", f"b.{_q(haben)}", atol),
+            _isclose(f"a.{_q(haben)}", f"b.{_q(soll)}", atol),
+        ])
+        bad = self._fetch(f"""
+            SELECT a.{_ZEILE}, a.{k}, a.{g}
+            FROM {quelle} a JOIN {quelle} b ON a.{k} = b.{g} AND a.{g} = b.{k}
+            WHERE NOT ({gleich})
+            ORDER BY a.{_ZEILE}
+        """)
+        if len(bad):
+            print("Salden-Postulat verletzt für diese Spiegel-Paare:")
+            print(bad.set_index(_ZEILE).rename_axis(None)[[kto_nr, gkto_nr]].drop_duplicates())
+        else:
+            print("Salden-Postulat erfüllt für alle Spiegel-Paare")
+
+    def get_nodes_and_edges(self, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo,
+                            quelle: str = "journal") -> pd.DataFrame:
+        """Wie ``get_nodes_and_edges_by_aggregating_journal`` (Aggregat samt Prüfungen)."""
+        agg = self.grouped_by_kto_and_gkto(kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, quelle=quelle)
+        self.check_if_only_mirror_pairs(kto_nr, gkto_nr, soll, haben, saldo)
+        check_if_sum_soll_and_sum_haben_are_equal(agg, soll, haben)
+        return agg
+
+    def generate_kto_rahmen(self, kto_nr, kto_name, quelle: str = "agg") -> pd.DataFrame:
+        """Wie ``generate_kto_rahmen`` über die Relation ``quelle`` (Standard: das Aggregat)."""
+        if not {kto_nr, kto_name}.issubset(self._columns(quelle)):
+            raise ValueError(f"Das DataFrame muss die Spalten {kto_nr} und {kto_name} enthalten.")
+        k = _q(kto_nr)
+        return self._restore_dtypes(self._fetch(
+            f"SELECT {k}, {_first(kto_name)} FROM {quelle} WHERE {k} IS NOT NULL GROUP BY {k} ORDER BY {k}"
+        ))
+
+    def test_saldo_je_journalnummer(self, journal_nr, saldo, tol: float = 1, quelle: str = "journal") -> None:
+        """Wie ``test_saldo_je_journalnummer``; nur die fehlerhaften Buchungssätze werden abgeholt."""
+        j, s = _q(journal_nr), _q(saldo)
+        summen = f"""
+            SELECT {j}, sum({s}) AS {s} FROM {quelle}
+            WHERE {j} IS NOT NULL GROUP BY {j} HAVING abs(sum({s})) > ?
+        """
+        bad = self._fetch(f"{summen} ORDER BY {j}", [tol])
+        output = bad
+        if len(bad):
+            output = self._fetch(
+                f"SELECT * EXCLUDE ({_ZEILE}) FROM {quelle} WHERE {j} IN (SELECT {j} FROM ({summen})) ORDER BY {_ZEILE}",
+                [tol],
+            )
+        _report_saldo_je_journalnummer(bad, output)
+
+    def initially_map_and_filter(self, col_kto, mapping: Optional[pd.DataFrame], umsatzkennzeichen: str = "u",
+                                 materialkennzeichen: str = "m", lookup: Optional[pd.DataFrame] = None,
+                                 quelle: str = "journal", als: str = "journal_mapped",
+                                 laden: bool = True) -> Optional[pd.DataFrame]:
+        """
+        Wie ``_initially_map_and_filter_df`` (Index = Zeilenposition im Journal). Das
+        Ergebnis bleibt als Sicht ``als`` bestehen; ohne ``laden`` wird es nicht abgeholt.
+        """
+        if lookup is None:
+            lookup = _compile_mapping(mapping, umsatzkennzeichen, materialkennzeichen)
+        self.con.register("__lookup", lookup.rename_axis("__konto").reset_index())
+        self.con.execute(f"""
+            CREATE OR REPLACE VIEW {als} AS
+            SELECT j.*, l.kategorie, l.sparte
+            FROM {quelle} j JOIN __lookup l ON j.{_q(col_kto)} = l.__konto
+        """)
+        if not laden:
+            return None
+        df = self._restore_dtypes(self._fetch(f"SELECT * FROM {als} ORDER BY {_ZEILE}"), lookup.dtypes.to_dict())
+        return df.set_index(_ZEILE).rename_axis(None)
+
+    def calculate_one_df(self, col_sparte, col_kategorie, col_saldo, col_datum, sparte_value: Optional[str] = None,
+                         umsatzkennzeichen: str = "u", materialkennzeichen: str = "m",
+                         quelle: str = "journal_mapped") -> pd.DataFrame:
+        """
+        Wie ``_calculate_one_df``: 12-Zeilen-Übersicht der Monatssummen für Umsatzerlöse
+        und Materialaufwand. Das Belegdatum wird per ``try_cast`` gelesen (ISO-Format).
+        Summiert wird exakt in Cent (``DECIMAL(18, 2)``), damit die parallele Summation
+        bei Rundung auf volle Euro nicht an einer .5-Grenze anders rundet als pandas.
+        """
+        kat = _q(col_kategorie)
+        bedingung = f"{kat} IN (?, ?)"
+        params = [umsatzkennzeichen, materialkennzeichen]
+        if sparte_value is not None:
+            bedingung += f" AND {_q(col_sparte)} = ?"
+            params.append(sparte_value)
+        summen = self._fetch(f"""
+            SELECT monat, kategorie, CAST(sum(CAST(betrag AS DECIMAL(18, 2))) AS DOUBLE) AS summe FROM (
+                SELECT month(try_cast({_q(col_datum)} AS TIMESTAMP)) AS monat, {kat} AS kategorie,
+                       {_q(col_saldo)} AS betrag
+                FROM {quelle} WHERE {bedingung}
+            )
+            WHERE monat IS NOT NULL
+            GROUP BY monat, kategorie
+        """, params)
+
+        def je_monat(kennzeichen):
+            teil = summen[summen["kategorie"] == kennzeichen]
+            return (
+                pd.Series(teil["summe"].fillna(0).to_numpy(), index=teil["monat"].astype(int).to_numpy())
+                .reindex(range(1, 13), fill_value=0)
+            )
+
+        result = pd.DataFrame({"Umsatz": je_monat(umsatzkennzeichen).mul(-1), "Materialaufwand": je_monat(materialkennzeichen)})
+        return result.round(0).astype(int)
+
+    def get_monthly_dfs(self, lst_sparten: list, col_kategorie, col_sparte, col_saldo, col_datum,
+                        quelle: str = "journal_mapped") -> list:
+        """Wie ``_get_monthly_dfs``: erst die Gesamtübersicht, dann eine je Sparte."""
+        return [
+            self.calculate_one_df(col_sparte, col_kategorie, col_saldo, col_datum, sparte_value=sparte, quelle=quelle)
+            for sparte in [None] + [str(s) for s in lst_sparten]
+        ]
+
+    def close(self) -> None:
+        self.con.close()
@@ -0,0 +1,248 @@
+"""
+Mandat (Engagement): geladene Journale und die daraus einmal abgeleiteten Zwischenstände.
+
+    engagement = Engagement.from_files("bj.xlsx", vorjahr="vj.xlsx", mapping="mapping.xlsx")
+    engagement.build_network_analysis("graph.html", materiality=10000)
+    engagement.build_working_paper("Umsatzanalyse.xlsx")
+
+Arbeitspapier und Gegenkontoanalyse verwenden dieselben Zwischenstände, die erst
+bei Bedarf berechnet und danach vorgehalten werden: Belegdaten und Beträge
+(einmal umgewandelt), das gemappte Journal je Jahr, das aufbereitete Journal des
+Berichtsjahres samt Aggregat und die Kategorien der Konten. Die Journal Entry
+Tests laufen auf dem aufbereiteten Journal und dem Aggregat der
+Gegenkontoanalyse. Die übergebenen Journale werden dabei nicht verändert.
+"""
+
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from auditrevenue.cli import DEFAULT_COLUMNS, _load_journals
+from revenue_worksheet.build import (
+    TEMPLATE_PATH,
+    _compile_mapping,
+    _get_betrag,
+    _get_datum,
+    _get_list_of_sections,
+    _get_mapping,
+    _get_year_intermediates,
+    build_working_paper,
+)
+from revenue_worksheet.cut_off import DateIndex
+from revenue_worksheet.intermediates import hash_dataframe
+
+__all__ = ["Engagement", "JAHRE"]
+
+JAHRE = ("vorjahr", "berichtsjahr", "folgejahr")
+
+_NETWORK_COLS = ["kto_nr", "kto_name", "gkto_nr", "gkto_name", "soll", "haben", "saldo", "journal_nr"]
+
+
+class Engagement:
+    """
+    Journale eines Mandats (``{"vorjahr": df, "berichtsjahr": df, "folgejahr": df}``,
+    nur das Berichtsjahr ist Pflicht) mit Spalten wie ``DEFAULT_COLUMNS``.
+
+    ``mapping`` ist der Pfad zur Mappingtabelle oder die Tabelle selbst.
+    ``kategorisierer``, ``div_modus`` und ``periode`` gelten für die
+    Gegenkontoanalyse (siehe ``network_analysis.build.build_network_analysis``);
+    mit ``periode`` erhält der Graph einen Schieberegler über die Perioden.
+    ``cache_dir`` legt die Zwischenergebnisse des Arbeitspapiers zusätzlich auf
+    der Platte ab (siehe ``build_working_paper``).
+    """
+
+    def __init__(
+        self,
+        journals: dict,
+        cols: dict = DEFAULT_COLUMNS,
+        mapping=None,
+        template=TEMPLATE_PATH,
+        kategorisierer=None,
+        div_modus: str = "fehler",
+        periode: Optional[str] = None,
+        cache_dir=None,
+    ):
+        unbekannt = set(journals) - set(JAHRE)
+        if unbekannt:
+            raise ValueError(f"Unbekannte Jahre {sorted(unbekannt)}, erlaubt: {', '.join(JAHRE)}")
+        if journals.get("berichtsjahr") is None:
+            raise ValueError("Das Journal des Berichtsjahres fehlt.")
+        self.journals = {name: df for name, df in journals.items() if df is not None}
+        self.cols = cols
+        self.mapping_source = mapping
+        self.template_path = template
+        self.kategorisierer = kategorisierer
+        self.div_modus = div_modus
+        self.periode = periode
+        self.cache_dir = cache_dir
+
+        self._mapping = None
+        # Zwischenstände je Jahr (siehe revenue_worksheet.build._get_year_intermediates)
+        self._years = {}
+        # Zwischenstände der Gegenkontoanalyse (siehe network_analysis.build.get_network_intermediates)
+        self._network = {}
+
+    @classmethod
+    def from_files(
+        cls,
+        berichtsjahr,
+        cols: dict = DEFAULT_COLUMNS,
+        vorjahr=None,
+        folgejahr=None,
+        workdir=None,
+        refresh: bool = False,
+        excel_engine: str = "auto",
+        **kwargs,
+    ) -> "Engagement":
+        """Liest die Journalexporte (gleichzeitig, Zwischenstände im ``workdir``) und legt das Mandat an."""
+        journals = _load_journals(
+            {"vorjahr": vorjahr, "berichtsjahr": berichtsjahr, "folgejahr": folgejahr},
+            dict(cols.values()), workdir, refresh, excel_engine,
+        )
+        if workdir is not None:
+            kwargs.setdefault("cache_dir", Path(workdir) / "worksheet")
+        return cls(journals, cols, **kwargs)
+
+    def col(self, name: str) -> str:
+        return self.cols[name][0]
+
+    def journal(self, jahr: str = "berichtsjahr") -> pd.DataFrame:
+        if jahr not in self.journals:
+            raise ValueError(f"Für das Mandat liegt kein Journal '{jahr}' vor.")
+        return self.journals[jahr]
+
+    # --- Umsatzanalyse ---------------------------------------------------------
+
+    def _mapping_info(self) -> dict:
+        """Mappingtabelle, einmal eingelesen und zum Lookup verdichtet, samt Hash und Sparten."""
+        if self._mapping is None:
+            if self.mapping_source is None:
+                raise ValueError("Für die Umsatzanalyse wird eine Mappingtabelle benötigt.")
+            mapping = _get_mapping(self.mapping_source)
+            self._mapping = {
+                "mapping": mapping,
+                "lookup": _compile_mapping(mapping),
+                "hash": hash_dataframe(mapping),
+                "sparten": _get_list_of_sections(mapping),
+            }
+        return self._mapping
+
+    @property
+    def mapping(self) -> pd.DataFrame:
+        return self._mapping_info()["mapping"]
+
+    def _year(self, jahr: str, monthly: bool = False, dates: bool = False) -> dict:
+        info = self._mapping_info()
+        return _get_year_intermediates(
+            self.journal(jahr), self.col("kto_nr"), self.col("saldo"), self.col("datum"),
+            info["lookup"], info["hash"], info["sparten"],
+            cache_dir=self.cache_dir,
+            monthly=monthly,
+            dates=dates,
+            result=self._years.setdefault(jahr, {}),
+        )
+
+    def mapped(self, jahr: str = "berichtsjahr") -> pd.DataFrame:
+        """Gemapptes Journal (nur Umsatz- und Materialkonten, mit "kategorie" und "sparte")."""
+        return self._year(jahr)["mapped"]
+
+    def amounts(self, jahr: str = "berichtsjahr") -> pd.Series:
+        """Numerische Beträge des gemappten Journals."""
+        return _get_betrag(self._year(jahr), self.col("saldo"))
+
+    def dates(self, jahr: str = "berichtsjahr") -> pd.Series:
+        """Belegdaten des gemappten Journals als datetime64."""
+        return _get_datum(self._year(jahr), self.col("datum"))
+
+    def date_index(self, jahr: str = "berichtsjahr") -> DateIndex:
+        """Sortierter Datumsindex des gemappten Journals für die Cut-off-Fenster."""
+        return self._year(jahr, dates=True)["dates"]
+
+    def monthly(self, jahr: str = "berichtsjahr") -> list:
+        """Monatssummen, Gesamtübersicht gefolgt von je einer je Sparte."""
+        return self._year(jahr, monthly=True)["monthly"]
+
+    def build_working_paper(self, output_path, jet: bool = False, **kwargs) -> Path:
+        """Arbeitspapier zur Umsatzanalyse (Parameter wie ``revenue_worksheet.build.build_working_paper``).
+        Mit ``jet`` werden die Journal Entry Tests ausgeführt und auf dem Tabellenblatt "JET" ausgegeben."""
+        if "vorjahr" not in self.journals:
+            raise ValueError("Für das Arbeitspapier wird das Journal des Vorjahres benötigt.")
+        if jet:
+            kwargs.setdefault("jet_hits", self.journal_entry_tests())
+        kwargs.setdefault("template_path", self.template_path)
+        kwargs.setdefault("cache_dir", self.cache_dir)
+        build_working_paper(
+            df1=self.journals["vorjahr"],
+            df2=self.journals["berichtsjahr"],
+            df3=self.journals.get("folgejahr"),
+            col_konto=self.col("kto_nr"),
+            col_saldo=self.col("saldo"),
+            col_datum=self.col("datum"),
+            mapping_path=self.mapping,
+            output_path=output_path,
+            intermediates=self._years,
+            **kwargs,
+        )
+        return Path(output_path)
+
+    # --- Gegenkontoanalyse -----------------------------------------------------
+
+    def _network_intermediates(self, kategorisieren: bool = True) -> dict:
+        from network_analysis.build import get_network_intermediates
+
+        return get_network_intermediates(
+            self.journals["berichtsjahr"], *[self.col(c) for c in _NETWORK_COLS],
+            kategorisierer=self.kategorisierer,
+            datum=self.col("datum") if self.periode is not None else None,
+            periode=self.periode or "M",
+            div_modus=self.div_modus,
+            result=self._network,
+            kategorisieren=kategorisieren,
+        )
+
+    @property
+    def prepared(self) -> pd.DataFrame:
+        """Aufbereitetes Journal des Berichtsjahres (siehe ``prepare_journal``)."""
+        return self._network_intermediates(kategorisieren=False)["prepared"]
+
+    @property
+    def aggregate(self) -> pd.DataFrame:
+        """Aggregat je Konto und Gegenkonto des Berichtsjahres."""
+        return self._network_intermediates(kategorisieren=False)["aggregate"]
+
+    @property
+    def categorized(self) -> pd.DataFrame:
+        """Aggregat mit Kategorie je Konto ("kto_kategorie")."""
+        return self._network_intermediates()["categorized"]
+
+    def journal_entry_tests(self, regeln: Optional[list] = None) -> pd.DataFrame:
+        """Trefferliste der Journal Entry Tests (Standard ``JET_REGELN``) über das aufbereitete
+        Journal des Berichtsjahres, seltene Kontenkombinationen aus dessen Aggregat."""
+        from network_analysis.journal_entry_tests import run_journal_entry_tests
+
+        return run_journal_entry_tests(
+            self.prepared,
+            self.col("kto_nr"), self.col("gkto_nr"), self.col("soll"), self.col("haben"), self.col("saldo"),
+            self.col("journal_nr"),
+            datum=self.col("datum"),
+            regeln=regeln,
+            agg=self.aggregate,
+        )
+
+    def build_network_analysis(self, destination_path, materiality: int = 0, **kwargs) -> None:
+        """Gegenkontoanalyse als Netzwerkgraph (Parameter wie ``network_analysis.build.build_network_analysis``)."""
+        from network_analysis.build import build_network_analysis
+
+        build_network_analysis(
+            destination_path,
+            self.journals["berichtsjahr"],
+            *[self.col(c) for c in _NETWORK_COLS],
+            materiality=materiality,
+            kategorisierer=self.kategorisierer,
+            datum=self.col("datum") if self.periode is not None else None,
+            periode=self.periode or "M",
+            div_modus=self.div_modus,
+            intermediates=self._network,
+            **kwargs,
+        )
@@ -0,0 +1,347 @@
+"""
+Lokaler Analyse-Server mit im Speicher gehaltenen Journalen.
+
+    python -m auditrevenue serve --port 8765
+
+Ein Mandat (Engagement) wird einmal geladen und aufbereitet; danach werden
+Graph (neue ``schwelle``), Kontenseiten, MUS-Stichproben und Arbeitspapier aus dem Speicher
+erzeugt. Nicht mehr genutzte Mandate werden nach LRU-Prinzip bzw. nach
+``idle_timeout_s`` verworfen. Benötigt die optionalen Pakete fastapi und uvicorn.
+"""
+
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from auditrevenue.cli import DEFAULT_COLUMNS, _load_journals, run_network
+from auditrevenue.engagement import Engagement
+from monetary_unit_sampling.monetary_unit_sampling import mus_sampling_with_given_sample_size
+from revenue_worksheet.build import TEMPLATE_PATH
+
+__all__ = ["EngagementCache", "create_app", "serve"]
+
+# Kennung eines Mandats, zugleich Name seines Verzeichnisses im workdir
+ENGAGEMENT_ID = re.compile(r"[A-Za-z0-9_-]+")
+
+
+class _Engagement(Engagement):
+    """
+    Mandat des Servers: Journale aus Dateien (Zwischenstände im ``workdir``), Sperre
+    und Zeitpunkt des letzten Zugriffs. Die Kategorien werden über die Stufen von
+    ``run_network`` im ``workdir`` vorgehalten, damit sie einen Neustart überdauern.
+    """
+
+    # Anzahl der zwischengespeicherten Graphen je Mandat (je Schwelle)
+    MAX_RENDERED = 8
+
+    def __init__(
+        self,
+        engagement_id: str,
+        berichtsjahr,
+        cols: dict,
+        workdir,
+        vorjahr=None,
+        folgejahr=None,
+        mapping=None,
+        template=TEMPLATE_PATH,
+    ):
+        if not ENGAGEMENT_ID.fullmatch(engagement_id):
+            raise ValueError(
+                f"Ungültige Mandatskennung '{engagement_id}', erlaubt sind Buchstaben, Ziffern, '_' und '-'."
+            )
+        self.engagement_id = engagement_id
+        self.paths = {"berichtsjahr": berichtsjahr, "vorjahr": vorjahr, "folgejahr": folgejahr}
+        self.workdir = Path(workdir)
+        self.last_used = time.monotonic()
+        self.lock = threading.Lock()
+
+        super().__init__(
+            _load_journals(self.paths, dict(cols.values()), self.workdir),
+            cols,
+            mapping=mapping,
+            template=template,
+            cache_dir=self.workdir / "worksheet",
+        )
+        self._categorized = None
+        self._graph = None
+        self._mus_population = None
+        self._rendered = OrderedDict()
+
+    def summary(self) -> dict:
+        return {
+            "engagement_id": self.engagement_id,
+            "rows": {name: len(df) for name, df in self.journals.items()},
+            "idle_s": round(time.monotonic() - self.last_used, 1),
+        }
+
+    @property
+    def categorized(self) -> pd.DataFrame:
+        """Kategorisiertes Aggregat des Berichtsjahres (einmal je Mandat, Zwischenstände im workdir)."""
+        if self._categorized is None:
+            self._categorized = run_network(
+                self.paths["berichtsjahr"], None, self.cols, workdir=self.workdir, until="categorize"
+            )
+        return self._categorized
+
+    def render_network(self, schwelle: float, renderer: str = "pyvis") -> str:
+        """HTML der Gegenkontoanalyse für ``schwelle``; die letzten Ergebnisse bleiben im Speicher."""
+        from network_analysis.drilldown import set_drilldown_links
+        from network_analysis.generate_network import get_graph_html, get_network_graph, restyle_network_graph
+
+        if (schwelle, renderer) in self._rendered:
+            self._rendered.move_to_end((schwelle, renderer))
+            return self._rendered[(schwelle, renderer)]
+
+        if self._graph is None:
+            cols = [self.col(c) for c in ["kto_nr", "kto_name", "gkto_nr", "gkto_name", "soll", "haben", "saldo"]]
+            self._graph = get_network_graph(self.categorized, *cols, "kto_kategorie")
+        G = restyle_network_graph(self._graph.copy(), schwelle)
+        # Doppelklick öffnet die auf Abruf erzeugte Kontenseite (siehe render_account)
+        set_drilldown_links(G, "konten/{konto}", set(self.categorized[self.col("kto_nr")].dropna()))
+        html = get_graph_html(G, renderer)
+        self._rendered[(schwelle, renderer)] = html
+        if len(self._rendered) > self.MAX_RENDERED:
+            self._rendered.popitem(last=False)
+        return html
+
+    def render_account(self, konto: str) -> str:
+        """Kontenseite mit allen Gegenkonten von ``konto`` (Kontonummer als Text), erst bei Abruf erzeugt."""
+        from network_analysis.drilldown import get_drilldown_html
+
+        df = self.categorized
+        cols = [self.col(c) for c in ["kto_nr", "kto_name", "gkto_nr", "gkto_name", "soll", "haben", "saldo"]]
+        konten = {str(k): k for k in df[cols[0]].dropna().unique()}
+        if konto not in konten:
+            raise KeyError(konto)
+        return get_drilldown_html(df, konten[konto], *cols, "kto_kategorie")
+
+    @property
+    def mus_population(self) -> tuple:
+        """Umsatzbuchungen des Berichtsjahres und deren absolute Beträge als float64-Array."""
+        if self._mus_population is None:
+            if self.mapping_source is None:
+                raise ValueError("Für die MUS-Stichprobe wird eine Mappingtabelle benötigt.")
+            mapped = self.mapped("berichtsjahr")
+            maske = mapped["kategorie"].isin(["u"]).to_numpy(dtype=bool)
+            amounts = self.amounts("berichtsjahr").to_numpy(dtype="float64", na_value=np.nan)[maske]
+            self._mus_population = (mapped.loc[maske], np.abs(amounts))
+        return self._mus_population
+
+    def draw_mus(self, sample_size: int, seed: Optional[int] = None, materiality: float = 0) -> pd.DataFrame:
+        """MUS-Stichprobe über die Umsatzbuchungen mit absolutem Betrag über ``materiality``."""
+        population, amounts = self.mus_population
+        rows = np.flatnonzero(amounts > materiality)
+        if len(rows) == 0:
+            return population.iloc[:0]
+        selection = mus_sampling_with_given_sample_size(
+            pd.Series(amounts[rows]), sample_size=sample_size, mode="select", seed=seed
+        )
+        return population.iloc[rows[selection.positions]]
+
+    def get_output_path(self, output) -> Path:
+        """Ausgabepfad ``output`` relativ zum ``workdir`` des Mandats; Pfade außerhalb davon werden abgelehnt."""
+        basis = self.workdir.resolve()
+        pfad = (basis / output).resolve()
+        if not pfad.is_relative_to(basis) or pfad == basis:
+            raise ValueError(f"Ausgabepfad '{output}' liegt nicht im Verzeichnis des Mandats.")
+        return pfad
+
+    def build_worksheet(
+        self,
+        output_path,
+        mus_sample_size: int = 10,
+        cut_off_sample_size: int = 10,
+        materiality: int = 0,
+    ) -> Path:
+        if self.mapping_source is None or "vorjahr" not in self.journals:
+            raise ValueError("Für das Arbeitspapier werden Vorjahr und Mappingtabelle benötigt.")
+        output_path = self.get_output_path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        return self.build_working_paper(
+            output_path,
+            mus_sample_size=mus_sample_size,
+            cut_off_sample_size=cut_off_sample_size,
+            materiality=materiality,
+        )
+
+
+class EngagementCache:
+    """LRU-Speicher der geladenen Mandate, verwirft zusätzlich Mandate ohne Zugriff seit ``idle_timeout_s``."""
+
+    def __init__(self, max_engagements: int = 4, idle_timeout_s: Optional[float] = 3600):
+        self.max_engagements = max_engagements
+        self.idle_timeout_s = idle_timeout_s
+        self._engagements = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, engagement: _Engagement) -> None:
+        with self._lock:
+            engagement.last_used = time.monotonic()
+            self._engagements[engagement.engagement_id] = engagement
+            self._engagements.move_to_end(engagement.engagement_id)
+            self._evict()
+
+    def get(self, engagement_id: str) -> Optional[_Engagement]:
+        with self._lock:
+            self._evict()
+            engagement = self._engagements.get(engagement_id)
+            if engagement is not None:
+                engagement.last_used = time.monotonic()
+                self._engagements.move_to_end(engagement_id)
+            return engagement
+
+    def remove(self, engagement_id: str) -> bool:
+        with self._lock:
+            return self._engagements.pop(engagement_id, None) is not None
+
+    def list(self) -> list:
+        with self._lock:
+            self._evict()
+            return [e.summary() for e in self._engagements.values()]
+
+    def _evict(self) -> None:
+        if self.idle_timeout_s is not None:
+            now = time.monotonic()
+            for engagement_id in [
+                k for k, e in self._engagements.items() if now - e.last_used > self.idle_timeout_s
+            ]:
+                del self._engagements[engagement_id]
+        while len(self._engagements) > self.max_engagements:
+            self._engagements.popitem(last=False)
+
+
+def create_app(
+    max_engagements: int = 4,
+    idle_timeout_s: Optional[float] = 3600,
+    workdir=".auditrevenue",
+):
+    """Erstellt die FastAPI-Anwendung des Analyse-Servers."""
+    try:
+        from fastapi import FastAPI, HTTPException
+        from fastapi.responses import FileResponse, HTMLResponse
+        from pydantic import BaseModel
+    except ImportError as e:
+        raise ImportError("Für den Analyse-Server werden fastapi und uvicorn benötigt.") from e
+
+    class EngagementRequest(BaseModel):
+        engagement_id: str
+        berichtsjahr: str
+        vorjahr: Optional[str] = None
+        folgejahr: Optional[str] = None
+        mapping: Optional[str] = None
+        template: Optional[str] = None
+        columns: dict = {}
+
+    class WorksheetRequest(BaseModel):
+        output: str
+        mus_sample_size: int = 10
+        cut_off_sample_size: int = 10
+        materiality: int = 0
+
+    app = FastAPI(title="auditrevenue")
+    cache = EngagementCache(max_engagements, idle_timeout_s)
+    app.state.engagements = cache
+
+    def _get(engagement_id: str) -> _Engagement:
+        engagement = cache.get(engagement_id)
+        if engagement is None:
+            raise HTTPException(status_code=404, detail=f"Mandat {engagement_id} ist nicht geladen.")
+        return engagement
+
+    @app.post("/engagements")
+    def load_engagement(req: EngagementRequest):
+        unbekannt = set(req.columns) - set(DEFAULT_COLUMNS)
+        if unbekannt:
+            raise HTTPException(status_code=422, detail=f"Unbekannte Spalten: {sorted(unbekannt)}")
+        cols = {
+            name: (req.columns.get(name, col), dtype) for name, (col, dtype) in DEFAULT_COLUMNS.items()
+        }
+        if not ENGAGEMENT_ID.fullmatch(req.engagement_id):
+            raise HTTPException(status_code=422, detail=f"Ungültige Mandatskennung '{req.engagement_id}'.")
+        engagement = _Engagement(
+            req.engagement_id,
+            req.berichtsjahr,
+            cols,
+            Path(workdir) / req.engagement_id,
+            vorjahr=req.vorjahr,
+            folgejahr=req.folgejahr,
+            mapping=req.mapping,
+            template=req.template or TEMPLATE_PATH,
+        )
+        cache.put(engagement)
+        return engagement.summary()
+
+    @app.get("/engagements")
+    def list_engagements():
+        return cache.list()
+
+    @app.delete("/engagements/{engagement_id}")
+    def drop_engagement(engagement_id: str):
+        if not cache.remove(engagement_id):
+            raise HTTPException(status_code=404, detail=f"Mandat {engagement_id} ist nicht geladen.")
+        return {"engagement_id": engagement_id, "removed": True}
+
+    @app.get("/engagements/{engagement_id}/network", response_class=HTMLResponse)
+    def network(engagement_id: str, schwelle: float = 15000, renderer: str = "pyvis"):
+        engagement = _get(engagement_id)
+        with engagement.lock:
+            try:
+                return HTMLResponse(engagement.render_network(schwelle, renderer))
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=str(e))
+
+    @app.get("/engagements/{engagement_id}/konten/{konto}", response_class=HTMLResponse)
+    def account(engagement_id: str, konto: str):
+        engagement = _get(engagement_id)
+        with engagement.lock:
+            try:
+                return HTMLResponse(engagement.render_account(konto))
+            except KeyError:
+                raise HTTPException(status_code=404, detail=f"Konto {konto} kommt im Mandat nicht vor.")
+
+    @app.get("/engagements/{engagement_id}/mus")
+    def mus(engagement_id: str, sample_size: int = 10, seed: Optional[int] = None, materiality: float = 0):
+        engagement = _get(engagement_id)
+        if sample_size < 1:
+            raise HTTPException(status_code=422, detail="`sample_size` muss mindestens 1 sein.")
+        with engagement.lock:
+            try:
+                sample = engagement.draw_mus(sample_size, seed, materiality)
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=str(e))
+        return json.loads(sample.to_json(orient="records", force_ascii=False))
+
+    @app.post("/engagements/{engagement_id}/worksheet")
+    def worksheet(engagement_id: str, req: WorksheetRequest):
+        engagement = _get(engagement_id)
+        with engagement.lock:
+            try:
+                path = engagement.build_worksheet(
+                    req.output, req.mus_sample_size, req.cut_off_sample_size, req.materiality
+                )
+            except ValueError as e:
+                raise HTTPException(status_code=422, detail=str(e))
+        return FileResponse(path, filename=path.name)
+
+    return app
+
+
+def serve(
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    max_engagements: int = 4,
+    idle_timeout_s: Optional[float] = 3600,
+    workdir=".auditrevenue",
+) -> None:
+    try:
+        import uvicorn
+    except ImportError as e:
+        raise ImportError("Für den Analyse-Server werden fastapi und uvicorn benötigt.") from e
+    uvicorn.run(create_app(max_engagements, idle_timeout_s, workdir), host=host, port=port)
@@ -0,0 +1,255 @@
+"""
+Laufzeitmessung aller Stufen auf synthetischen Journalen.
+
+Aufruf aus dem Projektverzeichnis::
+
+    python -m benchmarks.run_benchmarks --sizes 10000 100000 1000000 10000000
+
+Je Journalgröße werden die Gegenkontoanalyse (mit lokalem Ersatz für die
+KI-Kategorisierung), das Arbeitspapier zur Umsatzanalyse und die MUS-Ziehung
+(im Speicher und chunkweise) ausgeführt. Gemessen wird über die Stufen des
+Run-Reports, d.h. je öffentlicher Funktion bzw. Stufe. Die Ergebnisse werden
+an ``benchmarks/history.jsonl`` angehängt; liegt eine Messung um mehr als
+``--threshold`` über dem Median der bisherigen Läufe (gleicher Rechner, gleiche
+Größe), wird sie als Regression gemeldet und der Exit-Code ist 1. Zusätzlich
+wird geprüft, dass die chunkweise MUS-Ziehung dieselben Zeilen zieht wie die
+Ziehung im Speicher (Exit-Code 2 bei Abweichung).
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from benchmarks.synthetic_journal import (
+    fake_kategorie_bestimmen,
+    generate_journal,
+    generate_kontenplan,
+    generate_mapping,
+)
+from instrumentation.run_report import disable, enable, stage
+from monetary_unit_sampling.monetary_unit_sampling import (
+    mus_sampling_with_given_sample_size,
+    mus_sampling_with_given_sample_size_streaming,
+)
+from network_analysis.build import build_network_analysis
+from revenue_worksheet.build import build_working_paper
+
+ROOT = Path(__file__).resolve().parent.parent
+TEMPLATE_PATH = ROOT / "revenue_worksheet" / "template_umsatzanalyse_mit_sparten.xlsx"
+HISTORY_PATH = Path(__file__).resolve().parent / "history.jsonl"
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+DEFAULT_MAX_ROWS = {"network": None, "worksheet": None, "mus": None}
+
+COLS = ["KONTO_NR", "KONTO_BEZ", "GKTO_NR", "GKTO_BEZ", "SOLL", "HABEN", "SALDO_S_H", "JOURNAL_NR"]
+
+
+def run_network(df, workdir: Path) -> None:
+    build_network_analysis(
+        str(workdir / "graph.html"),
+        df.copy(),
+        *COLS,
+        materiality=10_000,
+        kategorisierer=fake_kategorie_bestimmen,
+    )
+
+
+def run_worksheet(df, workdir: Path, kontenplan, vorjahr, folgejahr) -> None:
+    mapping_path = workdir / "mapping.xlsx"
+    if not mapping_path.exists():
+        generate_mapping(kontenplan).to_excel(mapping_path, index=False)
+    build_working_paper(
+        df1=vorjahr,
+        df2=df,
+        df3=folgejahr,
+        col_konto="KONTO_NR",
+        col_saldo="SALDO_S_H",
+        col_datum="BELEG_DAT",
+        mapping_path=mapping_path,
+        output_path=workdir / "Umsatzanalyse.xlsx",
+        template_path=TEMPLATE_PATH,
+        mus_sample_size=10,
+        cut_off_sample_size=5,
+        materiality=10_000,
+    )
+
+
+def run_mus(df, workdir: Path) -> None:
+    with stage("mus_sampling", rows_in=len(df)):
+        mus_sampling_with_given_sample_size(df, "SALDO_S_H", sample_size=100, seed=42)
+    with stage("mus_sampling_select", rows_in=len(df)):
+        mus_sampling_with_given_sample_size(df, "SALDO_S_H", sample_size=100, seed=42, mode="select")
+    chunksize = 1_000_000
+    chunks = lambda: (df.iloc[i:i + chunksize] for i in range(0, len(df), chunksize))
+    with stage("mus_sampling_streaming", rows_in=len(df)):
+        mus_sampling_with_given_sample_size_streaming(chunks, "SALDO_S_H", sample_size=100, seed=42)
+
+
+def check_mus_streaming(df, n_chunks: int = 7) -> None:
+    """
+    Die chunkweise Ziehung muss über Chunkgrenzen hinweg dieselben Zeilen treffen wie
+    ``mus_sampling_with_given_sample_size(..., order="original")``; ungemessen.
+    """
+    chunksize = -(-len(df) // n_chunks)
+    chunks = lambda: (df.iloc[i:i + chunksize] for i in range(0, len(df), chunksize))
+    for seed in (0, 42):
+        for sample_size in (1, 100, len(df) // 10 + 1):
+            erwartet = mus_sampling_with_given_sample_size(
+                df, "SALDO_S_H", sample_size=sample_size, seed=seed, order="original")
+            gezogen = mus_sampling_with_given_sample_size_streaming(
+                chunks, "SALDO_S_H", sample_size=sample_size, seed=seed)
+            pd.testing.assert_frame_equal(gezogen, erwartet, obj=f"MUS seed={seed} n={sample_size}")
+
+
+def measure(suite: str, func, *args) -> dict:
+    """Führt ``func`` instrumentiert aus und gibt die Wall-Zeit je Stufe zurück."""
+    report = enable()
+    start = time.perf_counter()
+    try:
+        func(*args)
+    finally:
+        disable()
+    timings = {suite: time.perf_counter() - start}
+    for s in report.stages:
+        name = f"{suite}.{s['name']}"
+        timings[name] = timings.get(name, 0.0) + s["wall_s"]
+    return timings
+
+
+def get_git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_history(path: Path) -> list:
+    if not path.exists():
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def find_regressions(results: list, history: list, threshold: float, window: int) -> list:
+    """Messungen, die mehr als ``threshold`` mal über dem Median der letzten ``window`` Läufe liegen."""
+    regressions = []
+    for r in results:
+        if r["status"] != "ok":
+            continue
+        previous = [
+            h["seconds"] for h in history
+            if h["benchmark"] == r["benchmark"]
+            and h["n_rows"] == r["n_rows"]
+            and h["host"] == r["host"]
+            and h["status"] == "ok"
+        ][-window:]
+        if not previous:
+            continue
+        median = statistics.median(previous)
+        # sehr kurze Stufen schwanken zu stark für einen Vergleich
+        if r["seconds"] > threshold * median and r["seconds"] - median > 0.05:
+            regressions.append({**r, "median_s": round(median, 6)})
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--suites", nargs="+", default=list(DEFAULT_MAX_ROWS), choices=list(DEFAULT_MAX_ROWS))
+    parser.add_argument("--max-rows", nargs="*", default=[], metavar="SUITE=N",
+                        help="Größte Journalgröße je Suite, z.B. network=1000000")
+    parser.add_argument("--accounts", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--history", type=Path, default=HISTORY_PATH)
+    parser.add_argument("--threshold", type=float, default=1.25)
+    parser.add_argument("--window", type=int, default=5)
+    parser.add_argument("--no-record", action="store_true", help="Ergebnisse nicht speichern")
+    args = parser.parse_args(argv)
+
+    max_rows = dict(DEFAULT_MAX_ROWS)
+    for item in args.max_rows:
+        suite, _, n = item.partition("=")
+        max_rows[suite] = int(n) if n else None
+
+    meta = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": get_git_commit(),
+        "host": platform.node(),
+        "python": platform.python_version(),
+    }
+    kontenplan = generate_kontenplan(args.accounts, seed=args.seed)
+    results = []
+    abweichungen = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+        for n_rows in args.sizes:
+            df = generate_journal(n_rows, seed=args.seed, kontenplan=kontenplan)
+            for suite in args.suites:
+                limit = max_rows.get(suite)
+                if limit is not None and n_rows > limit:
+                    results.append({**meta, "benchmark": suite, "n_rows": n_rows,
+                                    "seconds": None, "status": "skipped"})
+                    continue
+                if suite == "network":
+                    timings = measure(suite, run_network, df, workdir)
+                elif suite == "worksheet":
+                    # Vor- und Folgejahr mit eigenen Belegdaten, sonst bleibt das Cut-off-Fenster leer
+                    vorjahr = generate_journal(n_rows, seed=args.seed + 1, start="2022-01-01", kontenplan=kontenplan)
+                    folgejahr = generate_journal(n_rows, seed=args.seed + 2, start="2024-01-01", kontenplan=kontenplan)
+                    timings = measure(suite, run_worksheet, df, workdir, kontenplan, vorjahr, folgejahr)
+                    del vorjahr, folgejahr
+                else:
+                    timings = measure(suite, run_mus, df, workdir)
+                    try:
+                        check_mus_streaming(df)
+                    except AssertionError as e:
+                        abweichungen.append(f"{n_rows} Zeilen: {e}")
+                for name, seconds in timings.items():
+                    results.append({**meta, "benchmark": name, "n_rows": n_rows,
+                                    "seconds": round(seconds, 6), "status": "ok"})
+            del df
+
+    history = load_history(args.history)
+    regressions = find_regressions(results, history, args.threshold, args.window)
+
+    print(f"\n{'Benchmark':<55}{'Zeilen':>12}{'Sekunden':>12}")
+    for r in results:
+        seconds = "übersprungen" if r["seconds"] is None else f"{r['seconds']:.3f}"
+        print(f"{r['benchmark']:<55}{r['n_rows']:>12}{seconds:>12}")
+
+    if not args.no_record:
+        args.history.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.history, "a", encoding="utf-8") as f:
+            for r in results:
+                f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+    if abweichungen:
+        print("\nChunkweise MUS-Ziehung weicht von der Ziehung im Speicher ab:")
+        for a in abweichungen:
+            print(f"  {a}")
+        return 2
+    if regressions:
+        print(f"\n{len(regressions)} Regression(en) gegenüber dem Median der letzten Läufe:")
+        for r in regressions:
+            print(f"  {r['benchmark']} ({r['n_rows']} Zeilen): "
+                  f"{r['seconds']:.3f}s statt {r['median_s']:.3f}s")
+        return 1
+    print("\nKeine Regressionen.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+
+__all__ = ["generate_kontenplan", "generate_journal", "generate_mapping", "fake_kategorie_bestimmen"]
+
+# Spaltennamen wie im Musterjournal
+SPALTEN = {
+    "KONTO_NR":   "string",
+    "KONTO_BEZ":  "string",
+    "GKTO_NR":    "string",
+    "GKTO_BEZ":   "string",
+    "SOLL":       "float64",
+    "HABEN":      "float64",
+    "SALDO_S_H":  "float64",
+    "JOURNAL_NR": "string",
+    "BELEG_DAT":  "string",
+}
+
+# Kontengruppen: Präfix der Kontonummer, Kategorie für die Gegenkontoanalyse,
+# Kennzeichen im Mapping (u/m) und Anteil am Kontenplan
+_GRUPPEN = [
+    ("10", "Sonstige Aktiva",      None, 0.08),
+    ("12", "Debitoren",            None, 0.15),
+    ("13", "Sonstige Forderungen", None, 0.03),
+    ("18", "Zahlungsmittel",       None, 0.02),
+    ("20", "Sonstige Passiva",     None, 0.05),
+    ("24", "Kreditoren",           None, 0.15),
+    ("25", "Umsatzsteuer",         None, 0.01),
+    ("36", "Verrechnungskonten",   None, 0.02),
+    ("40", "Aufwand",              None, 0.20),
+    ("70", "Aufwand",              "m",  0.08),
+    ("80", "Umsatzerlöse",         "u",  0.15),
+    ("85", "Sonstige Erlöse",      None, 0.03),
+    ("90", "Eröffnungskonten",     None, 0.03),
+]
+
+# Geschäftsvorfälle: (Präfix Soll, Präfix Haben, Gewicht)
+_VORFAELLE = [
+    ("12", "80", 0.30),  # Verkauf
+    ("12", "25", 0.05),  # Umsatzsteuer auf Verkauf
+    ("18", "12", 0.20),  # Zahlungseingang
+    ("70", "24", 0.12),  # Materialeinkauf
+    ("40", "24", 0.12),  # Aufwand
+    ("24", "18", 0.12),  # Zahlungsausgang
+    ("40", "36", 0.03),  # Umbuchung über Verrechnungskonto
+    ("12", "85", 0.02),  # sonstige Erlöse
+    ("10", "90", 0.02),  # Eröffnungsbuchung
+    ("13", "20", 0.02),  # sonstige Vorgänge
+]
+
+_FAKE_KATEGORIEN = {prefix: kategorie for prefix, kategorie, _, _ in _GRUPPEN}
+
+
+def generate_kontenplan(n_accounts: int = 200, n_sections: int = 2, seed: int = 0) -> pd.DataFrame:
+    """Kontenplan mit Spalten nr, name, kategorie, kennzeichen und sparte, nach Gruppe sortiert."""
+    rng = np.random.default_rng(seed)
+    anteile = np.array([g[3] for g in _GRUPPEN])
+    anzahl = np.maximum(1, np.round(anteile / anteile.sum() * n_accounts).astype(int))
+
+    teile = []
+    for (prefix, kategorie, kennzeichen, _), n in zip(_GRUPPEN, anzahl):
+        laufnr = np.sort(rng.choice(100_000, size=n, replace=False))
+        nr = [f"{prefix}{i:05d}" for i in laufnr]
+        sparte = (
+            [f"Sparte {i % n_sections + 1}" for i in range(n)]
+            if kennzeichen is not None and n_sections > 0 else [None] * n
+        )
+        teile.append(pd.DataFrame({
+            "nr": nr,
+            "name": [f"{kategorie} {j + 1}" for j in range(n)],
+            "prefix": prefix,
+            "kategorie": kategorie,
+            "kennzeichen": kennzeichen,
+            "sparte": sparte,
+        }))
+    return pd.concat(teile, ignore_index=True)
+
+
+def generate_journal(
+    n_rows: int = 10_000,
+    n_accounts: int = 200,
+    div_ratio: float = 0.1,
+    negative_ratio: float = 0.02,
+    n_sections: int = 2,
+    start: str = "2023-01-01",
+    spread_days: int = 365,
+    seed: int = 0,
+    kontenplan: pd.DataFrame | None = None,
+) -> pd.DataFrame:
+    """
+    Deterministisches, synthetisches Buchungsjournal in doppelter Buchführung
+    (Spalten wie das Musterjournal), das die Journalaufbereitung besteht.
+
+    - ``n_rows``: ungefähre Zeilenzahl (es werden nur vollständige Journale erzeugt)
+    - ``div_ratio``: Anteil der Journale mit Sammelzeile "div"/ohne Gegenkonto
+    - ``negative_ratio``: Anteil der Buchungszeilen mit negativen Beträgen (Storno)
+    - ``n_sections``: Anzahl Sparten der Umsatz- und Materialkonten
+    - ``start``/``spread_days``: Belegdaten gleichverteilt ab ``start``
+    """
+    rng = np.random.default_rng(seed)
+    if kontenplan is None:
+        kontenplan = generate_kontenplan(n_accounts, n_sections, seed)
+
+    # Konten je Gruppe liegen zusammenhängend im Kontenplan
+    gruppen_start = kontenplan.groupby("prefix", sort=False).indices
+    g_start = {p: idx[0] for p, idx in gruppen_start.items()}
+    g_anzahl = {p: len(idx) for p, idx in gruppen_start.items()}
+
+    # ~4 Zeilen je Journal
+    n_journals = max(1, n_rows // 4)
+    gewichte = np.array([v[2] for v in _VORFAELLE])
+    vorfall = rng.choice(len(_VORFAELLE), size=n_journals, p=gewichte / gewichte.sum())
+    is_div = rng.random(n_journals) < div_ratio
+    n_lines = np.where(is_div, rng.integers(2, 5, n_journals), rng.integers(1, 4, n_journals))
+
+    # Buchungszeilen (Soll-Konto, Haben-Konto, Betrag) je Journal
+    line_j = np.repeat(np.arange(n_journals), n_lines)
+    line_vorfall = vorfall[line_j]
+    soll_prefix = np.array([v[0] for v in _VORFAELLE])[line_vorfall]
+    haben_prefix = np.array([v[1] for v in _VORFAELLE])[line_vorfall]
+
+    def _ziehe_konten(prefixe: np.ndarray) -> np.ndarray:
+        start_pos = np.array([g_start[p] for p in prefixe]) if len(prefixe) else np.array([], int)
+        anzahl = np.array([g_anzahl[p] for p in prefixe]) if len(prefixe) else np.array([], int)
+        return start_pos + (rng.random(len(prefixe)) * anzahl).astype(int)
+
+    soll_konto = _ziehe_konten(soll_prefix)
+    haben_konto = _ziehe_konten(haben_prefix)
+    # Sammeljournale: ein gemeinsames Haben-Konto je Journal
+    erste_zeile = np.cumsum(n_lines) - n_lines
+    haben_konto = np.where(is_div[line_j], haben_konto[erste_zeile][line_j], haben_konto)
+
+    betrag = np.round(rng.lognormal(mean=7.0, sigma=1.5, size=len(line_j)), 2)
+    betrag = np.where(rng.random(len(line_j)) < negative_ratio, -betrag, betrag)
+
+    # Normale Zeilen: Buchung und Spiegelbuchung
+    normal = ~is_div[line_j]
+    nj = line_j[normal]
+    nb = betrag[normal]
+    teile = [
+        (nj, soll_konto[normal], haben_konto[normal], nb, 0.0 * nb),
+        (nj, haben_konto[normal], soll_konto[normal], 0.0 * nb, nb),
+    ]
+
+    # Sammeljournale: Einzelzeilen gegen das Sammelkonto und eine Div-Zeile
+    dj = line_j[~normal]
+    db = betrag[~normal]
+    teile.append((dj, soll_konto[~normal], haben_konto[~normal], db, 0.0 * db))
+    div_journale = np.flatnonzero(is_div)
+    div_summe = np.bincount(line_j, weights=np.where(normal, 0.0, betrag), minlength=n_journals)
+    teile.append((
+        div_journale,
+        haben_konto[erste_zeile[div_journale]],
+        np.full(len(div_journale), -1),
+        np.zeros(len(div_journale)),
+        np.round(div_summe[div_journale], 2),
+    ))
+
+    journal = np.concatenate([t[0] for t in teile])
+    kto = np.concatenate([t[1] for t in teile])
+    gkto = np.concatenate([t[2] for t in teile])
+    soll = np.concatenate([t[3] for t in teile])
+    haben = np.concatenate([t[4] for t in teile])
+    order = np.argsort(journal, kind="stable")
+    journal, kto, gkto, soll, haben = journal[order], kto[order], gkto[order], soll[order], haben[order]
+
+    nr = kontenplan["nr"].to_numpy(dtype=object)
+    name = kontenplan["name"].to_numpy(dtype=object)
+    ist_div = gkto < 0
+    # Sammelzeilen je zur Hälfte mit "div" und ohne Gegenkonto
+    div_text = np.where(journal % 2 == 0, "div", None)
+    gkto_nr = np.where(ist_div, div_text, nr[np.maximum(gkto, 0)])
+    gkto_name = np.where(ist_div, None, name[np.maximum(gkto, 0)])
+
+    tage = rng.integers(0, spread_days, n_journals)
+    datum = (pd.Timestamp(start) + pd.to_timedelta(tage, unit="D")).strftime("%Y-%m-%d 00:00:00")
+
+    df = pd.DataFrame({
+        "KONTO_NR": nr[kto],
+        "KONTO_BEZ": name[kto],
+        "GKTO_NR": gkto_nr,
+        "GKTO_BEZ": gkto_name,
+        "SOLL": soll,
+        "HABEN": haben,
+        "SALDO_S_H": np.round(soll - haben, 2),
+        "JOURNAL_NR": (journal + 100_000).astype(str),
+        "BELEG_DAT": np.asarray(datum, dtype=object)[journal],
+    })
+    return df.astype(SPALTEN)
+
+
+def generate_mapping(kontenplan: pd.DataFrame) -> pd.DataFrame:
+    """Mappingtabelle wie Mustermapping.xlsx (Kontonummer, Kontoname, Kategorie, Sparte)."""
+    return pd.DataFrame({
+        "Kontonummer": kontenplan["nr"],
+        "Kontoname": kontenplan["name"],
+        "Kategorie": kontenplan["kennzeichen"],
+        "Sparte": kontenplan["sparte"],
+    }).astype("string")
+
+
+def fake_kategorie_bestimmen(
+    kontonummer: str,
+    kontobezeichnung: str,
+    gegenkontoinfo: str = "",
+    nachbarkonten: str = "",
+) -> str:
+    """Lokaler Ersatz für die KI-Kategorisierung anhand des Präfixes der synthetischen Konten."""
+    return _FAKE_KATEGORIEN.get(str(kontonummer)[:2], "Sonstige Aktiva")
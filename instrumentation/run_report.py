@@ -0,0 +1,235 @@
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Union
+
+import numpy as np
+
+__all__ = [
+    "enable",
+    "disable",
+    "get_run_report",
+    "stage",
+    "record_latency",
+    "profiled_run",
+    "RunReport",
+]
+
+# Aktiver Report, None = Instrumentierung aus (Standard)
+_report = None
+
+
+class _Stage:
+    """Messwerte einer Stufe; ``rows_out`` und ``extra`` können im with-Block gesetzt werden."""
+
+    __slots__ = ("name", "rows_in", "rows_out", "extra")
+
+    def __init__(self, name: str, rows_in: Optional[int] = None):
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.extra = {}
+
+
+# Platzhalter bei ausgeschalteter Instrumentierung, Zuweisungen bleiben folgenlos
+_NULL_STAGE = _Stage("")
+
+
+class RunReport:
+    """Sammelt die Messwerte aller Stufen eines Laufs."""
+
+    def __init__(self, trace_memory: bool = False, otel: bool = False):
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self.trace_memory = trace_memory
+        self.stages = []
+        self.latencies = {}
+        self._stack = []
+        self._next_id = 0
+        self._tracer = _get_otel_tracer() if otel else None
+
+    def to_dict(self) -> dict:
+        return {
+            "started": self.started,
+            "stages": self.stages,
+            "latencies": {
+                name: _summarize_latencies(values) for name, values in self.latencies.items()
+            },
+        }
+
+    def to_json(self, path: Union[str, Path]) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+
+    def spans(self) -> list:
+        """Die Stufen als Spans im Stil von OpenTelemetry (Zeiten in Nanosekunden)."""
+        trace_id = os.urandom(16).hex()
+        return [
+            {
+                "trace_id": trace_id,
+                "span_id": f"{s['id']:016x}",
+                "parent_span_id": None if s["parent"] is None else f"{s['parent']:016x}",
+                "name": s["name"],
+                "start_time_unix_nano": s["start_ns"],
+                "end_time_unix_nano": s["start_ns"] + int(s["wall_s"] * 1e9),
+                "attributes": {
+                    k: v for k, v in s.items()
+                    if k not in {"id", "parent", "name", "start_ns"} and v is not None
+                },
+            }
+            for s in self.stages
+        ]
+
+
+def enable(trace_memory: bool = False, otel: bool = False) -> RunReport:
+    """
+    Schaltet die Instrumentierung ein und gibt den neuen Report zurück.
+
+    ``trace_memory`` misst zusätzlich Speicherzuwachs und -spitze je Stufe über
+    tracemalloc (spürbarer Overhead). ``otel`` erzeugt zusätzlich echte
+    OpenTelemetry-Spans, sofern das Paket opentelemetry installiert ist.
+    """
+    global _report
+    _report = RunReport(trace_memory=trace_memory, otel=otel)
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return _report
+
+
+def disable() -> Optional[RunReport]:
+    """Schaltet die Instrumentierung aus und gibt den bisherigen Report zurück."""
+    global _report
+    report, _report = _report, None
+    if report is not None and report.trace_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    return report
+
+
+def get_run_report() -> Optional[RunReport]:
+    return _report
+
+
+@contextmanager
+def stage(name: str, rows_in: Optional[int] = None):
+    """
+    Misst Wall- und CPU-Zeit, optional tracemalloc-Differenz sowie Zeilenzahlen
+    der umschlossenen Stufe. ``process_peak_rss_mb`` ist die Spitzen-RSS des
+    Prozesses seit seinem Start (nicht der Stufe), ``peak_rss_delta_mb`` deren
+    Anstieg während der Stufe (0, wenn die Stufe unter der bisherigen Spitze
+    bleibt). Ohne ``enable`` nahezu kostenlos.
+    """
+    report = _report
+    if report is None:
+        yield _NULL_STAGE
+        return
+
+    s = _Stage(name, rows_in)
+    report._next_id += 1
+    record = {"id": report._next_id, "parent": report._stack[-1] if report._stack else None}
+    report._stack.append(record["id"])
+    span = report._tracer.start_as_current_span(name) if report._tracer else None
+    if span is not None:
+        span.__enter__()
+    if report.trace_memory:
+        mem_start = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+    rss_start = _get_peak_rss_mb()
+    start_ns = time.time_ns()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    try:
+        yield s
+    finally:
+        rss_end = _get_peak_rss_mb()
+        record.update(
+            name=name,
+            start_ns=start_ns,
+            wall_s=round(time.perf_counter() - wall, 6),
+            cpu_s=round(time.process_time() - cpu, 6),
+            process_peak_rss_mb=rss_end,
+            peak_rss_delta_mb=None if rss_end is None else round(rss_end - rss_start, 1),
+            rows_in=s.rows_in,
+            rows_out=s.rows_out,
+        )
+        if report.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            record["tracemalloc_delta_mb"] = round((current - mem_start) / 2**20, 3)
+            record["tracemalloc_peak_mb"] = round((peak - mem_start) / 2**20, 3)
+        record.update(s.extra)
+        report.stages.append(record)
+        report._stack.pop()
+        if span is not None:
+            for k, v in record.items():
+                if v is not None and k not in {"id", "parent", "name", "start_ns"}:
+                    span.set_attribute(k, v)
+            span.__exit__(None, None, None)
+
+
+def record_latency(name: str, seconds: float) -> None:
+    """Erfasst eine Einzellatenz (z.B. je API-Aufruf) für die Perzentile im Report."""
+    if _report is not None:
+        _report.latencies.setdefault(name, []).append(seconds)
+
+
+@contextmanager
+def profiled_run(path: Optional[Union[str, Path]] = None):
+    """
+    Instrumentiert den umschlossenen Lauf und schreibt den Report als JSON nach
+    ``path``. Ohne ``path`` oder bei bereits aktiver Instrumentierung bleibt der
+    bestehende Zustand unverändert.
+    """
+    if path is None or _report is not None:
+        yield _report
+        return
+    report = enable()
+    try:
+        yield report
+    finally:
+        disable()
+        report.to_json(path)
+
+
+def _summarize_latencies(values: list) -> dict:
+    arr = np.asarray(values, dtype="float64")
+    p50, p90, p99 = np.percentile(arr, [50, 90, 99])
+    return {
+        "n": int(arr.size),
+        "mean_s": round(float(arr.mean()), 6),
+        "p50_s": round(float(p50), 6),
+        "p90_s": round(float(p90), 6),
+        "p99_s": round(float(p99), 6),
+        "max_s": round(float(arr.max()), 6),
+    }
+
+
+def _get_peak_rss_mb() -> Optional[float]:
+    """Spitzen-RSS des Prozesses seit dessen Start in MB (Unix über resource, sonst psutil falls vorhanden)."""
+    try:
+        import resource
+        import sys
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS liefert Bytes, Linux Kilobytes
+        return round(peak / 2**20 if sys.platform == "darwin" else peak / 2**10, 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+
+        info = psutil.Process().memory_info()
+        return round(getattr(info, "peak_wset", info.rss) / 2**20, 1)
+    except ImportError:
+        return None
+
+
+def _get_otel_tracer():
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        print("opentelemetry ist nicht installiert, es werden nur Spans im Report erzeugt.")
+        return None
+    return trace.get_tracer("auditrevenue")
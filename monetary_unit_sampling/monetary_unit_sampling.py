@@ -1,14 +1,76 @@
 import numpy as np
 import pandas as pd
-from typing import Union, Optional
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Union, Optional
+
+
+@dataclass(frozen=True)
+class MusSelection:
+    """
+    Leichtgewichtiges Ergebnis einer MUS-Ziehung ohne Kopie der Eingabedaten.
+
+    Enthält nur die Positionen (0..n-1) der gezogenen Zeilen in Reihenfolge der
+    Schwellenwerte (eine Zeile kann mehrfach getroffen werden). Markierte oder
+    gefilterte Ausgaben werden erst bei Bedarf über ``filter`` bzw. ``mark``
+    und nur für die benötigten Zeilen und Spalten erzeugt.
+    """
+
+    positions: np.ndarray
+    n_rows: int
+
+    @cached_property
+    def mask(self) -> np.ndarray:
+        """Boolesche Maske über alle Zeilen, True = gezogen."""
+        mask = np.zeros(self.n_rows, dtype=bool)
+        mask[self.positions] = True
+        return mask
+
+    def filter(
+        self,
+        data: Union[pd.Series, pd.DataFrame],
+        columns: Optional[list] = None,
+    ) -> Union[pd.Series, pd.DataFrame]:
+        """Gibt nur die gezogenen Zeilen zurück, Index = Position in ``data``."""
+        if isinstance(data, pd.DataFrame) and columns is not None:
+            result = data.iloc[self.positions, data.columns.get_indexer(columns)]
+        else:
+            result = data.iloc[self.positions]
+        result.index = self.positions
+        return result
+
+    def mark(
+        self,
+        data: Union[pd.Series, pd.DataFrame],
+        columns: Optional[list] = None,
+        rows: Optional[Union[slice, np.ndarray]] = None,
+        mus_col: str = "MUS",
+    ) -> pd.DataFrame:
+        """
+        Gibt die Zeilen ``rows`` (Positionen, Standard: alle) mit den Spalten
+        ``columns`` (Standard: alle) zurück und markiert die gezogenen mit "x"
+        in Spalte ``mus_col``. Index = Position in ``data``.
+        """
+        df = data.to_frame(name=data.name) if isinstance(data, pd.Series) else data
+        if columns is not None:
+            df = df[columns]
+        if rows is None:
+            rows = slice(None)
+        df = df.iloc[rows].copy()
+        df.index = np.arange(self.n_rows)[rows]
+        df[mus_col] = np.where(self.mask[rows], "x", "")
+        return df
+
 
 def mus_sampling_with_given_sample_size(
     data: Union[pd.Series, pd.DataFrame],
     amount_col: Optional[str] = None,
     sample_size: int = 1,
     mode: str = "filter",
-    seed: Optional[int] = None
-) -> Union[pd.Series, pd.DataFrame]:
+    seed: Optional[int] = None,
+    order: str = "amount",
+) -> Union[pd.Series, pd.DataFrame, MusSelection]:
     """
     Systematisches Monetary Unit Sampling (PPS) mit korrektem Handling negativer Werte
     und beliebigem Index.
@@ -23,15 +85,23 @@ def mus_sampling_with_given_sample_size(
         Spaltenname der Beträge (bei DataFrame).
     sample_size : int
         Anzahl der zu ziehenden Einheiten.
-    mode : {"filter", "mark"}
+    mode : {"filter", "mark", "select"}
         - "filter": gibt nur die gezogenen Zeilen zurück
         - "mark":   gibt alle Zeilen zurück und markiert die gezogenen mit "x" in Spalte "MUS"
+        - "select": gibt nur eine ``MusSelection`` (Positionen und Maske) zurück,
+                    ohne die Eingabedaten zu kopieren
     seed : int, optional
         Zufallsseed für Reproduzierbarkeit.
+    order : {"amount", "original"}
+        - "amount":   kumuliert nach absoluten Beträgen aufsteigend sortiert
+                      (Sortierung wie bisher mit ``np.argsort``, fehlende Beträge
+                      zuletzt; bei gleichem Seed also dieselben Zeilen wie zuvor)
+        - "original": kumuliert in der gegebenen Zeilenreihenfolge (wie die
+                      Streaming-Variante in Dateireihenfolge)
 
     Returns
     -------
-    pd.Series or pd.DataFrame
+    pd.Series, pd.DataFrame or MusSelection
     """
     # --- Input-Validation ---------------------------------------------------
     if isinstance(data, pd.DataFrame):
@@ -53,19 +123,171 @@ def mus_sampling_with_given_sample_size(
         raise TypeError("Die Betragsspalte muss numerisch sein.")
     if sample_size < 1:
         raise ValueError("`sample_size` muss mindestens 1 sein.")
-    if mode not in {"filter", "mark"}:
-        raise ValueError("`mode` muss 'filter' oder 'mark' sein.")
+    if mode not in {"filter", "mark", "select"}:
+        raise ValueError("`mode` muss 'filter', 'mark' oder 'select' sein.")
+    if order not in {"amount", "original"}:
+        raise ValueError("`order` muss 'amount' oder 'original' sein.")
 
-    # --- Reset Index und Betragsserie vorbereiten --------------------------
-    # Klaren Integer-Index 0..n-1, sonst u.U. ValueError
-    if isinstance(data, pd.DataFrame):
-        df = data.reset_index(drop=True).copy()
-    else:  # pd.Series
-        df = data.reset_index(drop=True).to_frame(name=series.name)
+    # Positionen ermitteln, Positionen 0..n-1 entsprechen einem zurückgesetzten Index
+    sel_positions = _get_selected_positions(
+        series.to_numpy(dtype="float64", na_value=np.nan),
+        sample_size=sample_size,
+        seed=seed,
+        order=order,
+    )
+    selection = MusSelection(positions=sel_positions, n_rows=len(series))
+
+    # --- Ausgabe ------------------------------------------------------------
+    if mode == "select":
+        return selection
+    if mode == "filter":
+        # nur die ausgewählten Zeilen
+        return selection.filter(data)
+
+    # mode == "mark"
+    # Series: zurück als DataFrame mit MUS-Spalte
+    return selection.mark(data)
+
+
+def mus_sampling_with_given_sample_size_streaming(
+    chunks: Union[str, Path, Callable[[], Iterable[pd.DataFrame]]],
+    amount_col: str,
+    sample_size: int = 1,
+    seed: Optional[int] = None,
+    chunksize: int = 1_000_000,
+) -> pd.DataFrame:
+    """
+    Monetary Unit Sampling (PPS) für Journale, die nicht in den Speicher passen.
+
+    Arbeitet in zwei Durchläufen über die Chunks:
+    1. Gesamtsumme der absoluten Beträge kumulieren und Schwellenwerte ziehen
+    2. Chunk für Chunk die getroffenen Zeilen auswählen
+
+    Es wird in Dateireihenfolge kumuliert. Das Ergebnis ist identisch mit
+    ``mus_sampling_with_given_sample_size(..., mode="filter", order="original")``
+    bei gleicher Reihenfolge und gleichem Seed. Soll nach Beträgen kumuliert
+    werden, muss die Datei vorab nach dem absoluten Betrag sortiert sein (z.B.
+    über einen vorberechneten Sortierschlüssel); gleich hohe Beträge können dann
+    andere Zeilen treffen als mit ``order="amount"``. ``benchmarks.run_benchmarks``
+    prüft die Übereinstimmung über mehrere Chunks.
+
+    Im Speicher gehalten werden nur ein Chunk und die gezogenen Zeilen.
+
+    Parameters
+    ----------
+    chunks : str, Path oder Callable
+        Pfad zu einer CSV-/Parquet-Datei oder eine Funktion, die bei jedem
+        Aufruf einen neuen Iterator über DataFrame-Chunks liefert.
+    amount_col : str
+        Spaltenname der Beträge.
+    sample_size : int
+        Anzahl der zu ziehenden Einheiten.
+    seed : int, optional
+        Zufallsseed für Reproduzierbarkeit.
+    chunksize : int
+        Zeilen je Chunk beim Lesen aus einer Datei.
+
+    Returns
+    -------
+    pd.DataFrame
+        Die gezogenen Zeilen, Index = Position im Gesamtjournal.
+    """
+    if sample_size < 1:
+        raise ValueError("`sample_size` muss mindestens 1 sein.")
+
+    if isinstance(chunks, (str, Path)):
+        path = chunks
+        get_amount_chunks = lambda: (
+            c[amount_col] for c in iter_journal_chunks(path, chunksize, usecols=[amount_col])
+        )
+        get_chunks = lambda: iter_journal_chunks(path, chunksize)
+    elif callable(chunks):
+        get_amount_chunks = lambda: (c[amount_col] for c in chunks())
+        get_chunks = chunks
+    else:
+        raise TypeError("`chunks` muss ein Pfad oder eine Funktion sein, die Chunks liefert.")
+
+    # --- 1. Durchlauf: Gesamtsumme -----------------------------------------
+    total = 0.0
+    n_rows = 0
+    for amounts in get_amount_chunks():
+        if not np.issubdtype(amounts.dtype, np.number):
+            raise TypeError("Die Betragsspalte muss numerisch sein.")
+        amt = _get_absolute_amounts(amounts.to_numpy(dtype="float64", na_value=np.nan))
+        if len(amt) == 0:
+            continue
+        # sequentiell kumulieren, damit die Summe bitgleich zur In-Memory-Variante ist
+        total = np.cumsum(np.concatenate(([total], amt)))[-1]
+        n_rows += len(amt)
+
+    if n_rows == 0:
+        return pd.DataFrame()
+
+    thresholds = _get_thresholds(total, sample_size, seed)
+
+    # --- 2. Durchlauf: getroffene Zeilen auswählen --------------------------
+    selected = []
+    next_threshold = 0
+    offset = 0.0
+    position = 0
+    last_row = None
+    for chunk in get_chunks():
+        if chunk.empty:
+            continue
+        amt = _get_absolute_amounts(chunk[amount_col].to_numpy(dtype="float64", na_value=np.nan))
+        cum = np.cumsum(np.concatenate(([offset], amt)))[1:]
+
+        end = np.searchsorted(thresholds, cum[-1], side="right")
+        if end > next_threshold:
+            local_pos = np.searchsorted(cum, thresholds[next_threshold:end])
+            hits = chunk.iloc[local_pos]
+            hits.index = position + local_pos
+            selected.append(hits)
+            next_threshold = end
+
+        offset = cum[-1]
+        position += len(chunk)
+        last_row = chunk.iloc[[-1]].set_axis([position - 1])
+
+    # Rundungsreste hinter der letzten Zeile treffen die letzte Zeile
+    if next_threshold < sample_size:
+        selected.append(pd.concat([last_row] * (sample_size - next_threshold)))
 
+    return pd.concat(selected)
+
+
+def iter_journal_chunks(
+    path: Union[str, Path],
+    chunksize: int = 1_000_000,
+    usecols: Optional[list] = None,
+    dtype: Optional[dict] = None,
+) -> Iterator[pd.DataFrame]:
+    """Liest eine CSV- oder Parquet-Datei chunkweise ein (Parquet benötigt das optionale Paket pyarrow)."""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        yield from pd.read_csv(path, chunksize=chunksize, usecols=usecols, dtype=dtype)
+    elif suffix in {".parquet", ".pq"}:
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise ImportError("Zum chunkweisen Lesen von Parquet-Dateien wird das Paket pyarrow benötigt.") from e
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=usecols):
+            chunk = batch.to_pandas()
+            yield chunk.astype(dtype) if dtype else chunk
+    else:
+        raise ValueError(f"Nicht unterstütztes Dateiformat: {path.suffix}")
+
+
+def _get_absolute_amounts(amounts: np.ndarray) -> np.ndarray:
+    """Absolute Beträge, fehlende Beträge zählen als 0."""
+    return np.nan_to_num(np.abs(amounts), nan=0.0)
+
+
+def _get_thresholds(total: float, sample_size: int, seed: Optional[int]) -> np.ndarray:
+    """Zieht den Zufallsstart und gibt die Schwellenwerte im Abstand des Intervalls zurück."""
     # Ermittlung der Intervalle
-    amt = df[series.name].abs()
-    total = amt.sum()
     interval = total / sample_size
 
     # Zufallsstart
@@ -74,24 +296,27 @@ def mus_sampling_with_given_sample_size(
     start = np.random.uniform(0, interval)
 
     # Schwellenwerte
-    thresholds = start + interval * np.arange(sample_size)
+    return start + interval * np.arange(sample_size)
 
-    # Sortieren nach absoluten Beträgen und kumulieren
-    sorted_pos = np.argsort(amt.values)
-    cum = amt.values[sorted_pos].cumsum()
 
-    # Positionen ermitteln
-    sel_positions = [ sorted_pos[np.searchsorted(cum, t)] for t in thresholds ]
+def _get_selected_positions(
+    amounts: np.ndarray,
+    sample_size: int,
+    seed: Optional[int] = None,
+    order: str = "amount",
+) -> np.ndarray:
+    """Ermittelt die Positionen (0..n-1) der gezogenen Zeilen in Reihenfolge der Schwellenwerte."""
+    amt = _get_absolute_amounts(amounts)
 
-    # --- Ausgabe ------------------------------------------------------------
-    if mode == "filter":
-        # nur die ausgewählten Zeilen
-        result = df.iloc[sel_positions]
-        # wenn Series ursprünglich, gib es als Series zurück
-        return result[series.name] if isinstance(data, pd.Series) else result
+    # Sortieren nach absoluten Beträgen wie bisher (Standard-argsort, fehlende Beträge am
+    # Ende), damit gleiche Beträge bei gleichem Seed dieselben Zeilen treffen
+    if order == "amount":
+        sorted_pos = np.argsort(np.abs(amounts))
+    else:
+        sorted_pos = np.arange(len(amt))
+    cum = np.cumsum(amt[sorted_pos])
 
-    # mode == "mark"
-    df["MUS"] = ""
-    df.iloc[sel_positions, df.columns.get_loc("MUS")] = "x"
-    # Series: zurück als DataFrame mit MUS-Spalte
-    return df if isinstance(data, pd.DataFrame) else df
+    thresholds = _get_thresholds(cum[-1], sample_size, seed)
+
+    hit = np.minimum(np.searchsorted(cum, thresholds), len(cum) - 1)
+    return sorted_pos[hit]
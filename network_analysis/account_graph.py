@@ -0,0 +1,201 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+__all__ = ["AccountGraph"]
+
+WERTE = ("soll", "haben", "saldo")
+
+
+class AccountGraph:
+    """
+    Das nach Konto und Gegenkonto aggregierte Journal als dünn besetzte,
+    gewichtete Adjazenzmatrix (CSR).
+
+    Alle Kanten (Zeilen des Aggregats) liegen nach Konto gruppiert in gemeinsamen
+    ``indptr``/``indices``-Arrays; Soll, Haben und Saldo sind die Werte dreier
+    Matrizen mit derselben Struktur. Innerhalb eines Kontos bleibt die
+    Reihenfolge des Aggregats erhalten, ``zeilen`` verweist je Kante auf die
+    Zeile des Aggregats (für Bezeichnungen und weitere Spalten).
+
+    - ``kanten(konto)``: Positionen der Kanten eines Kontos in O(1)
+    - ``check_mirror_pairs``: Spiegelpaar-Prüfung (A gegen Aᵀ) ohne Merge
+    - ``block_sums``: Summen zwischen Kontenkategorien
+    - ``save_npz``/``load_npz``: Serialisierung
+    """
+
+    def __init__(self, konten: pd.Index, indptr, indices, zeilen, soll, haben, saldo):
+        self.konten = pd.Index(konten)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.zeilen = np.asarray(zeilen, dtype=np.int64)
+        self.werte = {
+            "soll": np.asarray(soll, dtype="float64"),
+            "haben": np.asarray(haben, dtype="float64"),
+            "saldo": np.asarray(saldo, dtype="float64"),
+        }
+        self._reihenfolge = {}
+
+    @classmethod
+    def from_aggregate(cls, df: pd.DataFrame, kto_nr, gkto_nr, soll, haben=None, saldo=None) -> "AccountGraph":
+        """
+        Erstellt den Graphen aus dem aggregierten Journal (eine Zeile je Konto und
+        Gegenkonto). Die Konten sind in der Reihenfolge ihres ersten Auftretens
+        (erst Konto, dann Gegenkonto) indiziert; Zeilen ohne Konto bzw.
+        Gegenkonto werden ausgelassen. Ohne ``haben``/``saldo`` sind deren Werte NaN.
+        """
+        konten = pd.Index(pd.unique(pd.concat([df[kto_nr], df[gkto_nr]], ignore_index=True).dropna()))
+        quelle = konten.get_indexer(df[kto_nr])
+        ziel = konten.get_indexer(df[gkto_nr])
+        zeilen = np.flatnonzero((quelle >= 0) & (ziel >= 0))
+        zeilen = zeilen[np.argsort(quelle[zeilen], kind="stable")]
+
+        indptr = np.zeros(len(konten) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(quelle[zeilen], minlength=len(konten)), out=indptr[1:])
+        werte = [
+            df[col].to_numpy(dtype="float64", na_value=np.nan)[zeilen] if col is not None else np.full(len(zeilen), np.nan)
+            for col in (soll, haben, saldo)
+        ]
+        return cls(konten, indptr, ziel[zeilen], zeilen, *werte)
+
+    @property
+    def n_konten(self) -> int:
+        return len(self.konten)
+
+    @property
+    def n_kanten(self) -> int:
+        return len(self.indices)
+
+    def matrix(self, wert: str = "soll") -> sparse.csr_matrix:
+        """Gewichtete Adjazenzmatrix (Konto x Gegenkonto) für "soll", "haben" oder "saldo"."""
+        if wert not in WERTE:
+            raise ValueError(f"`wert` muss einer von {WERTE} sein.")
+        return sparse.csr_matrix(
+            (self.werte[wert], self.indices, self.indptr), shape=(self.n_konten, self.n_konten)
+        )
+
+    def position(self, konto) -> int:
+        """Index des Kontos in ``konten`` (KeyError, falls unbekannt)."""
+        return self.konten.get_loc(konto)
+
+    def kanten(self, konto) -> slice:
+        """Positionen der Kanten mit ``konto`` als Konto."""
+        i = self.position(konto)
+        return slice(self.indptr[i], self.indptr[i + 1])
+
+    def gegenkonten(self, konto, wert: str = "soll") -> pd.Series:
+        """Beträge je Gegenkonto von ``konto``."""
+        kanten = self.kanten(konto)
+        return pd.Series(self.werte[wert][kanten], index=self.konten[self.indices[kanten]], name=wert)
+
+    def sortierte_kanten(self, konto, wert: str = "soll") -> np.ndarray:
+        """Kanten von ``konto`` absteigend nach ``wert`` (bei Gleichstand in Reihenfolge des Aggregats)."""
+        if wert not in self._reihenfolge:
+            quelle = np.repeat(np.arange(self.n_konten), np.diff(self.indptr))
+            self._reihenfolge[wert] = np.lexsort((-self.werte[wert], quelle))
+        kanten = self.kanten(konto)
+        return self._reihenfolge[wert][kanten]
+
+    def ausgangsgrad(self) -> np.ndarray:
+        """Anzahl Kanten je Konto als Konto."""
+        return np.diff(self.indptr)
+
+    def eingangsgrad(self) -> np.ndarray:
+        """Anzahl Kanten je Konto als Gegenkonto."""
+        return np.bincount(self.indices, minlength=self.n_konten)
+
+    def gegenkonto_werte(self, werte: pd.Series, n_zeilen: int) -> np.ndarray:
+        """
+        Wert des Gegenkontos (z.B. dessen Kategorie aus ``werte``, Index = Konto)
+        je Zeile des Aggregats mit ``n_zeilen`` Zeilen; fehlende Werte ergeben NaN.
+        """
+        je_konto = werte[~werte.index.duplicated()].reindex(self.konten).to_numpy(dtype=object)
+        ergebnis = np.full(n_zeilen, np.nan, dtype=object)
+        ergebnis[self.zeilen] = je_konto[self.indices]
+        return ergebnis
+
+    def finde_kanten(self, quelle, ziel) -> np.ndarray:
+        """
+        Position der Kante ``quelle`` -> ``ziel`` (Indizes in ``konten``, z.B. aus
+        ``konten.get_indexer``) je Element, -1 falls es keine gibt.
+        """
+        quelle = np.asarray(quelle, dtype=np.int64)
+        ziel = np.asarray(ziel, dtype=np.int64)
+        if self.n_kanten == 0:
+            return np.full(len(quelle), -1, dtype=np.int64)
+        kanten_quelle = np.repeat(np.arange(self.n_konten, dtype=np.int64), np.diff(self.indptr))
+        schluessel = kanten_quelle * self.n_konten + self.indices
+        gesucht = quelle * self.n_konten + ziel
+
+        sortiert = np.argsort(schluessel, kind="stable")
+        pos = np.minimum(np.searchsorted(schluessel[sortiert], gesucht), self.n_kanten - 1)
+        gefunden = (quelle >= 0) & (ziel >= 0) & (schluessel[sortiert[pos]] == gesucht)
+        return np.where(gefunden, sortiert[pos], -1)
+
+    def gegenkanten(self) -> np.ndarray:
+        """Position der Gegenkante (Gegenkonto -> Konto) je Kante, -1 falls es keine gibt."""
+        quelle = np.repeat(np.arange(self.n_konten, dtype=np.int64), np.diff(self.indptr))
+        return self.finde_kanten(self.indices, quelle)
+
+    def check_mirror_pairs(self, atol: float = 0.1) -> np.ndarray:
+        """
+        Kanten, deren Gegenkante existiert, aber nicht spiegelbildlich ist
+        (Saldo = -Saldo der Gegenkante, Soll = Haben der Gegenkante und umgekehrt).
+        """
+        gegen = self.gegenkanten()
+        mit_gegen = gegen >= 0
+        g = gegen[mit_gegen]
+        soll, haben, saldo = (self.werte[w] for w in WERTE)
+        abweichend = (
+            ~np.isclose(saldo[mit_gegen], -saldo[g], atol=atol)
+            | ~np.isclose(soll[mit_gegen], haben[g], atol=atol)
+            | ~np.isclose(haben[mit_gegen], soll[g], atol=atol)
+        )
+        bad = np.zeros(self.n_kanten, dtype=bool)
+        bad[np.flatnonzero(mit_gegen)[abweichend]] = True
+        return bad
+
+    def block_sums(self, kategorien: pd.Series, wert: str = "soll") -> pd.DataFrame:
+        """
+        Summen von ``wert`` zwischen den Kategorien der Konten (``kategorien``,
+        Index = Konto): Zeilen = Kategorie des Kontos, Spalten = Kategorie des
+        Gegenkontos. Konten ohne Kategorie bleiben unberücksichtigt.
+        """
+        codes, namen = pd.factorize(kategorien[~kategorien.index.duplicated()].reindex(self.konten))
+        gueltig = codes >= 0
+        P = sparse.csr_matrix(
+            (np.ones(gueltig.sum()), (np.flatnonzero(gueltig), codes[gueltig])),
+            shape=(self.n_konten, len(namen)),
+        )
+        bloecke = (P.T @ self.matrix(wert) @ P).toarray()
+        return pd.DataFrame(
+            bloecke,
+            index=pd.Index(namen, name="kategorie"),
+            columns=pd.Index(namen, name="gegenkategorie"),
+        )
+
+    def save_npz(self, path) -> None:
+        """Speichert Kontenindex, CSR-Struktur und Werte komprimiert als ``.npz``."""
+        konten = self.konten.to_numpy()
+        if konten.dtype == object:
+            konten = konten.astype(str)
+        np.savez_compressed(
+            path,
+            konten=konten,
+            indptr=self.indptr,
+            indices=self.indices,
+            zeilen=self.zeilen,
+            **self.werte,
+        )
+
+    @classmethod
+    def load_npz(cls, path) -> "AccountGraph":
+        """Lädt einen mit ``save_npz`` gespeicherten Graphen."""
+        with np.load(path, allow_pickle=False) as daten:
+            return cls(
+                pd.Index(daten["konten"]),
+                daten["indptr"],
+                daten["indices"],
+                daten["zeilen"],
+                *(daten[w] for w in WERTE),
+            )
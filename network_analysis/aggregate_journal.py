@@ -1,9 +1,12 @@
 import pandas as pd
 
 from network_analysis.check_journal import check_if_sum_soll_and_sum_haben_are_equal, check_if_only_mirror_pairs
+from network_analysis.period_cube import get_period_totals
+from instrumentation.run_report import stage
 
-def _get_journal_grouped_by_kto_and_gkto(df, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo)-> pd.DataFrame:
-    """Gruppiert das Journal nach Konto und Gegenkonto und summiert die Beträge."""
+def _get_journal_grouped_by_kto_and_gkto(df, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, runden: bool = True)-> pd.DataFrame:
+    """Gruppiert das Journal nach Konto und Gegenkonto und summiert die Beträge
+    (ohne ``runden`` ungerundet, z.B. für Teilaggregate, die noch zusammengeführt werden)."""
     df = (
         df
         .groupby([kto_nr, gkto_nr], as_index=False)
@@ -14,6 +17,8 @@ def _get_journal_grouped_by_kto_and_gkto(df, kto_nr, kto_name, gkto_nr, gkto_nam
             haben: "sum",
             saldo: "sum"
         }))
+    if not runden:
+        return df
     df[soll]  = df[soll].round(2)
     df[haben] = df[haben].round(2)
     df[saldo] = df[saldo].round(2)
@@ -32,7 +37,34 @@ def get_nodes_and_edges_by_aggregating_journal(
     saldo: str = "BETRAG_SALDO"
     ) -> pd.DataFrame:
     """Benötigt ein normales Journal (mit 100% Gegenkontenquote) und ermittelt die gerichteten Kanten für die Gegenkontoanalyse."""
-    agg = _get_journal_grouped_by_kto_and_gkto(df, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo)
-    check_if_only_mirror_pairs(agg, kto_nr, gkto_nr, soll, haben, saldo)
-    check_if_sum_soll_and_sum_haben_are_equal(agg, soll, haben)
-    return agg
\ No newline at end of file
+    with stage("aggregate_kto_gkto", rows_in=len(df)) as s:
+        agg = _get_journal_grouped_by_kto_and_gkto(df, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo)
+        s.rows_out = len(agg)
+    _check_aggregate(agg, kto_nr, gkto_nr, soll, haben, saldo)
+    return agg
+
+
+def get_nodes_and_edges_from_period_cube(
+    cube: pd.DataFrame,
+    kto_nr: str,
+    kto_name: str,
+    gkto_nr: str,
+    gkto_name: str,
+    soll: str,
+    haben: str,
+    saldo: str,
+    ) -> pd.DataFrame:
+    """Aggregat je Konto und Gegenkonto als Summe des Periodenwürfels (``get_period_cube``) über alle
+    Perioden, mit denselben Prüfungen wie ``get_nodes_and_edges_by_aggregating_journal``."""
+    with stage("aggregate_period_cube", rows_in=len(cube)) as s:
+        agg = get_period_totals(cube, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo)
+        s.rows_out = len(agg)
+    _check_aggregate(agg, kto_nr, gkto_nr, soll, haben, saldo)
+    return agg
+
+
+def _check_aggregate(agg: pd.DataFrame, kto_nr, gkto_nr, soll, haben, saldo) -> None:
+    with stage("check_if_only_mirror_pairs", rows_in=len(agg)):
+        check_if_only_mirror_pairs(agg, kto_nr, gkto_nr, soll, haben, saldo)
+    with stage("check_if_sum_soll_and_sum_haben_are_equal", rows_in=len(agg)):
+        check_if_sum_soll_and_sum_haben_are_equal(agg, soll, haben)
\ No newline at end of file
@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import Union
+
+from network_analysis.check_journal import check_if_only_mirror_pairs
+
+__all__ = ["JournalAggregateStore"]
+
+
+class JournalAggregateStore:
+    """
+    Fortschreibbarer Speicher des nach Konto und Gegenkonto aggregierten Journals
+    für unterjährige Prüfungen.
+
+    Hält die (kto, gkto)-Summen von Soll, Haben und Saldo, den Kontenrahmen, die
+    bereits bestimmten Kontenkategorien und die Prüfsummen. Neue (aufbereitete)
+    Buchungen werden mit ``append`` eingemischt; der Aufwand hängt nur vom Umfang
+    der neuen Buchungen und der Anzahl der Kontenpaare ab, nicht vom kumulierten
+    Journal. Prüfungen, Kategorisierung und Graph werden nur für die Konten
+    erneuert, deren Kanten sich geändert haben.
+    """
+
+    def __init__(self, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, journal_nr):
+        self.kto_nr = kto_nr
+        self.kto_name = kto_name
+        self.gkto_nr = gkto_nr
+        self.gkto_name = gkto_name
+        self.soll = soll
+        self.haben = haben
+        self.saldo = saldo
+        self.journal_nr = journal_nr
+
+        self.agg = pd.DataFrame(
+            columns=[kto_name, gkto_name, soll, haben, saldo],
+            index=pd.MultiIndex.from_arrays([[], []], names=[kto_nr, gkto_nr]),
+        )
+        self.kto_rahmen = pd.Series(dtype="object", name=kto_name)
+        self.kategorien = pd.Series(dtype="object", name="kto_kategorie")
+        self.journale = set()
+        self.counters = {"zeilen": 0, "summe_soll": 0.0, "summe_haben": 0.0}
+        self.graph = None
+        self.geaenderte_konten = set()
+
+    def append(self, df: pd.DataFrame) -> set:
+        """
+        Mischt ein aufbereitetes Journal (Ausgabe von ``prepare_journal``) ein und
+        gibt die Konten zurück, deren Kanten sich dadurch geändert haben.
+        """
+        neue_journale = set(df[self.journal_nr].dropna().unique())
+        doppelt = neue_journale & self.journale
+        if doppelt:
+            raise ValueError(
+                f"{len(doppelt)} JOURNAL_NR sind bereits im Speicher enthalten "
+                f"(z.B. {sorted(doppelt)[:5]}). Wurde der Auszug doppelt geladen?"
+            )
+
+        delta = (
+            df
+            .groupby([self.kto_nr, self.gkto_nr])
+            .agg({
+                self.kto_name: "first",
+                self.gkto_name: "first",
+                self.soll: "sum",
+                self.haben: "sum",
+                self.saldo: "sum",
+            })
+        )
+
+        summen = [self.soll, self.haben, self.saldo]
+        delta[summen] = delta[summen].astype("float64")
+        if self.agg.empty:
+            self.agg = delta
+        else:
+            # bekannte Kontenpaare: nur deren Zeilen fortschreiben, Bezeichnungen bleiben
+            # (entspricht "first" über das kumulierte Journal); neue Paare anhängen
+            pos = self.agg.index.get_indexer(delta.index)
+            bekannt = pos >= 0
+            spalten = [self.agg.columns.get_loc(col) for col in summen]
+            self.agg.iloc[pos[bekannt], spalten] = (
+                self.agg.iloc[pos[bekannt], spalten].to_numpy() + delta[summen].to_numpy()[bekannt]
+            )
+            if not bekannt.all():
+                self.agg = pd.concat([self.agg, delta[~bekannt]])
+
+        kto_namen = delta.reset_index().groupby(self.kto_nr)[self.kto_name].first()
+        if self.kto_rahmen.empty:
+            self.kto_rahmen = kto_namen
+        else:
+            neu = kto_namen.index.difference(self.kto_rahmen.index)
+            if len(neu):
+                self.kto_rahmen = pd.concat([self.kto_rahmen, kto_namen.loc[neu]])
+        self.journale |= neue_journale
+        self.counters["zeilen"] += len(df)
+        self.counters["summe_soll"] += float(df[self.soll].sum())
+        self.counters["summe_haben"] += float(df[self.haben].sum())
+
+        konten = set(delta.index.get_level_values(0)) | set(delta.index.get_level_values(1))
+        self.geaenderte_konten |= konten
+        return konten
+
+    def get_aggregate(self) -> pd.DataFrame:
+        """Aggregiertes Journal wie ``get_nodes_and_edges_by_aggregating_journal``."""
+        agg = self.agg.sort_index().reset_index()
+        for col in [self.soll, self.haben, self.saldo]:
+            agg[col] = agg[col].round(2)
+        return agg
+
+    def check(self, konten=None) -> None:
+        """
+        Prüft die Spiegelpaare (nur für Kanten der ``konten``, Standard: die seit der
+        letzten Aktualisierung geänderten) und die Gleichheit der Soll- und
+        Habensummen über die Prüfsummen.
+        """
+        konten = self.geaenderte_konten if konten is None else set(konten)
+        agg = self.get_aggregate()
+        teil = agg[agg[self.kto_nr].isin(konten) | agg[self.gkto_nr].isin(konten)]
+        check_if_only_mirror_pairs(teil, self.kto_nr, self.gkto_nr, self.soll, self.haben, self.saldo)
+
+        sum_soll = self.counters["summe_soll"]
+        sum_haben = self.counters["summe_haben"]
+        if not np.isclose(sum_soll, sum_haben, atol=0.50):
+            raise ValueError(f"Die Summen von {self.soll} und {self.haben} stimmen nicht überein: "
+                             f"{sum_soll} != {sum_haben}")
+        else:
+            print("Kumulierte Soll- und Habensummen stimmen überein")
+
+    def categorize(self, kategorisierer=None) -> pd.DataFrame:
+        """
+        Kategorisiert nur die noch unbekannten Konten und gibt das aggregierte
+        Journal mit Spalte "kto_kategorie" zurück (wie ``categorize_kto``).
+        """
+        from network_analysis.categorize_kto import get_kto_kategorien
+
+        agg = self.get_aggregate()
+        kto_rahmen = self.kto_rahmen.rename_axis(self.kto_nr).reset_index()
+        neu = self.kto_rahmen.index.difference(self.kategorien.index)
+        if len(neu) > 0:
+            kategorien = get_kto_kategorien(
+                kto_rahmen,
+                self.kto_nr,
+                self.kto_name,
+                agg,
+                self.kto_nr,
+                self.gkto_name,
+                self.soll,
+                nur_konten=neu,
+                kategorisierer=kategorisierer,
+            )
+            self.kategorien = pd.concat([self.kategorien, kategorien])
+
+        return agg.merge(
+            self.kategorien.rename_axis(self.kto_nr).reset_index(), on=self.kto_nr, how="left"
+        )
+
+    def update_graph(self, agg_categorized: pd.DataFrame, schwelle: float = 0):
+        """Erstellt den Graphen bzw. erneuert ihn für die geänderten Konten."""
+        from network_analysis.generate_network import generate_network_graph, update_network_graph
+
+        cols = (
+            self.kto_nr, self.kto_name, self.gkto_nr, self.gkto_name,
+            self.soll, self.haben, self.saldo, "kto_kategorie",
+        )
+        if self.graph is None:
+            self.graph = generate_network_graph(agg_categorized, *cols, schwelle)
+        else:
+            self.graph = update_network_graph(
+                self.graph, agg_categorized, self.geaenderte_konten, *cols, schwelle
+            )
+        self.geaenderte_konten = set()
+        return self.graph
+
+    def save(self, path: Union[str, Path]) -> None:
+        pd.to_pickle(self, path)
+
+    @classmethod
+    def load(cls, path: Union[str, Path]) -> "JournalAggregateStore":
+        return pd.read_pickle(path)
@@ -1,10 +1,17 @@
+import uuid
+
 import pandas as pd
+from pathlib import Path
 
 from network_analysis.prepare_journal import prepare_journal
-from network_analysis.aggregate_journal import get_nodes_and_edges_by_aggregating_journal
+from network_analysis.prepare_parallel import prepare_and_aggregate_parallel
+from network_analysis.aggregate_journal import get_nodes_and_edges_by_aggregating_journal, get_nodes_and_edges_from_period_cube
 from network_analysis.generate_kto_rahmen import generate_kto_rahmen
 from network_analysis.categorize_kto import categorize_kto
-from network_analysis.generate_network import build_network
+from network_analysis.generate_network import TOOLTIP_GEGENKONTEN, build_network, get_network_graph, visualize_graph
+from network_analysis.aggregate_store import JournalAggregateStore
+from network_analysis.period_cube import get_period_cube
+from instrumentation.run_report import profiled_run, stage
 
 def build_network_analysis(
         destination_path:str, 
@@ -17,10 +24,77 @@ def build_network_analysis(
         haben,
         saldo,
         journal_nr,
-        materiality:int = 0) -> None:
+        materiality:int = 0,
+        run_report_path: str | None = None,
+        kategorisierer=None,
+        datum: str | None = None,
+        periode: str = "M",
+        analytics: bool = False,
+        div_modus: str = "fehler",
+        max_workers: int | None = None,
+        intermediates: dict | None = None,
+        renderer: str = "pyvis",
+        max_gegenkonten: int | None = TOOLTIP_GEGENKONTEN,
+        drilldown: bool = True) -> None:
+    """Gegenkontoanalyse als Netzwerkgraph. Mit ``run_report_path`` werden Laufzeit,
+    Speicher und Zeilenzahlen je Stufe gemessen und als JSON dorthin geschrieben.
+    ``kategorisierer`` ersetzt die KI-Kategorisierung der Konten (siehe ``categorize_kto``).
+    Mit ``datum`` (Spalte des Belegdatums) wird zusätzlich je Monat bzw. Quartal
+    (``periode``) aggregiert und der Graph erhält einen Schieberegler über die Perioden.
+    ``analytics`` ergänzt Netzwerkkennzahlen und Risikohinweise (siehe ``build_network``).
+    ``div_modus`` "proportional" teilt Buchungssätze mit mehreren Div-Zeilen anteilig auf.
+    Mit ``max_workers`` werden Aufbereitung und Aggregation nach JOURNAL_NR partitioniert
+    auf so viele Prozesse verteilt (siehe ``prepare_and_aggregate_parallel``).
+    ``intermediates`` nimmt die Zwischenstände auf (siehe ``get_network_intermediates``);
+    liegt der Graph dort bereits vor, wird er für ``materiality`` nur umgefärbt.
+    ``renderer="webgl"`` zeichnet große Graphen mit WebGL (nicht zusammen mit ``datum``).
+    Tooltips nennen die ``max_gegenkonten`` größten Gegenkonten je Seite; mit
+    ``drilldown`` erhält jedes Konto eine eigene Seite mit allen Gegenkonten."""
+
+    if datum is not None and renderer != "pyvis":
+        raise ValueError("Der Schieberegler über die Perioden ist nur mit dem Renderer 'pyvis' verfügbar.")
+
+    with profiled_run(run_report_path):
+        result = get_network_intermediates(
+            dataframe, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, journal_nr,
+            kategorisierer=kategorisierer, datum=datum, periode=periode, div_modus=div_modus,
+            max_workers=max_workers, result=intermediates)
+        agg_categorized, cube = result["categorized"], result.get("cube")
+
+        kto_kategorie = "kto_kategorie"  #Wird in categorize_kto so gesetzt
+
+        # Graph ohne Schwelle einmal erstellen, eine neue Schwelle färbt nur um
+        if "graph" not in result or result["graph"].graph.get("max_gegenkonten") != max_gegenkonten:
+            result["graph"] = get_network_graph(
+                agg_categorized, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, kto_kategorie,
+                max_gegenkonten=max_gegenkonten)
 
-    df_clean = prepare_journal(
-        dataframe,
+        build_network(
+            agg_categorized,
+            kto_nr,
+            kto_name,
+            gkto_nr,
+            gkto_name,
+            soll,
+            haben,
+            saldo,
+            kto_kategorie,
+            destination_path,
+            materiality,
+            cube=cube,
+            analytics=analytics,
+            renderer=renderer,
+            G=result["graph"],
+            max_gegenkonten=max_gegenkonten,
+            drilldown=drilldown,
+            max_workers=max_workers,
+            # Kontenseiten hängen nicht von der Schwelle ab: je Zwischenstand nur einmal schreiben
+            drilldown_key=result.setdefault("drilldown_key", uuid.uuid4().hex),
+            )
+
+
+def get_network_intermediates(
+        dataframe: pd.DataFrame,
         kto_nr,
         kto_name,
         gkto_nr,
@@ -28,37 +102,91 @@ def build_network_analysis(
         soll,
         haben,
         saldo,
-        journal_nr)
-    
-    agg = get_nodes_and_edges_by_aggregating_journal(
-        df_clean,
-        kto_nr,
-        kto_name,
-        gkto_nr,
-        gkto_name,
-        soll,
-        haben,
-        saldo)
+        journal_nr,
+        kategorisierer=None,
+        datum: str | None = None,
+        periode: str = "M",
+        div_modus: str = "fehler",
+        max_workers: int | None = None,
+        result: dict | None = None,
+        kategorisieren: bool = True) -> dict:
+    """Zwischenstände der Gegenkontoanalyse bis vor das Zeichnen des Graphen:
+    - "prepared":    aufbereitetes Journal (mit ``max_workers`` nur zusammen mit ``datum``)
+    - "cube":        Periodenwürfel (nur mit ``datum``)
+    - "aggregate":   Aggregat je Konto und Gegenkonto
+    - "kto_rahmen":  Kontenrahmen
+    - "categorized": Aggregat mit Kategorie je Konto ("kto_kategorie")
+    - "graph":       Graph (``get_network_graph``), erst von ``build_network_analysis`` ergänzt
+    - "drilldown_key": Schlüssel der dazu geschriebenen Kontenseiten, ebenso
 
-    kto_rahmen = generate_kto_rahmen(agg, kto_nr, kto_name)
-    agg_categorized = categorize_kto(
-        kto_rahmen, 
-        kto_nr,
-        kto_name,
-      
-        agg,
-        kto_nr,
-        kto_name,
-        gkto_nr,
-        gkto_name,
-        soll,
-        haben,
-        saldo)
+    Mit ``result`` (dict) werden dort vorhandene Zwischenstände übernommen und nur
+    die fehlenden berechnet und ergänzt; gehören sie zu anderen Spalten oder
+    Parametern, wird neu berechnet. Das Journal selbst muss dasselbe sein.
+    Ohne ``kategorisieren`` endet die Berechnung nach dem Aggregat (ohne KI-Aufrufe).
+    """
+    if result is None:
+        result = {}
+    cols = (kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, journal_nr)
+    params = (cols, datum, periode, div_modus, kategorisierer)
+    if result.get("params") != params:
+        result.clear()
+        result["params"] = params
+
+    if "aggregate" not in result or (datum is not None and "prepared" not in result):
+        if max_workers is not None:
+            with stage("prepare_journal_parallel", rows_in=len(dataframe)) as s:
+                ergebnis = prepare_and_aggregate_parallel(
+                    dataframe, *cols,
+                    datum=datum, periode=periode, div_modus=div_modus, max_workers=max_workers,
+                    journal=datum is not None)
+                if datum is not None:
+                    # das Aggregat wird unten aus dem Periodenwürfel abgeleitet
+                    result["prepared"], _ = ergebnis
+                    s.rows_out = len(result["prepared"])
+                else:
+                    result["aggregate"] = ergebnis
+                    s.rows_out = len(result["aggregate"])
+        else:
+            with stage("prepare_journal", rows_in=len(dataframe)) as s:
+                result["prepared"] = prepare_journal(
+                    dataframe, *cols, datum=datum, periode=periode, div_modus=div_modus)
+                s.rows_out = len(result["prepared"])
+
+    if datum is not None and "cube" not in result:
+        with stage("period_cube", rows_in=len(result["prepared"])) as s:
+            result["cube"] = get_period_cube(result["prepared"], kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo)
+            s.rows_out = len(result["cube"])
+        result.pop("aggregate", None)
+
+    if "aggregate" not in result:
+        if datum is not None:
+            result["aggregate"] = get_nodes_and_edges_from_period_cube(
+                result["cube"], kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo)
+        else:
+            result["aggregate"] = get_nodes_and_edges_by_aggregating_journal(
+                result["prepared"], kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo)
+
+    if not kategorisieren:
+        return result
 
-    kto_kategorie = "kto_kategorie"  #Wird in categorize_kto so gesetzt
+    if "kto_rahmen" not in result:
+        with stage("generate_kto_rahmen", rows_in=len(result["aggregate"])) as s:
+            result["kto_rahmen"] = generate_kto_rahmen(result["aggregate"], kto_nr, kto_name)
+            s.rows_out = len(result["kto_rahmen"])
 
-    build_network(
-        agg_categorized,
+    if "categorized" not in result:
+        with stage("categorize_kto", rows_in=len(result["kto_rahmen"])):
+            result["categorized"] = categorize_kto(
+                result["kto_rahmen"], kto_nr, kto_name,
+                result["aggregate"], kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo,
+                kategorisierer=kategorisierer)
+
+    return result
+
+def update_network_analysis(
+        destination_path:str,
+        store_path:str,
+        dataframe: pd.DataFrame,
         kto_nr,
         kto_name,
         gkto_nr,
@@ -66,7 +194,42 @@ def build_network_analysis(
         soll,
         haben,
         saldo,
-        kto_kategorie,
-        destination_path,
-        materiality
-        )
\ No newline at end of file
+        journal_nr,
+        materiality:int = 0,
+        kategorisierer=None,
+        run_report_path: str | None = None) -> None:
+    """Schreibt die Gegenkontoanalyse mit einem neuen Journalauszug (nur die neuen
+    Buchungen) fort. Aggregat, Kategorien und Graph liegen in ``store_path`` und
+    werden nur für die Konten mit geänderten Kanten erneuert. Mit ``run_report_path``
+    wird der Lauf wie in ``build_network_analysis`` gemessen."""
+
+    with profiled_run(run_report_path):
+        if Path(store_path).exists():
+            store = JournalAggregateStore.load(store_path)
+        else:
+            store = JournalAggregateStore(kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, journal_nr)
+
+        df_clean = prepare_journal(
+            dataframe,
+            kto_nr,
+            kto_name,
+            gkto_nr,
+            gkto_name,
+            soll,
+            haben,
+            saldo,
+            journal_nr)
+
+        with stage("aggregate_store_append", rows_in=len(df_clean)) as s:
+            konten = store.append(df_clean)
+            s.extra["geaenderte_konten"] = len(konten)
+        with stage("aggregate_store_check"):
+            store.check()
+        with stage("categorize_kto"):
+            agg_categorized = store.categorize(kategorisierer)
+        with stage("update_network_graph"):
+            G = store.update_graph(agg_categorized, materiality)
+        with stage("visualize_graph"):
+            visualize_graph(G, destination_path)
+
+        store.save(store_path)
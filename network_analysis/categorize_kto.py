@@ -1,14 +1,24 @@
-from typing import Literal
+from functools import lru_cache
+from typing import Callable, Iterable, Literal
 from pydantic import BaseModel
 from openai import OpenAI
 import pandas as pd
 from dotenv import load_dotenv
 import os
+import time
 
-__all__ = ["categorize_kto"]
+from instrumentation.run_report import record_latency
+
+__all__ = ["categorize_kto", "get_kto_kategorien"]
 
 load_dotenv()
-client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+
+
+@lru_cache(maxsize=1)
+def _get_client() -> OpenAI:
+    # erst beim ersten API-Aufruf anlegen, damit ein eigener Kategorisierer ohne API-Key auskommt
+    return OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+
 
 # Kategorien-Schema via Pydantic
 
@@ -123,7 +133,7 @@ Du musst und darfst ausschließlich mit einer Kategorie der Liste antworten.
 """,
     }
 
-    response = client.responses.parse(
+    response = _get_client().responses.parse(
         model="gpt-4o-2024-08-06",
         input=[system_msg, user_msg],
         text_format=KontoKategorie,
@@ -132,22 +142,34 @@ Du musst und darfst ausschließlich mit einer Kategorie der Liste antworten.
     return response.output_parsed.kategorie
 
 
-def categorize_kto(
+def get_kto_kategorien(
     df_konten: pd.DataFrame,
     df_konten_kto,
     df_konten_kto_name,
     df_bewegungen: pd.DataFrame | None = None,
     df_bewegungen_kto: str | None = None,
-    df_bewegungen_kto_name: str | None = None,
-    df_bewegungen_gkto: str | None = None,
     df_bewegungen_gkto_name: str | None = None,
     df_bewegungen_soll: str | None = None,
-    df_bewegungen_haben: str | None = None,
-    df_bewegugnen_saldo: str | None = None,
-) -> pd.DataFrame:
+    nur_konten: Iterable | None = None,
+    kategorisierer: Callable[..., str] | None = None,
+) -> pd.Series:
+    """Bestimmt die Kategorie je Konto des Kontenrahmens (Index = Kontonummer).
+
+    Mit ``nur_konten`` werden nur diese Konten kategorisiert; als Nachbarkonten
+    dient weiterhin der vollständige Kontenrahmen.
+
+    ``kategorisierer`` ersetzt den KI-Aufruf (gleiche Signatur wie
+    ``_call_ai_kategorie_bestimmen``), z.B. für Benchmarks ohne API.
+    """
+    if kategorisierer is None:
+        kategorisierer = _call_ai_kategorie_bestimmen
+
+    df_auswahl = df_konten
+    if nur_konten is not None:
+        df_auswahl = df_konten[df_konten[df_konten_kto].isin(list(nur_konten))]
 
     kategorien = []
-    for _, row in df_konten.iterrows():
+    for _, row in df_auswahl.iterrows():
         konto = row[df_konten_kto]
         name = row[df_konten_kto_name]
 
@@ -164,10 +186,43 @@ def categorize_kto(
             df_konten, konto, df_konten_kto, df_konten_kto_name, n=3
         )
 
-        kategorie = _call_ai_kategorie_bestimmen(konto, name, gegen_info, nachbarkonten)
+        start = time.perf_counter()
+        kategorie = kategorisierer(konto, name, gegen_info, nachbarkonten)
+        record_latency("categorize_kto.api", time.perf_counter() - start)
         kategorien.append(kategorie)
+
+    return pd.Series(
+        kategorien, index=df_auswahl[df_konten_kto].to_numpy(), name="kto_kategorie", dtype="object"
+    )
+
+
+def categorize_kto(
+    df_konten: pd.DataFrame,
+    df_konten_kto,
+    df_konten_kto_name,
+    df_bewegungen: pd.DataFrame | None = None,
+    df_bewegungen_kto: str | None = None,
+    df_bewegungen_kto_name: str | None = None,
+    df_bewegungen_gkto: str | None = None,
+    df_bewegungen_gkto_name: str | None = None,
+    df_bewegungen_soll: str | None = None,
+    df_bewegungen_haben: str | None = None,
+    df_bewegugnen_saldo: str | None = None,
+    kategorisierer: Callable[..., str] | None = None,
+) -> pd.DataFrame:
+
+    kategorien = get_kto_kategorien(
+        df_konten,
+        df_konten_kto,
+        df_konten_kto_name,
+        df_bewegungen,
+        df_bewegungen_kto,
+        df_bewegungen_gkto_name,
+        df_bewegungen_soll,
+        kategorisierer=kategorisierer,
+    )
     df_result = df_konten.copy()
-    df_result["kto_kategorie"] = kategorien
+    df_result["kto_kategorie"] = kategorien.to_list()
 
     agg_categorized = df_bewegungen.merge(
         df_result[[df_konten_kto, "kto_kategorie"]], on=df_konten_kto, how="left"
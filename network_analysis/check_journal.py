@@ -1,29 +1,47 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime
+from typing import Optional
+
+from network_analysis.account_graph import AccountGraph
+from network_analysis.journal_segments import JournalSegments
 
 
 def test_saldo_je_journalnummer(
     df: pd.DataFrame,
     journal_nr: str,          # Spaltenname für Journalnummern
     saldo: str,        # Spaltenname für Beträge
-    tol: float = 1         # Toleranz für Rundungsdifferenzen
+    tol: float = 1,         # Toleranz für Rundungsdifferenzen
+    segments: Optional[JournalSegments] = None,   # Journalindex von df (sonst hier erstellt)
 ) -> None:
     """
     Kontrolliert, ob jeder Buchungssatz (pro JOURNAL_NR) wieder Summe Null ergibt.
     Schreibt alle fehlerhaften Journale in eine Excel-Datei.
     """
+    _report_saldo_je_journalnummer(*_get_saldo_je_journalnummer_fehler(df, journal_nr, saldo, tol, segments))
+
+
+def _get_saldo_je_journalnummer_fehler(df, journal_nr, saldo, tol=1, segments=None) -> tuple:
+    """Journale mit Restsaldo > ``tol`` (JOURNAL_NR und Saldo) und deren Buchungen."""
+    if segments is None:
+        segments = JournalSegments.from_frame(df, journal_nr)
+    segments.check(df)
+
     # Summen je Journal ermitteln
-    saldo_check = df.groupby(journal_nr, as_index=False)[saldo].sum()
+    summen = segments.sum(df[saldo], name=saldo)
 
     # Journale mit Restsaldo > Toleranz
-    bad = saldo_check[saldo_check[saldo].abs() > tol]
+    bad_segments = np.flatnonzero(segments.valid & (np.abs(summen) > tol))
 
+    bad = pd.DataFrame({journal_nr: segments.keys[bad_segments], saldo: summen[bad_segments]})
+    output = df[np.isin(segments.codes, bad_segments)]
+    return bad, output
+
+
+def _report_saldo_je_journalnummer(bad: pd.DataFrame, output: pd.DataFrame) -> None:
     if not bad.empty:
         print("Fehler: Folgende JOURNAL_NR haben nach Aufbereitung keinen Nullsaldo:")
         print(bad)
-        bad_journale = bad[journal_nr]
-        output = df[df[journal_nr].isin(bad_journale)]
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"Journalnummern_nicht_null_{timestamp}.xlsx"
         output.to_excel(filename, index=False)
@@ -37,40 +55,57 @@ def test_ob_jede_buchung_umgedreht_doppelt(df: pd.DataFrame,
                                                      kto_nr,
                                                      gkto_nr,
                                                      saldo,
-                                                     journal_nr) -> None:
+                                                     journal_nr,
+                                                     segments: Optional[JournalSegments] = None) -> None:
     """Testet je JOURNAL_NR, ob jede Buchung eine spiegelbildliche Gegenbuchung hat.
     Fehlerhafte Buchungen werden in eine Excel-Datei exportiert.
+
+    Buchungen mit gleichem (JOURNAL_NR, Konto, Gegenkonto, gerundeter Betrag) bilden
+    eine Klasse; gepaart wird mit der Spiegelklasse (Gegenkonto, Konto, -Betrag) in
+    Zeilenreihenfolge, je Klasse bleiben also die letzten Buchungen ohne Partner übrig.
     """
-    problems = []
-    for jid, grp in df.groupby(journal_nr):
-        unmatched = grp.copy()
-        unmatched["matched"] = False
-
-        for idx, row in grp.iterrows():
-            if unmatched.loc[idx, "matched"]:
-                continue
-
-            # Suchmaske für gespiegelte Buchung
-            mask = (
-                (unmatched[kto_nr] == row[gkto_nr]) &
-                (unmatched[gkto_nr] == row[kto_nr]) &
-                (unmatched[saldo].round(0) == round(-row[saldo], 0)) &
-                (~unmatched["matched"])
-            )
-
-            match_idx = unmatched[mask].index
-            if not match_idx.empty:
-                unmatched.loc[idx, "matched"] = True
-                unmatched.loc[match_idx[0], "matched"] = True
-            else:
-                problems.append({
-                    "JOURNAL_NR": jid,
-                    "KONTO_NR": row[kto_nr],
-                    "GKTO_NR": row[gkto_nr],
-                    "BETRAG": row[saldo]
-                })
-    if problems:
-        df_problems = pd.DataFrame(problems)
+    _report_fehlerhafte_buchungen(_get_fehlerhafte_buchungen(df, kto_nr, gkto_nr, saldo, journal_nr, segments))
+
+
+def _get_fehlerhafte_buchungen(df, kto_nr, gkto_nr, saldo, journal_nr, segments=None) -> pd.DataFrame:
+    """Buchungen ohne spiegelbildliche Gegenbuchung, nach JOURNAL_NR geordnet."""
+    if segments is None:
+        segments = JournalSegments.from_frame(df, journal_nr)
+    segments.check(df)
+    n = len(df)
+
+    konten, _ = pd.factorize(pd.concat([df[kto_nr], df[gkto_nr]], ignore_index=True))
+    kto, gkto = konten[:n], konten[n:]
+    betrag = np.round(df[saldo].to_numpy(dtype="float64", na_value=np.nan)) + 0.0
+
+    # Klasse je Buchung und Klasse der gesuchten Spiegelbuchung
+    schluessel = pd.DataFrame({
+        "journal": np.tile(segments.codes, 2),
+        "konto": np.concatenate([kto, gkto]),
+        "gegenkonto": np.concatenate([gkto, kto]),
+        "betrag": np.concatenate([betrag, -betrag + 0.0]),
+    })
+    klassen = schluessel.groupby(list(schluessel.columns), sort=False).ngroup().to_numpy().copy()
+    klassen[np.tile((kto < 0) | (gkto < 0), 2)] = -1
+    klasse, spiegel = klassen[:n], klassen[n:]
+
+    gueltig = klasse >= 0
+    anzahl = np.bincount(klasse[gueltig], minlength=max(klassen.max() + 1, 0) if n else 0)
+    rang = np.zeros(n, dtype=np.int64)
+    rang[gueltig] = pd.Series(klasse[gueltig]).groupby(klasse[gueltig]).cumcount().to_numpy()
+    matched = gueltig & ((klasse == spiegel) | (rang < anzahl[np.maximum(spiegel, 0)] * (spiegel >= 0)))
+
+    zeilen = segments.order[~matched[segments.order] & segments.valid[segments.codes[segments.order]]]
+    return pd.DataFrame({
+        "JOURNAL_NR": segments.keys[segments.codes[zeilen]],
+        "KONTO_NR": df[kto_nr].to_numpy()[zeilen],
+        "GKTO_NR": df[gkto_nr].to_numpy()[zeilen],
+        "BETRAG": df[saldo].to_numpy()[zeilen],
+    })
+
+
+def _report_fehlerhafte_buchungen(df_problems: pd.DataFrame) -> None:
+    if not df_problems.empty:
         file_path = "fehlerhafte_buchungen.xlsx"
         df_problems.to_excel(file_path, index=False)
         print(f"Fehlerhafte Buchungen wurden nach '{file_path}' exportiert.")
@@ -78,7 +113,6 @@ def test_ob_jede_buchung_umgedreht_doppelt(df: pd.DataFrame,
         # raise RuntimeError("Nicht alle Buchungen sind doppelt vorhanden.")
     else:
         print("Spiegelbuchungstest bestanden: Alle Buchungen sind symmetrisch doppelt vorhanden.")
- 
 
 def check_if_sum_soll_and_sum_haben_are_equal(df: pd.DataFrame, soll_col:str, haben_col:str) -> None:
     """Überprüft, ob die Summen der Soll- und Habenspalten übereinstimmen."""
@@ -98,23 +132,17 @@ def check_if_only_mirror_pairs(
         soll,
         haben,
         saldo,
+        graph=None,
         ) -> None:
     """Überprüft, ob das aggregierte Journal ausschließlich aus gespiegelten (also entgegengesetzt "doppelt") Kontenkombinationen besteht,
-    was die voraussetzung für eine akurate Gegenkontenanalyse ist"""
-    mirrors = pd.merge(
-        agg, agg,
-        left_on=[kto_nr, gkto_nr],
-        right_on=[gkto_nr, kto_nr],
-        suffixes=("_fwd","_rev")
-    )
-    bad = mirrors.loc[
-        (~np.isclose(mirrors[f"{saldo}_fwd"], -mirrors[f"{saldo}_rev"], atol=0.1)) |
-        (~np.isclose(mirrors[f"{soll}_fwd"],  mirrors[f"{haben}_rev"], atol=0.1)) |
-        (~np.isclose(mirrors[f"{haben}_fwd"], mirrors[f"{soll}_rev"], atol=0.1))
-    ]
-    if not bad.empty:
+    was die voraussetzung für eine akurate Gegenkontenanalyse ist.
+    ``graph`` (``AccountGraph`` des Aggregats) wird sonst aus ``agg`` erstellt."""
+    if graph is None:
+        graph = AccountGraph.from_aggregate(agg, kto_nr, gkto_nr, soll, haben, saldo)
+    bad = graph.check_mirror_pairs(atol=0.1)
+    if bad.any():
         print("Salden-Postulat verletzt für diese Spiegel-Paare:")
-        print(bad[[f"{kto_nr}_fwd",f"{gkto_nr}_fwd"]].drop_duplicates())
+        print(agg.iloc[graph.zeilen[bad]][[kto_nr, gkto_nr]].drop_duplicates())
         #raise ValueError("Salden-Postulat verletzt für diese Spiegel-Paare. Bitte Journalaufbereitung prüfen.")
     else:
-        print("Salden-Postulat erfüllt für alle Spiegel-Paare")              
\ No newline at end of file
+        print("Salden-Postulat erfüllt für alle Spiegel-Paare")
@@ -0,0 +1,235 @@
+import pandas as pd
+import networkx as nx
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Optional
+
+from network_analysis.prepare_journal import prepare_journal
+from network_analysis.aggregate_journal import get_nodes_and_edges_by_aggregating_journal
+from network_analysis.generate_kto_rahmen import generate_kto_rahmen
+from network_analysis.categorize_kto import get_kto_kategorien
+from network_analysis.drilldown import add_drilldown_pages
+from network_analysis.generate_network import generate_network_graph, visualize_graph
+from instrumentation.run_report import profiled_run, stage
+
+__all__ = [
+    "build_consolidated_network_analysis",
+    "prepare_entities",
+    "combine_entity_aggregates",
+    "mark_intercompany",
+]
+
+IC_FARBE = "#0050ff"
+
+
+def build_consolidated_network_analysis(
+        destination_path: str,
+        journals: dict,
+        kto_nr,
+        kto_name,
+        gkto_nr,
+        gkto_name,
+        soll,
+        haben,
+        saldo,
+        journal_nr,
+        materiality: int = 0,
+        schluessel: str = "prefix",
+        ic_konten: Optional[dict] = None,
+        max_workers: Optional[int] = None,
+        run_report_path: str | None = None,
+        kategorisierer: Callable[..., str] | None = None,
+        drilldown: bool = True) -> nx.DiGraph:
+    """
+    Konsolidierte Gegenkontoanalyse über mehrere Gesellschaften.
+
+    ``journals`` enthält je Gesellschaft (Schlüssel = Kürzel) ein Journal. Die
+    Journale werden parallel in eigenen Prozessen aufbereitet, geprüft und
+    aggregiert und anschließend zu einem Graphen zusammengeführt:
+    - ``schluessel="prefix"``: Konten je Gesellschaft getrennt ("A:1200")
+    - ``schluessel="harmonized"``: gemeinsamer Kontenplan, gleiche Konten werden zusammengefasst
+
+    Konten mit gleicher Nummer werden nur einmal kategorisiert (gemeinsamer
+    Kontenplan). ``ic_konten`` ({Gesellschaft: {Konto: Partnergesellschaft}})
+    kennzeichnet Intercompany-Konten; deren Kanten werden hervorgehoben und im
+    Modus "prefix" die Gegenstücke der Partnergesellschaften verbunden.
+    Mit ``drilldown`` erhält jedes Konto eine Seite mit allen Gegenkonten (siehe
+    ``network_analysis.drilldown.add_drilldown_pages``).
+    """
+    if schluessel not in {"prefix", "harmonized"}:
+        raise ValueError("`schluessel` muss 'prefix' oder 'harmonized' sein.")
+
+    cols = (kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo)
+    with profiled_run(run_report_path):
+        with stage("prepare_entities", rows_in=sum(len(df) for df in journals.values())) as s:
+            aggregates = prepare_entities(journals, *cols, journal_nr, max_workers=max_workers)
+            s.extra.update(entities=len(aggregates))
+
+        with stage("categorize_kto") as s:
+            alle = pd.concat(aggregates.values(), ignore_index=True)
+            kto_rahmen = generate_kto_rahmen(alle, kto_nr, kto_name)
+            s.rows_in = len(kto_rahmen)
+            kategorien = get_kto_kategorien(
+                kto_rahmen,
+                kto_nr,
+                kto_name,
+                alle,
+                kto_nr,
+                gkto_name,
+                soll,
+                kategorisierer=kategorisierer,
+            )
+
+        with stage("combine_entity_aggregates") as s:
+            combined = combine_entity_aggregates(aggregates, *cols, schluessel=schluessel)
+            combined["kto_kategorie"] = combined[f"{kto_nr}_roh"].map(kategorien)
+            s.rows_out = len(combined)
+
+        with stage("generate_network_graph", rows_in=len(combined)) as s:
+            G = generate_network_graph(combined, *cols, "kto_kategorie", materiality)
+            if ic_konten:
+                mark_intercompany(G, combined, ic_konten, kto_nr, saldo, schluessel)
+            s.extra.update(nodes=G.number_of_nodes(), edges=G.number_of_edges())
+        if drilldown:
+            with stage("drilldown_pages", rows_in=len(combined)) as s:
+                s.rows_out = add_drilldown_pages(G, combined, *cols, "kto_kategorie", destination_path, max_workers)
+        with stage("visualize_graph"):
+            visualize_graph(G, destination_path)
+    return G
+
+
+def prepare_entities(
+        journals: dict,
+        kto_nr,
+        kto_name,
+        gkto_nr,
+        gkto_name,
+        soll,
+        haben,
+        saldo,
+        journal_nr,
+        max_workers: Optional[int] = None) -> dict:
+    """
+    Bereitet die Journale je Gesellschaft parallel auf und gibt die aggregierten
+    Journale (Kontenschlüssel unverändert) je Gesellschaft zurück.
+    """
+    cols = (kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, journal_nr)
+    if max_workers == 1 or len(journals) <= 1:
+        return {name: _prepare_and_aggregate_entity(name, df, cols) for name, df in journals.items()}
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            name: pool.submit(_prepare_and_aggregate_entity, name, df, cols)
+            for name, df in journals.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
+
+
+def _prepare_and_aggregate_entity(gesellschaft: str, df: pd.DataFrame, cols: tuple) -> pd.DataFrame:
+    kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, journal_nr = cols
+    try:
+        df_clean = prepare_journal(df.copy(), *cols)
+        return get_nodes_and_edges_by_aggregating_journal(
+            df_clean, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo
+        )
+    except Exception as e:
+        raise RuntimeError(f"Journal der Gesellschaft {gesellschaft}: {e}") from e
+
+
+def combine_entity_aggregates(
+        aggregates: dict,
+        kto_nr,
+        kto_name,
+        gkto_nr,
+        gkto_name,
+        soll,
+        haben,
+        saldo,
+        schluessel: str = "prefix") -> pd.DataFrame:
+    """
+    Führt die aggregierten Journale der Gesellschaften zusammen. Die
+    ursprünglichen Kontonummern bleiben in ``{kto_nr}_roh`` erhalten, die
+    Gesellschaft(en) in "gesellschaft".
+    """
+    teile = []
+    for name, agg in aggregates.items():
+        teil = agg.copy()
+        teil["gesellschaft"] = name
+        teil[f"{kto_nr}_roh"] = teil[kto_nr]
+        if schluessel == "prefix":
+            teil[kto_nr] = name + ":" + teil[kto_nr].astype("string")
+            teil[gkto_nr] = name + ":" + teil[gkto_nr].astype("string")
+        teile.append(teil)
+    combined = pd.concat(teile, ignore_index=True)
+
+    if schluessel == "harmonized":
+        combined = (
+            combined
+            .groupby([kto_nr, gkto_nr], as_index=False)
+            .agg({
+                kto_name: "first",
+                gkto_name: "first",
+                soll: "sum",
+                haben: "sum",
+                saldo: "sum",
+                "gesellschaft": lambda g: ", ".join(sorted(set(g))),
+                f"{kto_nr}_roh": "first",
+            })
+        )
+        for col in [soll, haben, saldo]:
+            combined[col] = combined[col].round(2)
+    return combined
+
+
+def mark_intercompany(
+        G: nx.DiGraph,
+        combined: pd.DataFrame,
+        ic_konten: dict,
+        kto_nr,
+        saldo,
+        schluessel: str = "prefix") -> None:
+    """
+    Hebt die Kanten der Intercompany-Konten hervor. Im Modus "prefix" werden
+    zusätzlich die IC-Konten zweier Partnergesellschaften mit einer
+    Abstimmungskante (Salden und Differenz im Tooltip) verbunden.
+    """
+    def _key(gesellschaft, konto):
+        return f"{gesellschaft}:{konto}" if schluessel == "prefix" else str(konto)
+
+    ic_knoten = {
+        _key(gesellschaft, konto): (gesellschaft, partner)
+        for gesellschaft, konten in ic_konten.items()
+        for konto, partner in konten.items()
+    }
+
+    for u, v, data in G.edges(data=True):
+        if u in ic_knoten or v in ic_knoten:
+            data["color"] = IC_FARBE
+            data["dashes"] = False
+            data.pop("betrag", None)  # unabhängig von der Schwelle hervorgehoben
+            data["title"] = f"{data.get('title', '')}\n\nIntercompany"
+
+    if schluessel == "prefix":
+        salden = combined.groupby(kto_nr)[saldo].sum()
+        for a, (gesellschaft_a, partner_a) in ic_knoten.items():
+            for b, (gesellschaft_b, partner_b) in ic_knoten.items():
+                if gesellschaft_a >= gesellschaft_b:
+                    continue
+                if partner_a != gesellschaft_b or partner_b != gesellschaft_a:
+                    continue
+                if a not in G or b not in G:
+                    continue
+                saldo_a, saldo_b = salden.get(a, 0.0), salden.get(b, 0.0)
+                G.add_edge(
+                    a,
+                    b,
+                    value=abs(saldo_a),
+                    title=(
+                        f"Intercompany-Abstimmung\n{a}: {saldo_a:,.2f} €\n{b}: {saldo_b:,.2f} €\n"
+                        f"Differenz: {saldo_a + saldo_b:,.2f} €"
+                    ),
+                    color=IC_FARBE,
+                    width=3.0,
+                    dashes=True,
+                )
+
+    G.graph.setdefault("edge_legend", {})["Intercompany"] = IC_FARBE
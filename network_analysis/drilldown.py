@@ -0,0 +1,322 @@
+import hashlib
+import html
+import math
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from urllib.parse import quote
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from network_analysis.generate_network import _get_edge_style, _get_node_color
+
+__all__ = [
+    "add_drilldown_pages",
+    "get_drilldown_dir",
+    "get_drilldown_file",
+    "get_drilldown_html",
+    "set_drilldown_links",
+    "write_drilldown_pages",
+]
+
+# Gegenkonten im Ego-Graphen; die Tabelle enthält immer alle
+EGO_GEGENKONTEN = 60
+
+
+def get_drilldown_dir(filename) -> Path:
+    """Verzeichnis der Kontenseiten neben der Graphseite: ``graph.html`` -> ``graph_konten/``."""
+    filename = Path(filename)
+    return filename.with_name(f"{filename.stem}_konten")
+
+
+def get_drilldown_file(konto) -> str:
+    """Dateiname der Kontenseite; Kontonummern mit Sonderzeichen (z.B. "A:1200") erhalten einen Hash."""
+    text = str(konto)
+    name = re.sub(r"[^0-9A-Za-z_.-]", "_", text)
+    if name != text:
+        name += "_" + hashlib.sha1(text.encode("utf-8")).hexdigest()[:8]
+    return f"{name}.html"
+
+
+def set_drilldown_links(G: nx.DiGraph, url: str = "graph_konten/{datei}", konten=None) -> None:
+    """
+    Verweist jeden Knoten (optional nur die ``konten``) auf seine Kontenseite
+    (Attribut ``drilldown``, per Doppelklick geöffnet). In ``url`` stehen
+    ``{datei}`` für den Dateinamen (``get_drilldown_file``) und ``{konto}`` für
+    die URL-kodierte Kontonummer.
+    """
+    konten = set(G.nodes) if konten is None else set(konten)
+    for konto, attrs in G.nodes(data=True):
+        if konto not in konten:
+            continue
+        attrs["drilldown"] = url.format(datei=quote(get_drilldown_file(konto)), konto=quote(str(konto), safe=""))
+        attrs["title"] = f"{attrs.get('title', '')}\n\nDoppelklick: alle Gegenkonten"
+
+
+def _get_drilldown_rows(df: pd.DataFrame, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo,
+                        kto_kategorie, kategorien: pd.Series) -> pd.DataFrame:
+    """Zeilen des Aggregats mit Kategorie des Gegenkontos (aus ``kategorien``) in einheitlich benannten Spalten."""
+    return pd.DataFrame({
+        "konto": df[kto_nr].to_numpy(dtype=object),
+        "name": df[kto_name].to_numpy(dtype=object),
+        "kategorie": df[kto_kategorie].to_numpy(dtype=object),
+        "gegenkonto": df[gkto_nr].to_numpy(dtype=object),
+        "gegen_name": df[gkto_name].to_numpy(dtype=object),
+        "gegen_kategorie": df[gkto_nr].map(kategorien).to_numpy(dtype=object),
+        "soll": df[soll].to_numpy(dtype="float64", na_value=0.0),
+        "haben": df[haben].to_numpy(dtype="float64", na_value=0.0),
+        "saldo": df[saldo].to_numpy(dtype="float64", na_value=0.0),
+    })
+
+
+def _text(wert) -> str:
+    return "" if wert is None or (isinstance(wert, float) and math.isnan(wert)) or wert is pd.NA else str(wert)
+
+
+def _farbe(farbe) -> str:
+    if isinstance(farbe, (list, tuple)):  # ("#00d515",) aus _get_edge_style
+        farbe = farbe[0]
+    return farbe
+
+
+def _get_ego_svg(konto, kategorie, zeilen: pd.DataFrame, max_betrag: float) -> str:
+    """Ego-Graph als SVG: das Konto in der Mitte, die größten Gegenkonten im Kreis."""
+    betrag = np.maximum(zeilen["soll"].abs(), zeilen["haben"].abs())
+    zeilen = zeilen.assign(betrag=betrag).nlargest(EGO_GEGENKONTEN, "betrag")
+    zeilen = zeilen.sort_values(["gegen_kategorie", "betrag"], ascending=[True, False], na_position="last")
+    groesstes = max(float(zeilen["betrag"].max()) if len(zeilen) else 0.0, 1e-9)
+
+    breite, hoehe, radius = 720, 640, 250
+    cx, cy = breite / 2, hoehe / 2
+    beschriften = len(zeilen) <= 40
+    linien, knoten = [], []
+    for i, z in enumerate(zeilen.itertuples(index=False)):
+        winkel = 2 * math.pi * i / max(len(zeilen), 1) - math.pi / 2
+        x, y = cx + radius * math.cos(winkel), cy + radius * math.sin(winkel)
+        stil = _get_edge_style(z.kategorie, z.gegen_kategorie, z.soll, z.haben, schwelle=-np.inf, max_betrag=max_betrag)
+        marker = (' marker-end="url(#pfeil)"' if z.soll > 0 else "") + (' marker-start="url(#pfeil)"' if z.haben > 0 else "")
+        tooltip = html.escape(
+            f"{_text(z.gegenkonto)} {_text(z.gegen_name)}\nSoll: {z.soll:,.2f} €\nHaben: {z.haben:,.2f} €"
+        )
+        linien.append(
+            f'<line x1="{cx:.1f}" y1="{cy:.1f}" x2="{x:.1f}" y2="{y:.1f}" stroke="{html.escape(_farbe(stil["color"]))}" '
+            f'stroke-width="{1 + 5 * z.betrag / groesstes:.2f}"{marker}><title>{tooltip}</title></line>'
+        )
+        knoten.append(
+            f'<circle cx="{x:.1f}" cy="{y:.1f}" r="7" fill="{_get_node_color(z.gegen_kategorie)}" stroke="#444">'
+            f'<title>{tooltip}</title></circle>'
+        )
+        if beschriften:
+            anker = "start" if math.cos(winkel) >= 0 else "end"
+            versatz = 11 if anker == "start" else -11
+            knoten.append(
+                f'<text x="{x + versatz:.1f}" y="{y + 4:.1f}" text-anchor="{anker}">{html.escape(_text(z.gegenkonto))}</text>'
+            )
+    return f"""<svg xmlns="http://www.w3.org/2000/svg" width="{breite}" height="{hoehe}" font-size="11" font-family="Arial, sans-serif">
+<defs><marker id="pfeil" viewBox="0 0 10 10" refX="18" refY="5" markerWidth="6" markerHeight="6" orient="auto-start-reverse">
+<path d="M 0 0 L 10 5 L 0 10 z" fill="#666"/></marker></defs>
+{"".join(linien)}
+{"".join(knoten)}
+<circle cx="{cx}" cy="{cy}" r="14" fill="{_get_node_color(kategorie)}" stroke="#444"><title>{html.escape(_text(konto))}</title></circle>
+<text x="{cx}" y="{cy + 30}" text-anchor="middle" font-weight="bold">{html.escape(_text(konto))}</text>
+</svg>"""
+
+
+def _get_page(konto, zeilen: pd.DataFrame, max_betrag: float) -> str:
+    """Kontenseite aus den Zeilen des Aggregats mit ``konto`` als Konto."""
+    name, kategorie = (zeilen["name"].iloc[0], zeilen["kategorie"].iloc[0]) if len(zeilen) else ("", "")
+    summe_soll, summe_haben = zeilen["soll"].sum(), zeilen["haben"].sum()
+    zeilen = zeilen.sort_values("soll", ascending=False, kind="stable")
+
+    tabelle = []
+    for z in zeilen.itertuples(index=False):
+        anteil_soll = z.soll / summe_soll if summe_soll else 0.0
+        anteil_haben = z.haben / summe_haben if summe_haben else 0.0
+        tabelle.append(
+            f"<tr><td>{html.escape(_text(z.gegenkonto))}</td><td>{html.escape(_text(z.gegen_name))}</td>"
+            f"<td>{html.escape(_text(z.gegen_kategorie))}</td>"
+            f'<td data-wert="{z.soll}">{z.soll:,.2f}</td><td data-wert="{anteil_soll}">{anteil_soll:.1%}</td>'
+            f'<td data-wert="{z.haben}">{z.haben:,.2f}</td><td data-wert="{anteil_haben}">{anteil_haben:.1%}</td>'
+            f'<td data-wert="{z.saldo}">{z.saldo:,.2f}</td></tr>'
+        )
+
+    return f"""<!DOCTYPE html>
+<html lang="de">
+<head>
+<meta charset="utf-8">
+<title>Konto {html.escape(_text(konto))}</title>
+<style>
+body {{ font-family: Arial, sans-serif; font-size: 13px; margin: 20px; }}
+table {{ border-collapse: collapse; }}
+th, td {{ border: 1px solid #ccc; padding: 3px 6px; }}
+th {{ background: #f0f0f0; cursor: pointer; user-select: none; }}
+td:nth-child(n+4) {{ text-align: right; font-family: monospace; }}
+.kopf td {{ border: none; padding: 1px 12px 1px 0; }}
+</style>
+</head>
+<body>
+<h2>Konto {html.escape(_text(konto))} {html.escape(_text(name))}</h2>
+<table class="kopf">
+<tr><td>Kategorie:</td><td>{html.escape(_text(kategorie))}</td></tr>
+<tr><td>Soll:</td><td>{summe_soll:,.2f} €</td></tr>
+<tr><td>Haben:</td><td>{summe_haben:,.2f} €</td></tr>
+<tr><td>Saldo:</td><td>{zeilen["saldo"].sum():,.2f} €</td></tr>
+<tr><td>Gegenkonten:</td><td>{len(zeilen):,}</td></tr>
+</table>
+<h3>Ego-Graph{f" (größte {EGO_GEGENKONTEN} Gegenkonten)" if len(zeilen) > EGO_GEGENKONTEN else ""}</h3>
+{_get_ego_svg(konto, kategorie, zeilen, max_betrag)}
+<h3>Gegenkonten</h3>
+<table id="gegenkonten">
+<thead><tr><th>Gegenkonto</th><th>Bezeichnung</th><th>Kategorie</th><th>Soll €</th><th>Anteil Soll</th>
+<th>Haben €</th><th>Anteil Haben</th><th>Saldo €</th></tr></thead>
+<tbody>
+{chr(10).join(tabelle)}
+</tbody>
+</table>
+<script type="text/javascript">
+(function() {{
+    // Sortieren per Klick auf die Spaltenüberschrift (Beträge nach data-wert)
+    var tabelle = document.getElementById("gegenkonten");
+    var richtung = {{}};
+    Array.prototype.forEach.call(tabelle.tHead.rows[0].cells, function(th, i) {{
+        th.addEventListener("click", function() {{
+            var abwaerts = richtung[i] = !richtung[i];
+            var zeilen = Array.prototype.slice.call(tabelle.tBodies[0].rows);
+            zeilen.sort(function(a, b) {{
+                var x = a.cells[i], y = b.cells[i];
+                var c = x.dataset.wert !== undefined
+                    ? parseFloat(x.dataset.wert) - parseFloat(y.dataset.wert)
+                    : x.textContent.localeCompare(y.textContent, "de", {{numeric: true}});
+                return abwaerts ? -c : c;
+            }});
+            zeilen.forEach(function(z) {{ tabelle.tBodies[0].appendChild(z); }});
+        }});
+    }});
+}})();
+</script>
+</body>
+</html>
+"""
+
+
+def get_drilldown_html(
+        df: pd.DataFrame,
+        konto,
+        kto_nr,
+        kto_name,
+        gkto_nr,
+        gkto_name,
+        soll,
+        haben,
+        saldo,
+        kto_kategorie) -> str:
+    """
+    Kontenseite eines Kontos aus dem kategorisierten Aggregat ``df``: Kopfdaten,
+    Ego-Graph der größten Gegenkonten und die vollständige, sortierbare Tabelle
+    aller Gegenkonten mit Soll, Haben, Saldo und Anteilen. Für die Erzeugung auf
+    Abruf (z.B. im Analyse-Server); ValueError, wenn das Konto nicht vorkommt.
+    """
+    teil = df[df[kto_nr] == konto]
+    if teil.empty:
+        raise ValueError(f"Konto {konto} kommt im Aggregat nicht vor.")
+    max_betrag = float(df[[soll, haben]].abs().max().max())
+    kategorien = df.drop_duplicates(kto_nr).set_index(kto_nr)[kto_kategorie]
+    zeilen = _get_drilldown_rows(teil, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, kto_kategorie, kategorien)
+    return _get_page(konto, zeilen, max_betrag)
+
+
+def _write_pages(zeilen: pd.DataFrame, verzeichnis: str, max_betrag: float) -> int:
+    """Schreibt die Kontenseiten aller Konten in ``zeilen`` (Worker von ``write_drilldown_pages``)."""
+    anzahl = 0
+    for konto, teil in zeilen.groupby("konto", sort=False):
+        seite = _get_page(konto, teil, max_betrag)
+        (Path(verzeichnis) / get_drilldown_file(konto)).write_text(seite, encoding="utf-8")
+        anzahl += 1
+    return anzahl
+
+
+def write_drilldown_pages(
+        df: pd.DataFrame,
+        kto_nr,
+        kto_name,
+        gkto_nr,
+        gkto_name,
+        soll,
+        haben,
+        saldo,
+        kto_kategorie,
+        verzeichnis,
+        max_workers: int | None = None,
+        konten=None,
+        key: str | None = None) -> int:
+    """
+    Schreibt je Konto des kategorisierten Aggregats ``df`` (optional nur
+    ``konten``) eine Kontenseite (siehe ``get_drilldown_html``) nach
+    ``verzeichnis``. Mit ``max_workers`` werden die Konten auf so viele Prozesse
+    verteilt. Mit ``key`` (Schlüssel von ``df``) wird nur geschrieben, wenn die
+    Seiten im Verzeichnis nicht bereits zu diesem Schlüssel gehören. Gibt die
+    Anzahl der geschriebenen Seiten zurück.
+    """
+    verzeichnis = Path(verzeichnis)
+    marke = verzeichnis / ".schluessel"
+    if key is not None and marke.exists() and marke.read_text(encoding="utf-8") == key:
+        return 0
+    verzeichnis.mkdir(parents=True, exist_ok=True)
+    marke.unlink(missing_ok=True)
+    anzahl = _write_drilldown_pages(df, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, kto_kategorie,
+                                    verzeichnis, max_workers, konten)
+    if key is not None:
+        marke.write_text(key, encoding="utf-8")
+    return anzahl
+
+
+def _write_drilldown_pages(df, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, kto_kategorie,
+                           verzeichnis: Path, max_workers, konten) -> int:
+    max_betrag = float(df[[soll, haben]].abs().max().max()) if len(df) else 0.0
+    max_betrag = max_betrag or 1.0
+    kategorien = df.drop_duplicates(kto_nr).set_index(kto_nr)[kto_kategorie]
+    zeilen = _get_drilldown_rows(df, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, kto_kategorie, kategorien)
+    if konten is not None:
+        zeilen = zeilen[zeilen["konto"].isin(konten)]
+    zeilen = zeilen.dropna(subset=["konto"])
+
+    if max_workers is None or max_workers == 1:
+        return _write_pages(zeilen, str(verzeichnis), max_betrag)
+
+    # Konten reihum auf die Teile verteilen, damit große Konten sich nicht ballen
+    codes = pd.factorize(zeilen["konto"])[0]
+    teile = [zeilen[codes % max_workers == i] for i in range(max_workers)]
+    teile = [t for t in teile if len(t)]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return sum(pool.map(_write_pages, teile, [str(verzeichnis)] * len(teile), [max_betrag] * len(teile)))
+
+
+def add_drilldown_pages(
+        G: nx.DiGraph,
+        df: pd.DataFrame,
+        kto_nr,
+        kto_name,
+        gkto_nr,
+        gkto_name,
+        soll,
+        haben,
+        saldo,
+        kto_kategorie,
+        filename,
+        max_workers: int | None = None,
+        key: str | None = None) -> int:
+    """
+    Schreibt die Kontenseiten in das Verzeichnis neben der Graphseite ``filename``
+    (``get_drilldown_dir``) und verweist die Knoten von ``G`` darauf. Gibt die
+    Anzahl der geschriebenen Seiten zurück (siehe ``write_drilldown_pages``).
+    """
+    verzeichnis = get_drilldown_dir(filename)
+    konten = set(G.nodes) & set(df[kto_nr].dropna())
+    anzahl = write_drilldown_pages(
+        df, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, kto_kategorie, verzeichnis, max_workers,
+        konten=konten, key=key,
+    )
+    set_drilldown_links(G, quote(verzeichnis.name) + "/{datei}", konten)
+    return anzahl
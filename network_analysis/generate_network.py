@@ -1,8 +1,18 @@
+import json
 import networkx as nx
+import numpy as np
 from pyvis.network import Network
 import webbrowser
 import pandas as pd
 
+from instrumentation.run_report import stage
+from network_analysis.account_graph import AccountGraph
+
+RENDERER = ("pyvis", "webgl")
+
+# Gegenkonten je Seite (Soll/Haben) im Tooltip eines Kontos; alle stehen auf der Kontenseite
+TOOLTIP_GEGENKONTEN = 20
+
 
 def build_network(
         df:pd.DataFrame,
@@ -15,11 +25,83 @@ def build_network(
         saldo,
         kto_kategorie,        
         filename:str="graph.html",
-        schwelle:int=15000
+        schwelle:int=15000,
+        cube:pd.DataFrame | None=None,
+        faktor:float=2.0,
+        analytics:bool=False,
+        graph:AccountGraph | None=None,
+        renderer:str="pyvis",
+        G:nx.DiGraph | None=None,
+        max_gegenkonten:int | None=TOOLTIP_GEGENKONTEN,
+        drilldown:bool=True,
+        max_workers:int | None=None,
+        drilldown_key:str | None=None,
         ):
-    """Takes a df with the """
-    G = generate_network_graph(
-        df,
+    """Takes a df with the 
+
+    Mit ``cube`` (``get_period_cube``) erhält der Graph einen Schieberegler über
+    die Perioden, in dem auffällig neue oder gewachsene Kanten hervorgehoben werden.
+    Mit ``analytics`` bestimmen Netzwerkkennzahlen (``get_graph_metrics``) die
+    Knotengröße und markieren Konten mit Risikohinweisen.
+    ``graph`` (``AccountGraph`` von ``df``) wird sonst einmal erstellt und von
+    allen Stufen genutzt.
+    ``renderer="webgl"`` zeichnet den Graphen mit WebGL statt vis-network (siehe
+    ``render_webgl.render_graph_html_webgl``), für Graphen mit zehntausenden Kanten.
+    Ein bereits erstellter Graph ``G`` (``get_network_graph`` von ``df``) wird nur
+    für ``schwelle`` umgefärbt (auf einer Kopie, ``G`` bleibt unverändert).
+    Tooltips nennen je Seite die ``max_gegenkonten`` größten Gegenkonten; mit
+    ``drilldown`` wird je Konto eine Seite mit allen Gegenkonten neben ``filename``
+    abgelegt (``<name>_konten/``, mit ``max_workers`` Prozessen) und per
+    Doppelklick auf den Knoten geöffnet; mit ``drilldown_key`` (Schlüssel von
+    ``df``) nur, wenn dort noch keine Seiten zu diesem Schlüssel liegen."""
+    if renderer not in RENDERER:
+        raise ValueError(f"Unbekannter Renderer '{renderer}', erlaubt: {', '.join(RENDERER)}")
+    if cube is not None and renderer != "pyvis":
+        raise ValueError("Der Schieberegler über die Perioden ist nur mit dem Renderer 'pyvis' verfügbar.")
+    if G is None:
+        G = get_network_graph(df, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, kto_kategorie, schwelle,
+                              graph=graph, max_gegenkonten=max_gegenkonten)
+    else:
+        with stage("restyle_network_graph") as s:
+            G = restyle_network_graph(G.copy(), schwelle)
+            s.extra.update(nodes=G.number_of_nodes(), edges=G.number_of_edges())
+    if analytics and graph is None:
+        graph = AccountGraph.from_aggregate(df, kto_nr, gkto_nr, soll, haben, saldo)
+    if analytics:
+        from network_analysis.graph_analytics import apply_graph_metrics, get_graph_metrics
+
+        with stage("graph_analytics", rows_in=len(df)) as s:
+            metrics = get_graph_metrics(df, kto_nr, gkto_nr, soll, kto_kategorie, schwelle, graph=graph)
+            apply_graph_metrics(G, metrics)
+            s.extra.update(
+                komponenten=int(metrics["komponente"].nunique()),
+                umgehung=int(metrics["umgehung"].sum()),
+            )
+    if drilldown:
+        from network_analysis.drilldown import add_drilldown_pages
+
+        with stage("drilldown_pages", rows_in=len(df)) as s:
+            s.rows_out = add_drilldown_pages(G, df, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo,
+                                             kto_kategorie, filename, max_workers, key=drilldown_key)
+    if cube is None:
+        with stage("visualize_graph"):
+            visualize_graph(G, filename, renderer)
+        return
+
+    from network_analysis.period_cube import AUFFAELLIG_FARBE, add_period_slider_to_html, get_period_deltas
+
+    with stage("period_deltas", rows_in=len(cube)) as s:
+        deltas = get_period_deltas(cube, kto_nr, gkto_nr, soll, faktor=faktor, schwelle=schwelle)
+        s.extra.update(auffaellig=int(deltas["auffaellig"].sum()))
+    G.graph["edge_legend"] = {**G.graph.get("edge_legend", {}), "Auffällig in Periode": AUFFAELLIG_FARBE}
+    with stage("visualize_graph"):
+        html = add_period_slider_to_html(render_graph_html(G, schwellen_regler=False), deltas, kto_nr, gkto_nr, soll)
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(html)
+
+
+def get_network_graph(
+        df:pd.DataFrame,
         kto_nr,
         kto_name,
         gkto_nr,
@@ -28,9 +110,32 @@ def build_network(
         haben,
         saldo,
         kto_kategorie,
-        schwelle
-        )
-    visualize_graph(G, filename)
+        schwelle:float=0,
+        graph:AccountGraph | None=None,
+        max_gegenkonten:int | None=TOOLTIP_GEGENKONTEN,
+        ) -> nx.DiGraph:
+    """``generate_network_graph`` mit Messung der Stufen; ``graph`` wird sonst aus ``df`` erstellt."""
+    if graph is None:
+        with stage("account_graph", rows_in=len(df)) as s:
+            graph = AccountGraph.from_aggregate(df, kto_nr, gkto_nr, soll, haben, saldo)
+            s.extra.update(konten=graph.n_konten, kanten=graph.n_kanten)
+    with stage("generate_network_graph", rows_in=len(df)) as s:
+        G = generate_network_graph(
+            df,
+            kto_nr,
+            kto_name,
+            gkto_nr,
+            gkto_name,
+            soll,
+            haben,
+            saldo,
+            kto_kategorie,
+            schwelle,
+            graph=graph,
+            max_gegenkonten=max_gegenkonten,
+            )
+        s.extra.update(nodes=G.number_of_nodes(), edges=G.number_of_edges())
+    return G
 
 
 def _get_node_color(kategorie: str) -> str:
@@ -122,14 +227,20 @@ def _get_edge_style(src_kat: str, dst_kat: str, summe_soll: float, summe_haben:
     # Dashes bei niedriger Bedeutung oder technischen Konten
     style["dashes"] = betrag < schwelle
 
-    # Normalisierte Kantenbreite
-    min_width, max_width = 1.0, 5.0
-    norm_width = min_width + (betrag / max_betrag) * (max_width - min_width)
-    style["width"] = round(norm_width, 2)
+    style["betrag"] = betrag
+
+    style["width"] = _get_edge_width(betrag, max_betrag)
 
     return style
 
 
+def _get_edge_width(betrag: float, max_betrag: float) -> float:
+    """Normalisierte Kantenbreite"""
+    min_width, max_width = 1.0, 5.0
+    norm_width = min_width + (betrag / max_betrag) * (max_width - min_width)
+    return round(float(norm_width), 2)
+
+
 
 
 def generate_network_graph(
@@ -143,18 +254,111 @@ def generate_network_graph(
         saldo:str,
         kto_kategorie:str,
         schwelle: float = 0,
+        graph: AccountGraph | None = None,
+        max_gegenkonten: int | None = TOOLTIP_GEGENKONTEN,
     ):
     """
     Erstellt einen gerichteten Netzwerk-Graphen mit farbigen Knoten und Kanten.
 
     Alle Spaltennamen werden als Funktionsargumente übergeben, sodass
     dieselbe Logik auch bei anders benannten DataFrames funktioniert.
+    Gegenkonten und deren Kategorien werden über ``graph`` (``AccountGraph``
+    von ``df``, sonst aus ``df`` erstellt) bestimmt. Der Tooltip eines Kontos
+    nennt je Seite die ``max_gegenkonten`` größten Gegenkonten (``None``: alle),
+    die vollständige Liste steht auf der Kontenseite (siehe ``drilldown``).
     """
+    if graph is None:
+        graph = AccountGraph.from_aggregate(df, kto_nr, gkto_nr, soll, haben, saldo)
 
     G = nx.DiGraph()
 
     # Maximalbetrag für die Kantenbreitenskalierung
-    max_betrag = df[[soll, haben]].abs().max().max()
+    max_betrag = float(df[[soll, haben]].abs().max().max())
+    G.graph["max_betrag"] = max_betrag
+    G.graph["schwelle"] = schwelle
+    G.graph["max_gegenkonten"] = max_gegenkonten
+
+    _add_nodes(G, graph, df, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, kto_kategorie,
+               max_gegenkonten=max_gegenkonten)
+    _add_edges(G, graph, df, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, kto_kategorie, schwelle, max_betrag)
+
+    return G
+
+
+def update_network_graph(
+        G: nx.DiGraph,
+        df:pd.DataFrame,
+        konten,
+        kto_nr:str,
+        kto_name:str,
+        gkto_nr:str,
+        gkto_name:str,
+        soll:str,
+        haben:str,
+        saldo:str,
+        kto_kategorie:str,
+        schwelle: float = 0,
+    ):
+    """
+    Aktualisiert einen mit ``generate_network_graph`` erstellten Graphen für das
+    fortgeschriebene aggregierte Journal ``df``. Neu aufgebaut werden nur die
+    Knoten der ``konten`` und alle Kanten, die diese Konten berühren.
+
+    Ändert sich der Maximalbetrag, werden nur die Kantenbreiten aus den an den
+    Kanten abgelegten Beträgen neu skaliert, bei geänderter Schwelle wird nur
+    umgefärbt (``restyle_network_graph``). Neu erstellt wird nur ein Graph ohne
+    abgelegte Beträge.
+    """
+    max_betrag = float(df[[soll, haben]].abs().max().max())
+    umfaerbbar = all("farbe_ueber" in attrs for _, _, attrs in G.edges(data=True))
+    if not umfaerbbar:
+        return generate_network_graph(
+            df, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, kto_kategorie, schwelle,
+            max_gegenkonten=G.graph.get("max_gegenkonten", TOOLTIP_GEGENKONTEN),
+        )
+    if G.graph.get("max_betrag") != max_betrag:
+        for _, _, attrs in G.edges(data=True):
+            attrs["width"] = _get_edge_width(attrs["betrag"], max_betrag)
+        G.graph["max_betrag"] = max_betrag
+    if G.graph.get("schwelle") != schwelle:
+        restyle_network_graph(G, schwelle)
+
+    konten = set(konten)
+    graph = AccountGraph.from_aggregate(df, kto_nr, gkto_nr, soll, haben, saldo)
+    G.remove_edges_from([(u, v) for u, v in G.edges if u in konten or v in konten])
+    _add_nodes(G, graph, df, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, kto_kategorie, konten,
+               max_gegenkonten=G.graph.get("max_gegenkonten"))
+    _add_edges(G, graph, df, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, kto_kategorie, schwelle, max_betrag, konten)
+    return G
+
+
+def _add_nodes(
+        G: nx.DiGraph,
+        graph: AccountGraph,
+        df:pd.DataFrame,
+        kto_nr:str,
+        kto_name:str,
+        gkto_nr:str,
+        gkto_name:str,
+        soll:str,
+        haben:str,
+        saldo:str,
+        kto_kategorie:str,
+        konten=None,
+        max_gegenkonten: int | None = None,
+    ) -> None:
+    """Fügt die Knoten (optional nur für ``konten``) mit Tooltip, Farbe und Größe hinzu."""
+
+    ## Anzahl der Verbindungen pro Konto (nur Konten, die als Konto und als Gegenkonto vorkommen)
+    ausgang, eingang = graph.ausgangsgrad(), graph.eingangsgrad()
+    edge_counts = pd.Series(np.where((ausgang > 0) & (eingang > 0), ausgang + eingang, 0), index=graph.konten)
+
+    ## Gegenkonten und Bezeichnungen für die Tooltips
+    gegenkonten = df[gkto_nr].to_numpy(dtype=object)
+    gegen_namen = df[gkto_name].to_numpy(dtype=object)
+
+    if konten is not None:
+        df = df[df[kto_nr].isin(konten)]
 
     # Knoten erstellen
     src_konten = (
@@ -170,38 +374,12 @@ def generate_network_graph(
         .reset_index()
     )
 
-    ## Anzahl der Verbindungen pro Konto
-    edge_counts = df[kto_nr].value_counts() + df[gkto_nr].value_counts()
-    edge_counts = edge_counts.fillna(0)
-
     for _, row in src_konten.iterrows():
         farbe = _get_node_color(row[kto_kategorie])
 
         ### Gegenkonten-Listen für Tooltip
-        title_df_soll = (
-            df[df[kto_nr] == row[kto_nr]][[gkto_nr, gkto_name, soll]]
-            .sort_values(by=soll, ascending=False)
-        )
-        title_df_haben = (
-            df[df[kto_nr] == row[kto_nr]][[gkto_nr, gkto_name, haben]]
-            .sort_values(by=haben, ascending=False)
-        )
-
-        gegen_text_soll = (
-            "\n".join(
-                f"{betrag:_>16,.2f} €  {dst:<10}  {name}"
-                for dst, name, betrag in title_df_soll.values
-            )
-            if not title_df_soll.empty else "keine"
-        )
-
-        gegen_text_haben = (
-            "\n".join(
-                f"{betrag:_>16,.2f} €  {dst:<10}  {name}"
-                for dst, name, betrag in title_df_haben.values
-            )
-            if not title_df_haben.empty else "keine"
-        )
+        gegen_text_soll = _get_gegenkonten_text(graph, row[kto_nr], "soll", gegenkonten, gegen_namen, max_gegenkonten)
+        gegen_text_haben = _get_gegenkonten_text(graph, row[kto_nr], "haben", gegenkonten, gegen_namen, max_gegenkonten)
 
         title_text = (
             f"Konto: {row[kto_nr]}\n"
@@ -221,30 +399,76 @@ def generate_network_graph(
             title=title_text,
             color=farbe,
             size=size,
+            kategorie=row[kto_kategorie],
         )
 
+
+def _get_gegenkonten_text(graph: AccountGraph, konto, wert: str, gegenkonten, gegen_namen,
+                          max_zeilen: int | None = None) -> str:
+    """
+    Gegenkonten von ``konto`` absteigend nach ``wert`` ("soll"/"haben") als
+    Tooltip-Zeilen, höchstens ``max_zeilen``; die übrigen werden zusammengefasst.
+    """
+    try:
+        kanten = graph.sortierte_kanten(konto, wert)
+    except KeyError:
+        return "keine"
+    if len(kanten) == 0:
+        return "keine"
+    rest = kanten[max_zeilen:] if max_zeilen is not None else kanten[:0]
+    kanten = kanten[:max_zeilen] if max_zeilen is not None else kanten
+    zeilen = graph.zeilen[kanten]
+    text = "\n".join(
+        f"{betrag:_>16,.2f} €  {dst:<10}  {name}"
+        for dst, name, betrag in zip(gegenkonten[zeilen], gegen_namen[zeilen], graph.werte[wert][kanten])
+    )
+    if len(rest):
+        text += f"\n{graph.werte[wert][rest].sum():_>16,.2f} €  ... {len(rest):,} weitere Gegenkonten"
+    return text
+
+
+def _add_edges(
+        G: nx.DiGraph,
+        graph: AccountGraph,
+        df:pd.DataFrame,
+        kto_nr:str,
+        kto_name:str,
+        gkto_nr:str,
+        gkto_name:str,
+        soll:str,
+        haben:str,
+        kto_kategorie:str,
+        schwelle: float,
+        max_betrag: float,
+        konten=None,
+    ) -> None:
+    """Fügt die Soll-Kanten (optional nur die, die ``konten`` berühren) mit Stil hinzu."""
+
     # Kanten erzeugen
     ## Ziel-Kategorien ergänzen
-    df = (
-        df.merge(
-            df[[kto_nr, kto_kategorie]].drop_duplicates(),
-            how="left",
-            left_on=gkto_nr,
-            right_on=kto_nr,
-            suffixes=("", "_dst"),
-        )
-        .rename(columns={f"{kto_kategorie}_dst": "dst_kategorie"})
-        .drop(columns=[f"{kto_nr}_dst"])
-    )
+    kategorien = df.drop_duplicates(kto_nr).set_index(kto_nr)[kto_kategorie]
+    df = df.assign(dst_kategorie=graph.gegenkonto_werte(kategorien, len(df)))
+
+    if konten is not None:
+        df = df[df[kto_nr].isin(konten) | df[gkto_nr].isin(konten)]
 
     for _, row in df.iterrows():
         if row[soll] > 0:  # nur Soll-Flüsse darstellen
+            # Stil ober- und unterhalb der Schwelle, damit eine neue Schwelle nur umfärbt
             style = _get_edge_style(
                 row[kto_kategorie],
                 row["dst_kategorie"],
                 row[soll],
                 row[haben],
-                schwelle=schwelle,
+                schwelle=-np.inf,
+                max_betrag=max_betrag,
+            )
+            unter_schwelle = _get_edge_style(
+                row[kto_kategorie],
+                row["dst_kategorie"],
+                row[soll],
+                row[haben],
+                schwelle=np.inf,
                 max_betrag=max_betrag,
             )
 
@@ -265,15 +489,67 @@ def generate_network_graph(
                 row[gkto_nr],
                 value=row[soll],
                 title=edge_title,
-                color=style["color"],
                 width=style["width"],
-                dashes=style["dashes"],
+                **_get_edge_style_attrs(style, unter_schwelle),
             )
+            _set_edge_style(G.edges[row[kto_nr], row[gkto_nr]], schwelle)
+
+
+def _get_edge_style_attrs(style: dict, unter_schwelle: dict) -> dict:
+    """Von der Schwelle unabhängige Kantenattribute: Betrag und Farbe ober- bzw. unterhalb."""
+    return {
+        "betrag": float(style["betrag"]),
+        "farbe_ueber": style["color"],
+        "farbe_unter": unter_schwelle["color"],
+    }
+
+
+def _set_edge_style(attrs: dict, schwelle: float) -> None:
+    """Setzt Farbe und Strichelung einer Kante für ``schwelle`` (wie ``_get_edge_style``)."""
+    if "betrag" not in attrs:  # fest hervorgehobene Kanten, z.B. Intercompany
+        return
+    unter = attrs["betrag"] < schwelle
+    attrs["color"] = attrs["farbe_unter"] if unter else attrs["farbe_ueber"]
+    attrs["dashes"] = unter
+
 
+def restyle_network_graph(G: nx.DiGraph, schwelle: float) -> nx.DiGraph:
+    """
+    Färbt einen mit ``generate_network_graph`` erstellten Graphen für eine neue
+    ``schwelle`` um. Die Schwelle bestimmt nur Farbe und Strichelung der Kanten;
+    beides wird aus den an den Kanten abgelegten Beträgen und Farben gesetzt, ohne
+    Knoten, Tooltips oder Kantenbreiten neu zu berechnen. Ändert ``G`` und gibt
+    ihn zurück.
+    """
+    for _, _, attrs in G.edges(data=True):
+        _set_edge_style(attrs, schwelle)
+    G.graph["schwelle"] = schwelle
     return G
 
 
-def visualize_graph(G, filename="graph.html"):
+def visualize_graph(G, filename="graph.html", renderer: str = "pyvis"):
+    html = get_graph_html(G, renderer)
+    with open(filename, "w", encoding="utf-8") as f:
+        f.write(html)
+
+
+def get_graph_html(G, renderer: str = "pyvis") -> str:
+    """HTML-Seite des Graphen mit dem gewählten Renderer ("pyvis" oder "webgl")."""
+    if renderer not in RENDERER:
+        raise ValueError(f"Unbekannter Renderer '{renderer}', erlaubt: {', '.join(RENDERER)}")
+    if renderer == "webgl":
+        from network_analysis.render_webgl import render_graph_html_webgl
+
+        return render_graph_html_webgl(G)
+    return render_graph_html(G)
+
+
+def render_graph_html(G, schwellen_regler: bool = True) -> str:
+    """
+    Erzeugt die HTML-Seite des Graphen (pyvis mit Legende), ohne sie zu schreiben.
+    Mit ``schwellen_regler`` lässt sich die Schwelle im Browser verändern (siehe
+    ``add_threshold_slider_to_html``).
+    """
     net = Network(
         height="2160px", # = 4k; "1080px" = FHD
         width="100%",
@@ -319,12 +595,75 @@ const options = {
 }
 """)
     html = net.generate_html()
-    html = add_legend_to_pyvis_html(html)
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(html)
+    if schwellen_regler:
+        html = add_threshold_slider_to_html(html, G.graph.get("schwelle", 0), G.graph.get("max_betrag", 0))
+    if any("drilldown" in attrs for _, attrs in G.nodes(data=True)):
+        html = add_drilldown_to_html(html)
+    return add_legend_to_pyvis_html(html, G.graph.get("edge_legend"))
+
+
+def add_drilldown_to_html(html: str) -> str:
+    """Öffnet per Doppelklick auf einen Knoten dessen Kontenseite (Attribut ``drilldown``) in einem neuen Tab."""
+    script = """
+<script type="text/javascript">
+network.on("doubleClick", function(params) {
+    if (params.nodes.length === 0) return;
+    var knoten = nodes.get(params.nodes[0]);
+    if (knoten && knoten.drilldown) window.open(knoten.drilldown, "_blank");
+});
+</script>
+"""
+    return html.replace("</body>", script + "\n</body>")
+
+
+def add_threshold_slider_to_html(html: str, schwelle: float, max_betrag: float) -> str:
+    """
+    Ergänzt die pyvis-Seite um ein Eingabefeld und einen Schieberegler für die
+    Wesentlichkeitsschwelle. Farbe und Strichelung der Kanten werden im Browser
+    aus ``betrag``, ``farbe_ueber`` und ``farbe_unter`` der Kanten gesetzt (siehe
+    ``restyle_network_graph``), ohne die Seite neu zu erzeugen. Der Regler ist
+    kubisch skaliert, damit kleine Schwellen fein einstellbar bleiben.
+    """
+    schwelle = float(schwelle or 0)
+    max_betrag = float(max_betrag or 0)
+    slider_html = f"""
+<div id="schwelle-box" style="position: fixed; top: 20px; left: 20px; background: white; border: 1px solid #aaa;
+     padding: 10px; font-family: Arial, sans-serif; font-size: 12px; z-index: 999;">
+    <div><b>Schwelle:</b> <input id="schwelle-wert" type="number" min="0" step="1000" value="{schwelle:.0f}" style="width: 100px;"> €</div>
+    <input id="schwelle-slider" type="range" min="0" max="1000" value="0" style="width: 220px;">
+</div>
+<script type="text/javascript">
+(function() {{
+    var maxBetrag = {json.dumps(max_betrag)};
+    var feld = document.getElementById("schwelle-wert");
+    var regler = document.getElementById("schwelle-slider");
+    function anwenden(schwelle) {{
+        edges.update(edges.get({{filter: function(e) {{ return e.betrag !== undefined; }}}}).map(function(e) {{
+            var unter = e.betrag < schwelle;
+            return {{id: e.id, color: unter ? e.farbe_unter : e.farbe_ueber, dashes: unter}};
+        }}));
+    }}
+    function reglerSetzen(schwelle) {{
+        regler.value = maxBetrag > 0 ? Math.round(1000 * Math.cbrt(Math.min(schwelle / maxBetrag, 1))) : 0;
+    }}
+    regler.addEventListener("input", function() {{
+        var schwelle = Math.round(maxBetrag * Math.pow(regler.value / 1000, 3));
+        feld.value = schwelle;
+        anwenden(schwelle);
+    }});
+    feld.addEventListener("change", function() {{
+        var schwelle = Math.max(0, parseFloat(feld.value) || 0);
+        reglerSetzen(schwelle);
+        anwenden(schwelle);
+    }});
+    reglerSetzen({json.dumps(schwelle)});
+}})();
+</script>
+"""
+    return html.replace("</body>", slider_html + "\n</body>")
 
 
-def add_legend_to_pyvis_html(html: str):
+def add_legend_to_pyvis_html(html: str, zusatz_kanten: dict | None = None):
     node_legend = {
         "Umsatzerlöse": "#fbffa5",
         "Sonstige Erlöse": "#FBFF87FF",
@@ -347,6 +686,8 @@ def add_legend_to_pyvis_html(html: str):
         "Irrelevante Kombinationen": "gray",
         "Eröffnungsbuchungen": "lightblue"
     }
+    # weitere Kantenarten, z.B. Intercompany im konsolidierten Graphen
+    edge_legend.update(zusatz_kanten or {})
 
     # HTML für die Legende zusammenbauen
     legend_html = """
@@ -0,0 +1,200 @@
+import numpy as np
+import pandas as pd
+import networkx as nx
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from typing import Optional
+
+from network_analysis.account_graph import AccountGraph
+
+__all__ = [
+    "get_graph_metrics",
+    "get_bypass_flows",
+    "sparse_betweenness",
+    "apply_graph_metrics",
+    "UMGEHUNGEN",
+]
+
+# Direkte Flüsse zwischen zwei Kategorien, die üblicherweise über eine dritte laufen:
+# (Kategorie A, Kategorie B, erwarteter Zwischenschritt)
+UMGEHUNGEN = [
+    ("Umsatzerlöse", "Zahlungsmittel", "Debitoren"),
+    ("Aufwand", "Zahlungsmittel", "Kreditoren"),
+    ("Sonstige Erlöse", "Zahlungsmittel", "Debitoren"),
+]
+
+RISIKO_FARBE = "#ff0000"
+
+
+def _get_adjacency(graph: AccountGraph) -> tuple:
+    """Kontenindex und gewichtete Adjazenzmatrix (CSR) der Soll-Kanten kto -> gkto."""
+    A = graph.matrix("soll")
+    A.data = np.where(A.data > 0, A.data, 0.0)
+    A.eliminate_zeros()
+    A.sum_duplicates()
+    return graph.konten, A
+
+
+def sparse_betweenness(A: sparse.csr_matrix, k: Optional[int] = None, seed: int = 0) -> np.ndarray:
+    """
+    Betweenness-Zentralität (ungewichtete kürzeste Wege, gerichtet, normiert wie
+    networkx) nach Brandes. Die Breitensuche läuft ebenenweise über
+    Matrix-Vektor-Produkte der dünn besetzten Matrix. Mit ``k`` wird über ``k``
+    zufällige Startkonten geschätzt.
+    """
+    n = A.shape[0]
+    if n < 3:
+        return np.zeros(n)
+    B = (A != 0).astype("float64").tocsr()
+    Bt = B.T.tocsr()
+
+    if k is None or k >= n:
+        quellen = np.arange(n)
+    else:
+        quellen = np.random.default_rng(seed).choice(n, size=k, replace=False)
+
+    bc = np.zeros(n)
+    for s in quellen:
+        dist = np.full(n, -1, dtype=np.int64)
+        sigma = np.zeros(n)
+        dist[s] = 0
+        sigma[s] = 1.0
+        ebenen = [np.array([s])]
+        while True:
+            front = np.zeros(n)
+            front[ebenen[-1]] = sigma[ebenen[-1]]
+            erreicht = Bt @ front
+            neu = np.flatnonzero((erreicht > 0) & (dist < 0))
+            if len(neu) == 0:
+                break
+            dist[neu] = len(ebenen)
+            sigma[neu] = erreicht[neu]
+            ebenen.append(neu)
+
+        delta = np.zeros(n)
+        for d in range(len(ebenen) - 2, -1, -1):
+            w = ebenen[d + 1]
+            coef = np.zeros(n)
+            coef[w] = (1.0 + delta[w]) / sigma[w]
+            v = ebenen[d]
+            delta[v] = sigma[v] * (B @ coef)[v]
+        delta[s] = 0.0
+        bc += delta
+
+    bc *= n / len(quellen)
+    return bc / ((n - 1) * (n - 2))
+
+
+def get_bypass_flows(
+        df: pd.DataFrame,
+        kto_nr,
+        gkto_nr,
+        soll,
+        kto_kategorie,
+        schwelle: float = 0,
+        umgehungen: Optional[list] = None) -> pd.DataFrame:
+    """
+    Kanten, die einen erwarteten Zwischenschritt umgehen (z.B. Umsatzerlöse
+    direkt gegen Zahlungsmittel statt über Debitoren), mit Sollbetrag über ``schwelle``.
+    """
+    umgehungen = UMGEHUNGEN if umgehungen is None else umgehungen
+    kategorien = df[[kto_nr, kto_kategorie]].drop_duplicates(kto_nr).set_index(kto_nr)[kto_kategorie]
+    kanten = df.loc[df[soll] > schwelle, [kto_nr, gkto_nr, soll]].copy()
+    kanten["src_kategorie"] = kanten[kto_nr].map(kategorien)
+    kanten["dst_kategorie"] = kanten[gkto_nr].map(kategorien)
+
+    kanten["umgangen"] = None
+    for a, b, zwischen in umgehungen:
+        treffer = (
+            ((kanten["src_kategorie"] == a) & (kanten["dst_kategorie"] == b))
+            | ((kanten["src_kategorie"] == b) & (kanten["dst_kategorie"] == a))
+        )
+        kanten.loc[treffer & kanten["umgangen"].isna(), "umgangen"] = zwischen
+    return kanten[kanten["umgangen"].notna()].reset_index(drop=True)
+
+
+def get_graph_metrics(
+        df: pd.DataFrame,
+        kto_nr,
+        gkto_nr,
+        soll,
+        kto_kategorie: Optional[str] = None,
+        schwelle: float = 0,
+        betweenness_k: Optional[int] = None,
+        exakt_bis: int = 2000,
+        seed: int = 0,
+        graph: Optional[AccountGraph] = None) -> pd.DataFrame:
+    """
+    Kennzahlen je Konto aus dem aggregierten Journal (Index = Konto):
+    - "grad_soll"/"grad_haben": gewichteter Aus- bzw. Eingangsgrad (Sollbeträge)
+    - "betweenness": exakt bis ``exakt_bis`` Konten, darüber über ``betweenness_k``
+      (Standard 256) zufällige Startkonten geschätzt
+    - "komponente"/"komponente_groesse": stark zusammenhängende Komponente
+    - "umgehung": Konto ist an einem Umgehungsfluss über ``schwelle`` beteiligt
+    - "hohe_zentralitaet": Betweenness im obersten Prozent (und > 0)
+
+    ``graph`` (``AccountGraph`` von ``df``) wird sonst aus ``df`` erstellt.
+    """
+    if graph is None:
+        graph = AccountGraph.from_aggregate(df, kto_nr, gkto_nr, soll)
+    konten, A = _get_adjacency(graph)
+    n = len(konten)
+
+    if betweenness_k is None and n > exakt_bis:
+        betweenness_k = 256
+    bc = sparse_betweenness(A, k=betweenness_k, seed=seed)
+    n_komp, labels = connected_components(A, directed=True, connection="strong")
+    groesse = np.bincount(labels, minlength=n_komp)
+
+    metrics = pd.DataFrame(
+        {
+            "grad_soll": np.asarray(A.sum(axis=1)).ravel().round(2),
+            "grad_haben": np.asarray(A.sum(axis=0)).ravel().round(2),
+            "betweenness": bc,
+            "komponente": labels,
+            "komponente_groesse": groesse[labels],
+        },
+        index=konten,
+    )
+    grenze = np.quantile(bc, 0.99) if n else 0.0
+    metrics["hohe_zentralitaet"] = (bc > 0) & (bc >= grenze)
+
+    metrics["umgehung"] = False
+    if kto_kategorie is not None:
+        bypass = get_bypass_flows(df, kto_nr, gkto_nr, soll, kto_kategorie, schwelle)
+        beteiligt = pd.unique(pd.concat([bypass[kto_nr], bypass[gkto_nr]]))
+        metrics.loc[metrics.index.isin(beteiligt), "umgehung"] = True
+    return metrics
+
+
+def apply_graph_metrics(G: nx.DiGraph, metrics: pd.DataFrame, min_size: float = 10, max_size: float = 30) -> None:
+    """
+    Überträgt die Kennzahlen auf den Graphen: Knotengröße nach gewichtetem Grad
+    (Wurzel-skaliert), Kennzahlen im Tooltip und roter Rand bei Risikohinweisen.
+    """
+    grad = metrics["grad_soll"] + metrics["grad_haben"]
+    skala = np.sqrt(grad / grad.max()) if len(grad) and grad.max() > 0 else grad * 0
+
+    for konto, attrs in G.nodes(data=True):
+        if konto not in metrics.index:
+            continue
+        m = metrics.loc[konto]
+        attrs["size"] = round(float(min_size + skala[konto] * (max_size - min_size)), 2)
+
+        hinweise = []
+        if m["umgehung"]:
+            hinweise.append("Umgehungsfluss")
+        if m["hohe_zentralitaet"]:
+            hinweise.append("hohe Zentralität")
+        attrs["title"] = (
+            f"{attrs.get('title', '')}\n\n"
+            f"=== Netzwerkkennzahlen: ============\n"
+            f"Gewichteter Grad Soll: {m['grad_soll']:,.2f} €\n"
+            f"Gewichteter Grad Haben: {m['grad_haben']:,.2f} €\n"
+            f"Betweenness: {m['betweenness']:.4f}\n"
+            f"Komponente: {m['komponente']} ({m['komponente_groesse']} Konten)"
+            + (f"\nHinweise: {', '.join(hinweise)}" if hinweise else "")
+        )
+        if hinweise:
+            attrs["color"] = {"background": attrs.get("color"), "border": RISIKO_FARBE}
+            attrs["borderWidth"] = 3
@@ -0,0 +1,250 @@
+from functools import cached_property
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from network_analysis.account_graph import AccountGraph
+
+__all__ = [
+    "JET_REGELN",
+    "compile_rules",
+    "run_journal_entry_tests",
+    "get_jet_summary",
+    "get_bundesweite_feiertage",
+]
+
+# Standard-Regelsatz der Journal Entry Tests. Jede Regel hat einen Namen (Spalte der
+# Trefferliste), einen Typ ("regel") und dessen Parameter; "min_betrag" begrenzt
+# jede Regel auf Buchungen mit absolutem Betrag ab diesem Wert.
+JET_REGELN = [
+    {"name": "wochenende", "regel": "wochenende"},
+    {"name": "feiertag", "regel": "feiertag"},
+    {"name": "runder_betrag", "regel": "runder_betrag", "vielfaches": 1000},
+    {"name": "unter_freigabegrenze", "regel": "unter_grenze", "grenzen": [10_000, 50_000, 100_000], "abstand": 0.05},
+    {"name": "seltenes_kontenpaar", "regel": "seltenes_paar", "max_anteil": 0.01},
+    {"name": "duplikat", "regel": "duplikat"},
+]
+
+
+def get_bundesweite_feiertage(jahre) -> pd.DatetimeIndex:
+    """Bundesweite gesetzliche Feiertage (inkl. der beweglichen um Ostern) der gegebenen Jahre."""
+    jahre = np.unique(np.asarray(jahre, dtype=np.int64))
+    # Osterdatum nach der Gaußschen Osterformel (gregorianischer Kalender)
+    a, b, c = jahre % 19, jahre // 100, jahre % 100
+    d, e = b // 4, b % 4
+    g = (b - (b + 8) // 25 + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    l = (32 + 2 * e + 2 * (c // 4) - h - c % 4) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    monat = (h + l - 7 * m + 114) // 31
+    tag = (h + l - 7 * m + 114) % 31 + 1
+    ostern = pd.to_datetime(pd.DataFrame({"year": jahre, "month": monat, "day": tag}))
+
+    feste = [
+        pd.to_datetime(pd.DataFrame({"year": jahre, "month": mm, "day": dd}))
+        for mm, dd in [(1, 1), (5, 1), (10, 3), (12, 25), (12, 26)]
+    ]
+    beweglich = [ostern + pd.Timedelta(days=n) for n in (-2, 1, 39, 50)]
+    return pd.DatetimeIndex(pd.concat(feste + beweglich, ignore_index=True)).sort_values()
+
+
+class _Kontext:
+    """Einmal je Journal abgeleitete Spalten, auf die alle Regeln zugreifen (jeweils erst bei Bedarf)."""
+
+    def __init__(self, df, kto_nr, gkto_nr, soll, haben, saldo, journal_nr, datum, agg, graph, journal=None):
+        self.df = df
+        # ganzes Journal (beide Seiten der Spiegelpaare) für das Aggregat, falls ``agg`` fehlt
+        self.journal = df if journal is None else journal
+        self.kto_nr, self.gkto_nr = kto_nr, gkto_nr
+        self.soll, self.haben, self.saldo = soll, haben, saldo
+        self.journal_nr = journal_nr
+        self.datum_col = datum
+        self.agg = agg
+        self._graph = graph
+
+    @cached_property
+    def betrag(self) -> np.ndarray:
+        """Absoluter Betrag je Buchung."""
+        return np.abs(pd.to_numeric(self.df[self.saldo], errors="coerce").to_numpy(dtype="float64", na_value=np.nan))
+
+    @cached_property
+    def datum(self) -> pd.Series:
+        if self.datum_col is None or self.datum_col not in self.df.columns:
+            raise ValueError("Für die Datumsregeln wird die Spalte des Belegdatums (`datum`) benötigt.")
+        return pd.to_datetime(self.df[self.datum_col], errors="coerce")
+
+    @cached_property
+    def graph(self) -> AccountGraph:
+        if self._graph is None:
+            agg = self.agg
+            if agg is None:
+                agg = self.journal.groupby([self.kto_nr, self.gkto_nr], as_index=False)[[self.soll, self.haben]].sum()
+            self._graph = AccountGraph.from_aggregate(agg, self.kto_nr, self.gkto_nr, self.soll, self.haben)
+        return self._graph
+
+    @cached_property
+    def kante(self) -> np.ndarray:
+        """Position der Kante (Konto, Gegenkonto) im Graphen je Buchung, -1 falls unbekannt."""
+        konten = self.graph.konten
+        return self.graph.finde_kanten(konten.get_indexer(self.df[self.kto_nr]), konten.get_indexer(self.df[self.gkto_nr]))
+
+    @cached_property
+    def kante_gespiegelt(self) -> np.ndarray:
+        """Position der Gegenrichtung (Gegenkonto, Konto) im Graphen je Buchung, -1 falls unbekannt."""
+        konten = self.graph.konten
+        return self.graph.finde_kanten(konten.get_indexer(self.df[self.gkto_nr]), konten.get_indexer(self.df[self.kto_nr]))
+
+
+def _regel_wochenende(ctx: _Kontext) -> np.ndarray:
+    return (ctx.datum.dt.dayofweek >= 5).to_numpy(dtype=bool, na_value=False)
+
+
+def _regel_feiertag(ctx: _Kontext, feiertage=None) -> np.ndarray:
+    tage = ctx.datum.dt.normalize()
+    if feiertage is None:
+        jahre = tage.dt.year.dropna().unique()
+        feiertage = get_bundesweite_feiertage(jahre)
+    return tage.isin(pd.to_datetime(feiertage)).to_numpy(dtype=bool)
+
+
+def _regel_runder_betrag(ctx: _Kontext, vielfaches: float = 1000) -> np.ndarray:
+    cent = np.round(ctx.betrag * 100)
+    schritt = round(vielfaches * 100)
+    return (ctx.betrag >= vielfaches) & (np.fmod(cent, schritt) == 0)
+
+
+def _regel_unter_grenze(ctx: _Kontext, grenzen, abstand: float = 0.05) -> np.ndarray:
+    grenzen = np.asarray(grenzen, dtype="float64")
+    betrag = ctx.betrag[:, None]
+    return ((betrag >= grenzen * (1 - abstand)) & (betrag < grenzen)).any(axis=1)
+
+
+def _regel_seltenes_paar(ctx: _Kontext, max_anteil: float = 0.01) -> np.ndarray:
+    """
+    Anteil der Kontenkombination am Umsatz (Soll + Haben) des Kontos bzw. des
+    Gegenkontos aus dem Aggregat; selten ist sie, wenn einer der beiden Anteile
+    höchstens ``max_anteil`` beträgt (gleiches Ergebnis für beide Seiten einer Buchung).
+    """
+    graph = ctx.graph
+    volumen = np.nan_to_num(np.abs(graph.werte["soll"])) + np.nan_to_num(np.abs(graph.werte["haben"]))
+    quelle = np.repeat(np.arange(graph.n_konten), np.diff(graph.indptr))
+    je_konto = np.bincount(quelle, weights=volumen, minlength=graph.n_konten)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        anteil = np.where(je_konto[quelle] > 0, volumen / je_konto[quelle], 1.0)
+    selten = np.zeros(len(ctx.df), dtype=bool)
+    for kante in (ctx.kante, ctx.kante_gespiegelt):
+        selten |= (kante >= 0) & (anteil[np.maximum(kante, 0)] <= max_anteil)
+    return selten
+
+
+def _regel_duplikat(ctx: _Kontext, spalten: Optional[list] = None) -> np.ndarray:
+    """Gleiche Buchung (Konto, Gegenkonto, Betrag, Datum) in mehreren Journalnummern."""
+    if spalten is None:
+        spalten = [ctx.kto_nr, ctx.gkto_nr, ctx.saldo] + ([ctx.datum_col] if ctx.datum_col is not None else [])
+    schluessel = ctx.df[spalten].assign(**{ctx.saldo: ctx.df[ctx.saldo].round(2)})
+    gruppen = schluessel.groupby(spalten, sort=False, dropna=False).ngroup().to_numpy()
+    journale = pd.Series(ctx.df[ctx.journal_nr].to_numpy()).groupby(gruppen).transform("nunique")
+    return (journale > 1).to_numpy(dtype=bool)
+
+
+_REGELTYPEN = {
+    "wochenende": _regel_wochenende,
+    "feiertag": _regel_feiertag,
+    "runder_betrag": _regel_runder_betrag,
+    "unter_grenze": _regel_unter_grenze,
+    "seltenes_paar": _regel_seltenes_paar,
+    "duplikat": _regel_duplikat,
+}
+
+
+def compile_rules(regeln: Optional[list] = None) -> list:
+    """
+    Übersetzt den deklarativen Regelsatz (Standard ``JET_REGELN``) in eine Liste
+    von (Name, Funktion), die zu einem ``_Kontext`` die Treffermaske liefert.
+    Unbekannte Regeltypen und doppelte Namen werden hier bereits abgewiesen.
+    """
+    if regeln is None:
+        regeln = JET_REGELN
+    kompiliert = []
+    for regel in regeln:
+        parameter = dict(regel)
+        typ = parameter.pop("regel", None)
+        name = parameter.pop("name", typ)
+        min_betrag = parameter.pop("min_betrag", None)
+        if typ not in _REGELTYPEN:
+            raise ValueError(f"Unbekannter Regeltyp {typ!r}, erlaubt sind {sorted(_REGELTYPEN)}.")
+        if any(name == n for n, _ in kompiliert):
+            raise ValueError(f"Regelname {name!r} ist mehrfach vergeben.")
+
+        def auswerten(ctx, _f=_REGELTYPEN[typ], _p=parameter, _min=min_betrag):
+            maske = _f(ctx, **_p)
+            return maske if _min is None else maske & (ctx.betrag >= _min)
+
+        kompiliert.append((name, auswerten))
+    return kompiliert
+
+
+def run_journal_entry_tests(
+        df: pd.DataFrame,
+        kto_nr,
+        gkto_nr,
+        soll,
+        haben,
+        saldo,
+        journal_nr,
+        datum: Optional[str] = None,
+        regeln: Optional[list] = None,
+        agg: Optional[pd.DataFrame] = None,
+        graph: Optional[AccountGraph] = None,
+        spiegelbuchungen: bool = True) -> pd.DataFrame:
+    """
+    Wertet alle Regeln (Standard ``JET_REGELN``) in einem Durchlauf über das
+    aufbereitete Journal aus. Datum, Beträge und Kontenkombinationen werden dafür
+    einmal abgeleitet und von allen Regeln geteilt; die Seltenheit einer
+    Kontenkombination stammt aus dem aggregierten Journal (``agg`` bzw. dessen
+    ``graph``, sonst aus ``df`` aggregiert).
+
+    Das aufbereitete Journal enthält jede Buchung zweimal (Konto an Gegenkonto und
+    gespiegelt); mit ``spiegelbuchungen`` wird daher nur die Sollseite ausgewertet,
+    damit jede Buchung einmal in der Trefferliste steht.
+
+    Gibt die Trefferliste zurück: alle Buchungen mit mindestens einem Treffer,
+    je Regel eine boolesche Spalte und "jet_regeln" mit den getroffenen Regeln.
+    """
+    kompiliert = compile_rules(regeln)
+    journal = df
+    if spiegelbuchungen:
+        df = df.iloc[_get_sollseite(df, kto_nr, gkto_nr, soll, haben)]
+    ctx = _Kontext(df, kto_nr, gkto_nr, soll, haben, saldo, journal_nr, datum, agg, graph, journal)
+
+    masken = {name: np.asarray(auswerten(ctx), dtype=bool) for name, auswerten in kompiliert}
+    treffer = np.column_stack(list(masken.values())) if masken else np.zeros((len(df), 0), dtype=bool)
+    zeilen = np.flatnonzero(treffer.any(axis=1))
+
+    namen = np.array(list(masken), dtype=object)
+    hits = df.iloc[zeilen].copy()
+    for name, maske in masken.items():
+        hits[name] = maske[zeilen]
+    hits["jet_regeln"] = [", ".join(namen[t]) for t in treffer[zeilen]]
+    return hits
+
+
+def _get_sollseite(df: pd.DataFrame, kto_nr, gkto_nr, soll, haben) -> np.ndarray:
+    """Positionen je einer Seite der Spiegelpaare: Soll > Haben, bei Gleichstand Konto <= Gegenkonto."""
+    differenz = (
+        pd.to_numeric(df[soll], errors="coerce").to_numpy(dtype="float64", na_value=0.0)
+        - pd.to_numeric(df[haben], errors="coerce").to_numpy(dtype="float64", na_value=0.0)
+    )
+    konto = df[kto_nr].astype("string").to_numpy(dtype=object, na_value="")
+    gegenkonto = df[gkto_nr].astype("string").to_numpy(dtype=object, na_value="")
+    return np.flatnonzero((differenz > 0) | ((differenz == 0) & (konto <= gegenkonto)))
+
+
+def get_jet_summary(hits: pd.DataFrame, regeln: Optional[list] = None) -> pd.DataFrame:
+    """Anzahl der Treffer je Regel aus der Trefferliste von ``run_journal_entry_tests``."""
+    namen = [name for name, _ in compile_rules(regeln)]
+    return pd.DataFrame({
+        "regel": namen,
+        "treffer": [int(hits[name].sum()) if name in hits.columns else 0 for name in namen],
+    })
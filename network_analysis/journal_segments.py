@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+__all__ = ["JournalSegments"]
+
+
+class JournalSegments:
+    """
+    Einmal erstellter Index der Buchungssätze (Segmente je Journalnummer).
+
+    ``codes`` ordnet jeder Zeile ihr Segment zu; die Segmente sind nach
+    Journalnummer sortiert, Zeilen ohne Journalnummer bilden das letzte Segment
+    (``keys`` ist dort <NA>, siehe ``valid``). ``order`` sortiert die Zeilen
+    stabil nach Segment, ``offsets`` markiert die Segmentgrenzen in dieser
+    Reihenfolge. Segmentweise Summen werden per ``np.add.reduceat`` gebildet,
+    die Journalnummern also nur einmal gehasht.
+
+    Der Index gilt für Zeilenpositionen: Stufen, die Zeilen weder hinzufügen,
+    entfernen noch umsortieren (z.B. ``normalize_soll_haben``), können ihn
+    weiterverwenden; sonst wird er über ``from_codes`` fortgeschrieben.
+    """
+
+    def __init__(self, codes: np.ndarray, keys: np.ndarray):
+        self.codes = np.asarray(codes, dtype=np.int64)
+        self.keys = keys
+        if len(self.codes) and (np.diff(self.codes) >= 0).all():
+            self.order = np.arange(len(self.codes))
+        else:
+            self.order = np.argsort(self.codes, kind="stable")
+        grenzen = np.flatnonzero(np.diff(self.codes[self.order])) + 1
+        self.offsets = np.concatenate(([0], grenzen, [len(self.codes)])).astype(np.int64)
+        self.sums = {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, journal_nr, sum_cols: tuple = ()) -> "JournalSegments":
+        """Index über ``df[journal_nr]``; für ``sum_cols`` werden die Segmentsummen vorab gebildet."""
+        codes, keys = pd.factorize(df[journal_nr], sort=True)
+        keys = np.asarray(keys, dtype=object)
+        if (codes < 0).any():
+            codes = np.where(codes < 0, len(keys), codes)
+            keys = np.append(keys, pd.NA)
+        segments = cls(codes, keys)
+        for col in sum_cols:
+            segments.sum(df[col], name=col)
+        return segments
+
+    @classmethod
+    def from_codes(cls, codes: np.ndarray, keys: np.ndarray) -> "JournalSegments":
+        """Index aus Segmentnummern (z.B. nach Hinzufügen oder Entfernen von Zeilen), leere Segmente entfallen."""
+        vorhanden, codes = np.unique(codes, return_inverse=True)
+        return cls(codes, keys[vorhanden])
+
+    @property
+    def n_rows(self) -> int:
+        return len(self.codes)
+
+    @property
+    def n_segments(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def valid(self) -> np.ndarray:
+        """Segmente mit Journalnummer."""
+        return ~pd.isna(self.keys)
+
+    def check(self, df: pd.DataFrame) -> None:
+        if len(df) != self.n_rows:
+            raise ValueError("Der Journalindex passt nicht zum Journal (abweichende Zeilenzahl).")
+
+    def sum(self, values, name: Optional[str] = None) -> np.ndarray:
+        """Summe je Segment; mit ``name`` wird sie unter ``sums[name]`` vorgehalten."""
+        if name is not None and name in self.sums:
+            return self.sums[name]
+        if isinstance(values, pd.Series):
+            values = values.to_numpy(dtype="float64", na_value=np.nan)
+        # fehlende Beträge zählen wie bei groupby().sum() als 0
+        werte = np.nan_to_num(np.asarray(values, dtype="float64"), nan=0.0)
+        if self.n_rows == 0:
+            summe = np.zeros(0)
+        else:
+            summe = np.add.reduceat(werte[self.order], self.offsets[:-1])
+        if name is not None:
+            self.sums[name] = summe
+        return summe
+
+    def size(self) -> np.ndarray:
+        """Anzahl Zeilen je Segment."""
+        return np.diff(self.offsets)
+
+    def broadcast(self, per_segment: np.ndarray) -> np.ndarray:
+        """Wert je Segment auf die Zeilen übertragen."""
+        return np.asarray(per_segment)[self.codes]
@@ -0,0 +1,204 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+__all__ = [
+    "OHNE_DATUM",
+    "get_periode",
+    "get_period_cube",
+    "get_period_totals",
+    "get_period_deltas",
+    "add_period_slider_to_html",
+]
+
+AUFFAELLIG_FARBE = "#ff00ff"
+
+# Periode der Buchungen ohne (gültiges) Belegdatum, damit der Würfel vollständig bleibt
+OHNE_DATUM = "ohne Datum"
+
+
+def get_periode(datum: pd.Series, periode: str = "M") -> pd.Series:
+    """Periode (z.B. "2023-12" bzw. "2023Q4") je Belegdatum, fehlende Daten ergeben ``OHNE_DATUM``."""
+    if periode not in {"M", "Q"}:
+        raise ValueError("`periode` muss 'M' (Monat) oder 'Q' (Quartal) sein.")
+    perioden = pd.to_datetime(datum, errors="coerce").dt.to_period(periode)
+    return perioden.astype("string").fillna(OHNE_DATUM)
+
+
+def get_period_cube(
+        df: pd.DataFrame,
+        kto_nr,
+        kto_name,
+        gkto_nr,
+        gkto_name,
+        soll,
+        haben,
+        saldo,
+        periode: str = "periode") -> pd.DataFrame:
+    """
+    Aggregiert das aufbereitete Journal in einem groupby nach Konto, Gegenkonto
+    und Periode. Alle periodischen Auswertungen und das Aggregat je Konto und
+    Gegenkonto (``get_period_totals``) werden aus diesem Würfel abgeleitet;
+    Buchungen ohne Belegdatum bilden die Periode ``OHNE_DATUM``.
+    """
+    if periode not in df.columns:
+        raise ValueError(f"Das Journal enthält keine Spalte {periode}; prepare_journal mit `datum` aufrufen.")
+    cube = (
+        df
+        .groupby([kto_nr, gkto_nr, periode], as_index=False, sort=True)
+        .agg({
+            kto_name: "first",
+            gkto_name: "first",
+            soll: "sum",
+            haben: "sum",
+            saldo: "sum",
+        })
+    )
+    for col in [soll, haben, saldo]:
+        cube[col] = cube[col].round(2)
+    return cube
+
+
+def get_period_totals(cube: pd.DataFrame, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo) -> pd.DataFrame:
+    """
+    Summen über alle Perioden je Konto und Gegenkonto (wie das aggregierte Journal,
+    siehe ``get_nodes_and_edges_from_period_cube`` samt Prüfungen).
+    """
+    totals = (
+        cube
+        .groupby([kto_nr, gkto_nr], as_index=False)
+        .agg({kto_name: "first", gkto_name: "first", soll: "sum", haben: "sum", saldo: "sum"})
+    )
+    for col in [soll, haben, saldo]:
+        totals[col] = totals[col].round(2)
+    return totals
+
+
+def get_period_deltas(
+        cube: pd.DataFrame,
+        kto_nr,
+        gkto_nr,
+        soll,
+        periode: str = "periode",
+        faktor: float = 2.0,
+        schwelle: float = 0) -> pd.DataFrame:
+    """
+    Sollbeträge je Kante und Periode mit Veränderung zur Vorperiode.
+
+    Eine Kante gilt in einer Periode als auffällig, wenn ihr Betrag über
+    ``schwelle`` liegt und sie
+    - erstmals auftritt (in allen Vorperioden ohne Sollbetrag) oder
+    - mehr als ``faktor`` mal so hoch ist wie im Mittel der Vorperioden.
+
+    Die Periode ``OHNE_DATUM`` hat keinen Platz in der zeitlichen Abfolge und
+    bleibt hier außen vor (im Gesamtzeitraum ist sie enthalten).
+    """
+    cube = cube[cube[periode] != OHNE_DATUM]
+    matrix = cube.pivot_table(index=[kto_nr, gkto_nr], columns=periode, values=soll, aggfunc="sum", fill_value=0.0)
+    werte = matrix.to_numpy(dtype="float64")
+    n_perioden = werte.shape[1]
+
+    vorperiode = np.zeros_like(werte)
+    vorperiode[:, 1:] = werte[:, :-1]
+    summe_vorher = np.cumsum(werte, axis=1) - werte
+    anzahl_vorher = np.arange(n_perioden, dtype="float64")
+    mittel_vorher = np.divide(summe_vorher, anzahl_vorher, out=np.zeros_like(werte), where=anzahl_vorher > 0)
+    max_vorher = np.zeros_like(werte)
+    if n_perioden > 1:
+        max_vorher[:, 1:] = np.maximum.accumulate(werte, axis=1)[:, :-1]
+
+    hat_vorperioden = anzahl_vorher > 0
+    neu = hat_vorperioden & (werte > 0) & (max_vorher <= 0)
+    wachstum = hat_vorperioden & (mittel_vorher > 0) & (werte > faktor * mittel_vorher)
+    auffaellig = (neu | wachstum) & (werte > schwelle)
+
+    deltas = pd.DataFrame({
+        kto_nr: np.repeat(matrix.index.get_level_values(0).to_numpy(), n_perioden),
+        gkto_nr: np.repeat(matrix.index.get_level_values(1).to_numpy(), n_perioden),
+        periode: np.tile(matrix.columns.to_numpy(), len(matrix)),
+        soll: werte.ravel(),
+        "vorperiode": vorperiode.ravel(),
+        "delta": (werte - vorperiode).ravel().round(2),
+        "mittel_vorperioden": mittel_vorher.ravel().round(2),
+        "neu": neu.ravel(),
+        "auffaellig": auffaellig.ravel(),
+    })
+    return deltas
+
+
+def add_period_slider_to_html(
+        html: str,
+        deltas: pd.DataFrame,
+        kto_nr,
+        gkto_nr,
+        soll,
+        periode: str = "periode") -> str:
+    """
+    Ergänzt die pyvis-Seite um einen Schieberegler über die Perioden. Je Periode
+    werden Kantenstärke und Tooltip aus ``deltas`` gesetzt, Kanten ohne Sollbetrag
+    ausgeblendet und auffällige Kanten hervorgehoben. Stellung 0 = Gesamtzeitraum.
+    """
+    perioden = [str(p) for p in pd.unique(deltas[periode])]
+    aktiv = deltas[deltas[soll] > 0]
+    daten = {p: {} for p in perioden}
+    for kto, gkto, p, betrag, vor, delta, auff in zip(
+        aktiv[kto_nr], aktiv[gkto_nr], aktiv[periode], aktiv[soll],
+        aktiv["vorperiode"], aktiv["delta"], aktiv["auffaellig"],
+    ):
+        daten[str(p)][f"{kto}->{gkto}"] = [round(float(betrag), 2), round(float(vor), 2), float(delta), bool(auff)]
+
+    slider_html = f"""
+<div id="periode-box" style="position: fixed; top: 20px; right: 20px; background: white; border: 1px solid #aaa;
+     padding: 10px; font-family: Arial, sans-serif; font-size: 12px; z-index: 999;">
+    <div><b>Periode:</b> <span id="periode-label">Gesamt</span></div>
+    <input id="periode-slider" type="range" min="0" max="{len(perioden)}" value="0" step="1" style="width: 260px;">
+</div>
+<script type="text/javascript">
+(function() {{
+    var perioden = {json.dumps(perioden)};
+    var daten = {json.dumps(daten, ensure_ascii=False)};
+    var original = null;
+    var originalById = {{}};
+    function fmt(x) {{
+        return x.toLocaleString("de-DE", {{minimumFractionDigits: 2, maximumFractionDigits: 2}}) + " €";
+    }}
+    function zeige(i) {{
+        if (original === null) {{
+            original = edges.get().map(function(e) {{
+                return {{id: e.id, value: e.value, color: e.color, title: e.title, hidden: false}};
+            }});
+            original.forEach(function(o) {{ originalById[o.id] = o; }});
+        }}
+        if (i === 0) {{
+            document.getElementById("periode-label").textContent = "Gesamt";
+            edges.update(original);
+            return;
+        }}
+        var p = perioden[i - 1];
+        document.getElementById("periode-label").textContent = p;
+        var werte = daten[p] || {{}};
+        edges.update(edges.get().map(function(e) {{
+            var w = werte[e.from + "->" + e.to];
+            if (!w) {{
+                return {{id: e.id, hidden: true}};
+            }}
+            var o = originalById[e.id];
+            return {{
+                id: e.id,
+                hidden: false,
+                value: w[0],
+                color: w[3] ? "{AUFFAELLIG_FARBE}" : o.color,
+                title: o.title + "\\n\\nPeriode " + p + ": " + fmt(w[0]) +
+                       "\\nVorperiode: " + fmt(w[1]) + "\\nVeränderung: " + fmt(w[2]) +
+                       (w[3] ? "\\nAUFFÄLLIG" : "")
+            }};
+        }}));
+    }}
+    document.getElementById("periode-slider").addEventListener("input", function(ev) {{
+        zeige(parseInt(ev.target.value, 10));
+    }});
+}})();
+</script>
+"""
+    return html.replace("</body>", slider_html + "\n</body>")
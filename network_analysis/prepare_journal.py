@@ -1,8 +1,11 @@
 import pandas as pd
 from network_analysis.check_journal import test_ob_jede_buchung_umgedreht_doppelt, test_saldo_je_journalnummer
 from network_analysis.normalize_soll_haben import normalize_soll_haben
-from network_analysis.replicate_div_rows import replicate_div_rows
+from network_analysis.replicate_div_rows import _replicate_div_rows
+from network_analysis.journal_segments import JournalSegments
 from network_analysis.replace_debitoren_kreditoren import replace_debitoren_kreditoren
+from network_analysis.period_cube import get_periode
+from instrumentation.run_report import stage
 
 def prepare_journal(
         df: pd.DataFrame,
@@ -13,13 +16,34 @@ def prepare_journal(
         soll,
         haben,
         saldo,
-        journal_nr
+        journal_nr,
+        datum: str | None = None,
+        periode: str = "M",
+        div_modus: str = "fehler",
         )-> pd.DataFrame:   
-    """Journalaubereitung zur Gegenkontoanalyse"""
+    """Journalaubereitung zur Gegenkontoanalyse.
+
+    Mit ``datum`` wird zusätzlich die Spalte "periode" (Monat "M" oder Quartal "Q"
+    des Belegdatums) für die periodische Auswertung angelegt. ``div_modus``
+    "proportional" teilt Buchungssätze mit mehreren Div-Zeilen anteilig auf, statt
+    abzubrechen (siehe ``replicate_div_rows``).
+
+    Der Journalindex (Segmente je JOURNAL_NR) wird einmal erstellt und von allen
+    Stufen geteilt; ``normalize_soll_haben`` lässt die Zeilen unverändert, der
+    Index bleibt also gültig."""
     
-    df_prep = replicate_div_rows(df, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, journal_nr)
+    with stage("journal_segments", rows_in=len(df)) as s:
+        segments = JournalSegments.from_frame(df, journal_nr)
+        s.extra["segments"] = segments.n_segments
 
-    df_prep = normalize_soll_haben(df_prep, soll=soll, haben=haben)
+    with stage("replicate_div_rows", rows_in=len(df)) as s:
+        df_prep, segments, _ = _replicate_div_rows(df, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, journal_nr, segments,
+                                                     div_modus=div_modus)
+        s.rows_out = len(df_prep)
+
+    with stage("normalize_soll_haben", rows_in=len(df_prep)) as s:
+        df_prep = normalize_soll_haben(df_prep, soll=soll, haben=haben)
+        s.rows_out = len(df_prep)
     
     ### Bei Bedarf
     # df_prep = replace_debitoren_kreditoren(
@@ -32,8 +56,13 @@ def prepare_journal(
     #     gkto_name=gkto_name
     #     )
 
-    test_saldo_je_journalnummer(df_prep, saldo=saldo, journal_nr=journal_nr)
-    test_ob_jede_buchung_umgedreht_doppelt(df_prep, kto_nr, gkto_nr, saldo, journal_nr)
+    with stage("test_saldo_je_journalnummer", rows_in=len(df_prep)):
+        test_saldo_je_journalnummer(df_prep, saldo=saldo, journal_nr=journal_nr, segments=segments)
+    with stage("test_ob_jede_buchung_umgedreht_doppelt", rows_in=len(df_prep)):
+        test_ob_jede_buchung_umgedreht_doppelt(df_prep, kto_nr, gkto_nr, saldo, journal_nr, segments=segments)
     #df_prep.to_excel("ertweitertes_journal.xlsx")
+
+    if datum is not None:
+        df_prep["periode"] = get_periode(df_prep[datum], periode)
     
     return df_prep
\ No newline at end of file
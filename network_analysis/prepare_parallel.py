@@ -0,0 +1,194 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from network_analysis.aggregate_journal import _get_journal_grouped_by_kto_and_gkto, get_nodes_and_edges_by_aggregating_journal
+from network_analysis.check_journal import (
+    _get_fehlerhafte_buchungen,
+    _get_saldo_je_journalnummer_fehler,
+    _report_fehlerhafte_buchungen,
+    _report_saldo_je_journalnummer,
+)
+from network_analysis.journal_segments import JournalSegments
+from network_analysis.normalize_soll_haben import normalize_soll_haben
+from network_analysis.period_cube import get_periode
+from network_analysis.replicate_div_rows import _replicate_div_rows, _report_ambiguous_journals
+from instrumentation.run_report import stage
+
+__all__ = ["prepare_and_aggregate_parallel"]
+
+
+class _SharedColumns:
+    """
+    Spalten eines Journals als numpy-Puffer im gemeinsamen Speicher
+    (``multiprocessing.shared_memory``), damit die Worker sie ohne Pickeln des
+    DataFrames lesen. Zahlenspalten liegen als float64 vor, alle übrigen als
+    Codes (``pd.factorize``), deren Kategorien einmal mit der Beschreibung
+    übergeben werden. Die Journalnummer wird nur als Code geteilt.
+    """
+
+    def __init__(self, df: pd.DataFrame, columns: list, order: np.ndarray, journal_nr):
+        self._blocks = []
+        self.spec = {}
+        try:
+            for col in columns:
+                series = df[col]
+                if col == journal_nr:
+                    werte, kategorien = pd.factorize(series, sort=True)[0], None
+                elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+                    werte, kategorien = series.to_numpy(dtype="float64", na_value=np.nan), None
+                else:
+                    werte, kategorien = pd.factorize(series)
+                    kategorien = np.asarray(kategorien, dtype=object)
+                werte = np.ascontiguousarray(werte[order])
+                block = shared_memory.SharedMemory(create=True, size=max(werte.nbytes, 1))
+                self._blocks.append(block)
+                np.ndarray(werte.shape, dtype=werte.dtype, buffer=block.buf)[:] = werte
+                self.spec[col] = (block.name, werte.dtype.str, len(werte), kategorien, series.dtype)
+        except Exception:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+        self._blocks = []
+
+
+def _read_shared_columns(spec: dict, start: int, stop: int, journal_nr) -> pd.DataFrame:
+    """Zeilen ``start:stop`` der geteilten Spalten als DataFrame (Journalnummer als Code, Int64)."""
+    spalten = {}
+    for col, (name, dtype, n, kategorien, original) in spec.items():
+        block = shared_memory.SharedMemory(name=name)
+        try:
+            werte = np.ndarray((n,), dtype=dtype, buffer=block.buf)[start:stop].copy()
+        finally:
+            block.close()
+        if col == journal_nr:
+            spalten[col] = pd.array(np.where(werte < 0, 0, werte), dtype="Int64")
+            spalten[col][werte < 0] = pd.NA
+        elif kategorien is None:
+            spalten[col] = pd.Series(werte).astype(original)
+        else:
+            text = kategorien.take(np.maximum(werte, 0)) if len(kategorien) else np.full(len(werte), None, dtype=object)
+            text[werte < 0] = None
+            spalten[col] = pd.Series(text).astype(original)
+    return pd.DataFrame(spalten)
+
+
+def _prepare_partition(spec: dict, start: int, stop: int, cols: tuple, datum, periode: str, div_modus: str,
+                       journal: bool) -> dict:
+    """
+    Aufbereitung einer Partition wie ``prepare_journal`` (Div-Zeilen, Soll/Haben,
+    Prüfungen je JOURNAL_NR), jedoch ohne Ausgabe: die Befunde der Prüfungen und das
+    ungerundete Teilaggregat je (Konto, Gegenkonto) werden zurückgegeben.
+    """
+    kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, journal_nr = cols
+    df = _read_shared_columns(spec, start, stop, journal_nr)
+    segments = JournalSegments.from_frame(df, journal_nr)
+    df_prep, segments, mehrdeutig = _replicate_div_rows(
+        df, *cols, segments, div_modus=div_modus, report=False
+    )
+    df_prep = normalize_soll_haben(df_prep, soll=soll, haben=haben)
+    saldo_bad, saldo_output = _get_saldo_je_journalnummer_fehler(df_prep, journal_nr, saldo, segments=segments)
+    problems = _get_fehlerhafte_buchungen(df_prep, kto_nr, gkto_nr, saldo, journal_nr, segments)
+    if datum is not None:
+        df_prep["periode"] = get_periode(df_prep[datum], periode)
+    return {
+        "agg": _get_journal_grouped_by_kto_and_gkto(df_prep, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo,
+                                                    runden=False),
+        "mehrdeutig": mehrdeutig,
+        "saldo_bad": saldo_bad,
+        "saldo_output": saldo_output,
+        "problems": problems,
+        "journal": df_prep if journal else None,
+    }
+
+
+def prepare_and_aggregate_parallel(
+        df: pd.DataFrame,
+        kto_nr,
+        kto_name,
+        gkto_nr,
+        gkto_name,
+        soll,
+        haben,
+        saldo,
+        journal_nr,
+        datum: str | None = None,
+        periode: str = "M",
+        div_modus: str = "fehler",
+        max_workers: Optional[int] = None,
+        n_partitions: Optional[int] = None,
+        journal: bool = False):
+    """
+    ``prepare_journal`` und Aggregation nach Konto und Gegenkonto, verteilt auf Prozesse.
+
+    Das Journal wird nach JOURNAL_NR in ``n_partitions`` (Standard: ``max_workers``
+    bzw. Anzahl CPU-Kerne) Partitionen zerlegt, jeder Buchungssatz liegt also
+    vollständig in einer Partition. Die Spalten werden einmal in den gemeinsamen
+    Speicher gelegt; jeder Worker bereitet seine Partition auf, prüft sie und
+    aggregiert sie vor. Die Befunde werden wie bei ``prepare_journal`` gemeinsam
+    ausgegeben, die Teilaggregate zusammengeführt und wie bei
+    ``get_nodes_and_edges_by_aggregating_journal`` geprüft.
+
+    Berücksichtigt werden nur die übergebenen Spalten (und ``datum``). Gibt das
+    Aggregat zurück, mit ``journal`` zusätzlich vorab das aufbereitete Journal
+    (``(df_clean, agg)``).
+    """
+    cols = (kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, journal_nr)
+    n_partitions = n_partitions or max_workers or os.cpu_count() or 1
+    columns = list(dict.fromkeys(cols + ((datum,) if datum is not None else ())))
+
+    with stage("partition_journal", rows_in=len(df)) as s:
+        codes, keys = pd.factorize(df[journal_nr], sort=True)
+        partition = np.where(codes < 0, 0, codes % n_partitions)
+        order = np.argsort(partition, kind="stable")
+        grenzen = np.searchsorted(partition[order], np.arange(n_partitions + 1))
+        shared = _SharedColumns(df, columns, order, journal_nr)
+        s.extra["partitions"] = n_partitions
+
+    try:
+        tasks = [
+            (shared.spec, int(grenzen[i]), int(grenzen[i + 1]), cols, datum, periode, div_modus, journal)
+            for i in range(n_partitions) if grenzen[i + 1] > grenzen[i]
+        ]
+        with stage("prepare_partitions", rows_in=len(df)) as s:
+            if max_workers == 1 or len(tasks) <= 1:
+                teile = [_prepare_partition(*task) for task in tasks]
+            else:
+                with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                    teile = list(pool.map(_prepare_partition, *zip(*tasks)))
+            s.rows_out = sum(len(t["journal"]) for t in teile) if journal else None
+    finally:
+        shared.close()
+
+    def _keys(code: pd.Series) -> pd.Series:
+        code = code.to_numpy(dtype="int64", na_value=-1)
+        werte = np.asarray(keys, dtype=object).take(np.maximum(code, 0)) if len(keys) else np.full(len(code), None, dtype=object)
+        werte[code < 0] = None
+        return pd.Series(werte).astype(df[journal_nr].dtype)
+
+    def _sammeln(name: str, spalte) -> pd.DataFrame:
+        teil = pd.concat([t[name] for t in teile], ignore_index=True) if teile else pd.DataFrame(columns=[spalte])
+        teil = teil.sort_values(spalte, kind="stable", na_position="last", ignore_index=True)
+        return teil.assign(**{spalte: _keys(teil[spalte])})
+
+    with stage("report_partitions"):
+        _report_ambiguous_journals(_sammeln("mehrdeutig", journal_nr), journal_nr)
+        _report_saldo_je_journalnummer(_sammeln("saldo_bad", journal_nr), _sammeln("saldo_output", journal_nr))
+        _report_fehlerhafte_buchungen(_sammeln("problems", "JOURNAL_NR"))
+
+    agg = get_nodes_and_edges_by_aggregating_journal(
+        pd.concat([t["agg"] for t in teile], ignore_index=True),
+        kto_nr=kto_nr, kto_name=kto_name, gkto_nr=gkto_nr, gkto_name=gkto_name,
+        soll=soll, haben=haben, saldo=saldo,
+    )
+    if journal:
+        return _sammeln("journal", journal_nr), agg
+    return agg
@@ -0,0 +1,650 @@
+import json
+
+import networkx as nx
+import numpy as np
+
+from network_analysis.generate_network import add_legend_to_pyvis_html
+
+__all__ = ["render_graph_html_webgl", "get_graph_layout"]
+
+
+def get_graph_layout(G: nx.DiGraph, seed: int = 0, iterations: int = 100, zellen: int = 48,
+                     schwerkraft: float = 0.5) -> dict:
+    """
+    Knotenpositionen nach Fruchterman-Reingold, vektorisiert für große Graphen.
+
+    Die Abstoßung zwischen allen Knoten wird über ein Raster angenähert: jeder
+    Knoten wird von den Schwerpunkten der übrigen Rasterzellen (gewichtet mit
+    deren Knotenzahl) und vom Schwerpunkt der übrigen Knoten seiner Zelle
+    abgestoßen. Der Aufwand je Iteration wächst so mit Knoten mal Zellen statt
+    quadratisch. ``schwerkraft`` zieht alle Knoten zur Mitte, damit unverbundene
+    Teilgraphen und einzelne Konten nicht abdriften. Gibt ``{konto: (x, y)}`` zurück, skaliert auf etwa 100 Einheiten
+    je Kantenlänge wie bei vis-network.
+    """
+    knoten = list(G.nodes)
+    n = len(knoten)
+    if n == 0:
+        return {}
+    index = {k: i for i, k in enumerate(knoten)}
+    kanten = np.array([(index[u], index[v]) for u, v in G.edges if u != v], dtype=np.int64).reshape(-1, 2)
+
+    rng = np.random.default_rng(seed)
+    pos = rng.random((n, 2))
+    k = np.sqrt(1.0 / n)  # ideale Kantenlänge im Einheitsquadrat
+    t = 0.1
+    dt = t / (iterations + 1)
+    for _ in range(iterations):
+        verschiebung = _get_abstossung(pos, k, zellen, rng.random(2))
+        verschiebung -= schwerkraft * (pos - pos.mean(axis=0))
+
+        # Anziehung entlang der Kanten: d² / k in Richtung der Kante
+        delta = pos[kanten[:, 0]] - pos[kanten[:, 1]]
+        dist = np.maximum(np.hypot(delta[:, 0], delta[:, 1]), 0.01 * k)
+        kraft = delta * (dist / k)[:, None]
+        for dim in range(2):
+            verschiebung[:, dim] -= np.bincount(kanten[:, 0], kraft[:, dim], minlength=n)
+            verschiebung[:, dim] += np.bincount(kanten[:, 1], kraft[:, dim], minlength=n)
+
+        laenge = np.maximum(np.hypot(verschiebung[:, 0], verschiebung[:, 1]), 1e-9)
+        pos += verschiebung * (np.minimum(laenge, t) / laenge)[:, None]
+        t -= dt
+
+    pos = (pos - pos.mean(axis=0)) * (100.0 / k)
+    return {konto: (float(x), float(y)) for konto, (x, y) in zip(knoten, pos)}
+
+
+def _get_abstossung(pos: np.ndarray, k: float, zellen: int, versatz: np.ndarray, block: int = 2048) -> np.ndarray:
+    """
+    Abstoßung k² / d je Knoten, angenähert über die Schwerpunkte der Rasterzellen.
+    Das Raster wird je Iteration um ``versatz`` (Bruchteil einer Zelle) verschoben,
+    damit sich die Knoten nicht an den Zellgrenzen sammeln.
+    """
+    n = len(pos)
+    lo = pos.min(axis=0)
+    breite = np.maximum(pos.max(axis=0) - lo, 1e-9) * (1 + 1 / zellen)
+    zelle_xy = np.minimum((pos - lo) / breite * zellen + versatz, zellen).astype(np.int64)
+    zelle = zelle_xy[:, 0] * (zellen + 1) + zelle_xy[:, 1]
+
+    belegt, zelle = np.unique(zelle, return_inverse=True)
+    anzahl = np.bincount(zelle).astype(np.float64)
+    schwerpunkt = np.stack([np.bincount(zelle, pos[:, dim]) for dim in range(2)], axis=1) / anzahl[:, None]
+
+    verschiebung = np.empty_like(pos)
+    k2 = k * k
+    for start in range(0, n, block):
+        p = pos[start:start + block]
+        z = zelle[start:start + block]
+        delta = p[:, None, :] - schwerpunkt[None, :, :]
+        d2 = np.maximum((delta ** 2).sum(axis=2), 1e-4 * k2)
+        gewicht = anzahl[None, :] * k2 / d2
+        gewicht[np.arange(len(p)), z] = 0.0  # eigene Zelle ohne den Knoten selbst, siehe unten
+        verschiebung[start:start + block] = (delta * gewicht[:, :, None]).sum(axis=1)
+
+    # eigene Zelle: Schwerpunkt der übrigen Knoten dieser Zelle
+    andere = anzahl[zelle] - 1
+    mit_nachbarn = andere > 0
+    rest = (schwerpunkt[zelle] * anzahl[zelle][:, None] - pos)[mit_nachbarn] / andere[mit_nachbarn][:, None]
+    delta = pos[mit_nachbarn] - rest
+    d2 = np.maximum((delta ** 2).sum(axis=1), 1e-4 * k2)
+    verschiebung[mit_nachbarn] += delta * (andere[mit_nachbarn] * k2 / d2)[:, None]
+    return verschiebung
+
+
+def _get_farbe(farbe, standard: str = "#cccccc") -> str:
+    if isinstance(farbe, dict):
+        farbe = farbe.get("background", standard)
+    if isinstance(farbe, (list, tuple)):  # z.B. ("#00d515",) aus _get_edge_style
+        farbe = farbe[0] if farbe else standard
+    return farbe if isinstance(farbe, str) else standard
+
+
+def render_graph_html_webgl(G: nx.DiGraph, pos: dict | None = None, seed: int = 0) -> str:
+    """
+    Erzeugt eine eigenständige HTML-Seite des Graphen, gezeichnet mit WebGL statt
+    vis-network (Canvas), für Graphen mit zehntausenden Kanten.
+
+    Farben, Größen, Tooltips und Kantenstile stammen wie bei ``render_graph_html``
+    aus den Attributen von ``generate_network_graph`` (bzw. ``apply_graph_metrics``),
+    die Legende aus ``add_legend_to_pyvis_html``. Die Knotenpositionen werden
+    vorab mit ``get_graph_layout`` bestimmt (oder als ``pos`` übergeben). Im
+    Browser lassen sich Kategorien und Mindestbetrag der Kanten filtern, die
+    Filter ändern nur die Sichtbarkeit, gezeichnet wird weiter aus denselben
+    Puffern. Eine neue Wesentlichkeitsschwelle färbt die Kanten im Browser um
+    (wie ``restyle_network_graph``). Die Seite benötigt keine externen Skripte.
+    """
+    if pos is None:
+        pos = get_graph_layout(G, seed=seed)
+
+    knoten = list(G.nodes)
+    index = {k: i for i, k in enumerate(knoten)}
+    nodes = {"label": [], "title": [], "kategorie": [], "x": [], "y": [], "size": [], "color": [], "border": [],
+             "borderWidth": [], "drilldown": []}
+    for konto, attrs in G.nodes(data=True):
+        farbe = attrs.get("color")
+        x, y = pos[konto]
+        nodes["label"].append(str(attrs.get("label", konto)))
+        nodes["title"].append(str(attrs.get("title", "")))
+        kategorie = attrs.get("kategorie")
+        nodes["kategorie"].append("" if kategorie is None or kategorie != kategorie else str(kategorie))
+        nodes["x"].append(round(x, 2))
+        nodes["y"].append(round(y, 2))
+        nodes["size"].append(float(attrs.get("size", 10)))
+        nodes["color"].append(_get_farbe(farbe))
+        nodes["border"].append(farbe.get("border") if isinstance(farbe, dict) else None)
+        nodes["borderWidth"].append(float(attrs.get("borderWidth", 1)))
+        nodes["drilldown"].append(attrs.get("drilldown"))
+
+    edges = {"from": [], "to": [], "title": [], "value": [], "color": [], "width": [], "dashes": [], "betrag": [],
+             "farbeUeber": [], "farbeUnter": []}
+    for u, v, attrs in G.edges(data=True):
+        edges["from"].append(index[u])
+        edges["to"].append(index[v])
+        edges["title"].append(str(attrs.get("title", "")))
+        edges["value"].append(round(float(attrs.get("value", 0) or 0), 2))
+        edges["color"].append(_get_farbe(attrs.get("color"), "#999999"))
+        edges["width"].append(float(attrs.get("width", 1)))
+        edges["dashes"].append(bool(attrs.get("dashes", False)))
+        # Umfärben bei neuer Schwelle wie restyle_network_graph (ohne Betrag: feste Farbe)
+        betrag = attrs.get("betrag")
+        edges["betrag"].append(None if betrag is None else round(float(betrag), 2))
+        edges["farbeUeber"].append(_get_farbe(attrs.get("farbe_ueber"), "#999999"))
+        edges["farbeUnter"].append(_get_farbe(attrs.get("farbe_unter"), "#999999"))
+
+    daten = {"nodes": nodes, "edges": edges, "schwelle": float(G.graph.get("schwelle") or 0)}
+    daten = json.dumps(daten, ensure_ascii=False).replace("</", "<\\/")
+    html = _HTML.replace("__GRAPH_DATEN__", daten)
+    return add_legend_to_pyvis_html(html, G.graph.get("edge_legend"))
+
+
+_HTML = """<!DOCTYPE html>
+<html lang="de">
+<head>
+<meta charset="utf-8">
+<title>Gegenkontoanalyse</title>
+<style>
+html, body { margin: 0; height: 100%; overflow: hidden; background: #FFFFFF; font-family: Arial, sans-serif; }
+#graph-gl, #graph-labels { position: absolute; top: 0; left: 0; width: 100%; height: 100%; }
+#graph-labels { pointer-events: none; }
+#graph-tooltip {
+    position: fixed; display: none; pointer-events: none; z-index: 1000;
+    background: white; border: 1px solid #aaa; padding: 6px; box-shadow: 0 0 10px rgba(0,0,0,0.2);
+    font-family: monospace; font-size: 12px; white-space: pre; max-height: 70vh; overflow: hidden;
+}
+#filter-box {
+    position: fixed; top: 20px; left: 20px; z-index: 999; max-height: 80vh; overflow: auto;
+    background: white; border: 1px solid #aaa; padding: 10px; font-size: 12px; box-shadow: 0 0 10px rgba(0,0,0,0.2);
+}
+#filter-box .filter-section { margin: 6px 0 4px 0; font-weight: bold; border-bottom: 1px solid #ccc; }
+#filter-box label { display: block; white-space: nowrap; }
+#filter-box .color-box { width: 12px; height: 12px; display: inline-block; border: 1px solid #444; margin: 0 5px; vertical-align: middle; }
+</style>
+</head>
+<body>
+<canvas id="graph-gl"></canvas>
+<canvas id="graph-labels"></canvas>
+<div id="filter-box">
+    <div class="filter-section">Kategorien</div>
+    <div id="filter-kategorien"></div>
+    <div class="filter-section">Kanten</div>
+    <label>Schwelle: <input id="filter-schwelle" type="number" min="0" step="1000" value="0" style="width: 100px;"> €</label>
+    <input id="filter-schwelle-slider" type="range" min="0" max="1000" value="0" style="width: 220px;">
+    <label>Mindestbetrag: <input id="filter-betrag" type="number" min="0" step="1000" value="0" style="width: 100px;"> €</label>
+    <input id="filter-betrag-slider" type="range" min="0" max="1000" value="0" style="width: 220px;">
+    <label><input id="filter-isoliert" type="checkbox"> Knoten ohne sichtbare Kanten ausblenden</label>
+    <div id="filter-anzahl" style="margin-top: 6px;"></div>
+    <div style="margin-top: 6px; color: #666;">Klick auf ein Konto: nur dessen Kanten, Doppelklick: Kontenseite bzw. Ansicht einpassen</div>
+</div>
+<div id="graph-tooltip"></div>
+<script type="application/json" id="graph-daten">__GRAPH_DATEN__</script>
+<script type="text/javascript">
+(function() {
+    "use strict";
+    var daten = JSON.parse(document.getElementById("graph-daten").textContent);
+    var N = daten.nodes, E = daten.edges;
+    var nN = N.x.length, nE = E.from.length;
+
+    // --- Farben: beliebige CSS-Farben einmal je Wert nach RGBA ---------------------
+    var farbCache = {};
+    var farbCtx = document.createElement("canvas").getContext("2d");
+    function rgba(farbe) {
+        if (farbCache[farbe]) return farbCache[farbe];
+        farbCtx.clearRect(0, 0, 1, 1);
+        farbCtx.fillStyle = "#000";
+        farbCtx.fillStyle = farbe;
+        farbCtx.fillRect(0, 0, 1, 1);
+        var d = farbCtx.getImageData(0, 0, 1, 1).data;
+        return (farbCache[farbe] = [d[0] / 255, d[1] / 255, d[2] / 255, d[3] / 255]);
+    }
+    function rand(farbe) {
+        var c = rgba(farbe);
+        return [c[0] * 0.6, c[1] * 0.6, c[2] * 0.6, 1];
+    }
+
+    // --- Kategorien und Filter ----------------------------------------------------
+    var kategorien = [], kategorieIndex = {}, kategorieFarbe = {};
+    var nodeKat = new Int32Array(nN);
+    for (var i = 0; i < nN; i++) {
+        var kat = N.kategorie[i] || "ohne Kategorie";
+        if (!(kat in kategorieIndex)) {
+            kategorieIndex[kat] = kategorien.length;
+            kategorien.push(kat);
+            kategorieFarbe[kat] = N.color[i];
+        }
+        nodeKat[i] = kategorieIndex[kat];
+    }
+    var katAktiv = kategorien.map(function() { return true; });
+    var maxWert = 0;
+    for (var e = 0; e < nE; e++) maxWert = Math.max(maxWert, E.value[e]);
+    var filter = {betrag: 0, isoliert: false, auswahl: -1};
+    var nodeSichtbar = new Uint8Array(nN), edgeSichtbar = new Uint8Array(nE);
+
+    // Kanten in Gegenrichtung werden seitlich versetzt, damit beide sichtbar bleiben
+    var paare = {};
+    for (var e = 0; e < nE; e++) paare[E.from[e] + ">" + E.to[e]] = true;
+
+    // --- WebGL ----------------------------------------------------------------------
+    var glCanvas = document.getElementById("graph-gl");
+    var labelCanvas = document.getElementById("graph-labels");
+    var labelCtx = labelCanvas.getContext("2d");
+    var gl = glCanvas.getContext("webgl", {antialias: true, premultipliedAlpha: false});
+    if (!gl) {
+        document.body.insertAdjacentHTML("afterbegin", "<p style='padding: 20px;'>WebGL wird von diesem Browser nicht unterstützt.</p>");
+        return;
+    }
+
+    function shader(typ, quelle) {
+        var s = gl.createShader(typ);
+        gl.shaderSource(s, quelle);
+        gl.compileShader(s);
+        if (!gl.getShaderParameter(s, gl.COMPILE_STATUS)) throw new Error(gl.getShaderInfoLog(s));
+        return s;
+    }
+    function programm(vs, fs) {
+        var p = gl.createProgram();
+        gl.attachShader(p, shader(gl.VERTEX_SHADER, vs));
+        gl.attachShader(p, shader(gl.FRAGMENT_SHADER, fs));
+        gl.linkProgram(p);
+        if (!gl.getProgramParameter(p, gl.LINK_STATUS)) throw new Error(gl.getProgramInfoLog(p));
+        return p;
+    }
+    var KAMERA = [
+        "uniform vec2 uAufloesung; uniform vec2 uVersatz; uniform float uMassstab;",
+        "vec4 clip(vec2 welt) {",
+        "    vec2 px = welt * uMassstab + uVersatz;",
+        "    return vec4(px.x / uAufloesung.x * 2.0 - 1.0, 1.0 - px.y / uAufloesung.y * 2.0, 0.0, 1.0);",
+        "}"
+    ].join("\\n");
+
+    var kantenProgramm = programm([
+        "attribute vec2 aPos; attribute vec4 aFarbe; attribute float aStrich; attribute float aSichtbar;",
+        "varying vec4 vFarbe; varying float vStrich;",
+        KAMERA,
+        "void main() {",
+        "    gl_Position = aSichtbar > 0.5 ? clip(aPos) : vec4(2.0, 2.0, 2.0, 1.0);",
+        "    vFarbe = aFarbe; vStrich = aStrich;",
+        "}"
+    ].join("\\n"), [
+        "precision mediump float;",
+        "varying vec4 vFarbe; varying float vStrich;",
+        "void main() {",
+        "    if (vStrich >= 0.0 && mod(vStrich, 20.0) > 10.0) discard;",
+        "    gl_FragColor = vFarbe;",
+        "}"
+    ].join("\\n"));
+
+    var knotenProgramm = programm([
+        "attribute vec2 aPos; attribute float aGroesse; attribute vec4 aFarbe; attribute vec4 aRand;",
+        "attribute float aRandBreite; attribute float aSichtbar;",
+        "varying vec4 vFarbe; varying vec4 vRand; varying float vRandAnteil;",
+        "uniform float uPixel; uniform float uMaxPunkt;",
+        KAMERA,
+        "void main() {",
+        "    float radius = (aGroesse + aRandBreite) * uMassstab;",
+        "    gl_Position = aSichtbar > 0.5 ? clip(aPos) : vec4(2.0, 2.0, 2.0, 1.0);",
+        "    gl_PointSize = min(max(2.0 * radius * uPixel, 2.0), uMaxPunkt);",
+        "    vFarbe = aFarbe; vRand = aRand;",
+        "    vRandAnteil = aRandBreite / (aGroesse + aRandBreite);",
+        "}"
+    ].join("\\n"), [
+        "precision mediump float;",
+        "varying vec4 vFarbe; varying vec4 vRand; varying float vRandAnteil;",
+        "void main() {",
+        "    float r = length(gl_PointCoord * 2.0 - 1.0);",
+        "    if (r > 1.0) discard;",
+        "    gl_FragColor = r > 1.0 - vRandAnteil ? vRand : vFarbe;",
+        "}"
+    ].join("\\n"));
+
+    function puffer(daten) {
+        var b = gl.createBuffer();
+        gl.bindBuffer(gl.ARRAY_BUFFER, b);
+        gl.bufferData(gl.ARRAY_BUFFER, daten, gl.STATIC_DRAW);
+        return b;
+    }
+
+    // Kanten als Dreiecke: Band in Kantenbreite (6 Ecken) und Pfeilspitze (3 Ecken)
+    var ECKEN = 9;
+    var kPos = new Float32Array(nE * ECKEN * 2), kFarbe = new Float32Array(nE * ECKEN * 4);
+    var kStrich = new Float32Array(nE * ECKEN), kSichtbar = new Float32Array(nE * ECKEN);
+    var kStrecke = new Float32Array(nE);
+    for (var e = 0; e < nE; e++) {
+        var s = E.from[e], t = E.to[e];
+        var o = e * ECKEN;
+        if (s === t) continue;  // Buchungen auf dasselbe Konto: kein Strich
+        var dx = N.x[t] - N.x[s], dy = N.y[t] - N.y[s];
+        var laenge = Math.sqrt(dx * dx + dy * dy) || 1;
+        var ux = dx / laenge, uy = dy / laenge, nx = -uy, ny = ux;
+        var breite = Math.max(E.width[e], 0.5);
+        var seite = paare[t + ">" + s] ? breite + 2 : 0;
+        var rs = N.size[s], rt = N.size[t] + N.borderWidth[t];
+        var spitze = Math.min(Math.max(8, 3 * breite), Math.max(laenge - rs - rt, 0));
+        var ax = N.x[s] + ux * rs + nx * seite, ay = N.y[s] + uy * rs + ny * seite;
+        var bx = N.x[t] - ux * (rt + spitze) + nx * seite, by = N.y[t] - uy * (rt + spitze) + ny * seite;
+        var hx = nx * breite / 2, hy = ny * breite / 2;
+        var band = [ax + hx, ay + hy, ax - hx, ay - hy, bx + hx, by + hy,
+                    bx + hx, by + hy, ax - hx, ay - hy, bx - hx, by - hy];
+        var px = nx * Math.max(spitze / 2, breite), py = ny * Math.max(spitze / 2, breite);
+        var pfeil = [bx + px, by + py, bx - px, by - py, N.x[t] - ux * rt + nx * seite, N.y[t] - uy * rt + ny * seite];
+        kPos.set(band, o * 2);
+        kPos.set(pfeil, (o + 6) * 2);
+        kStrecke[e] = laenge - rs - rt - spitze;
+        kStrich.fill(-1, o + 6, o + ECKEN);
+    }
+
+    // Farbe und Strichelung je Kante; bei neuer Schwelle wie restyle_network_graph
+    function kanteStil(e, schwelle) {
+        var fest = E.betrag[e] === null;
+        var unter = !fest && E.betrag[e] < schwelle;
+        var farbe = rgba(fest ? E.color[e] : (unter ? E.farbeUnter[e] : E.farbeUeber[e]));
+        var o = e * ECKEN, l = kStrecke[e];
+        for (var j = 0; j < ECKEN; j++) kFarbe.set(farbe, (o + j) * 4);
+        kStrich.set((fest ? E.dashes[e] : unter) ? [0, 0, l, l, 0, l] : [-1, -1, -1, -1, -1, -1], o);
+    }
+    for (var e = 0; e < nE; e++) kanteStil(e, daten.schwelle);
+    var kPuffer = {pos: puffer(kPos), farbe: puffer(kFarbe), strich: puffer(kStrich), sichtbar: puffer(kSichtbar)};
+
+    function umfaerben(schwelle) {
+        for (var e = 0; e < nE; e++) kanteStil(e, schwelle);
+        gl.bindBuffer(gl.ARRAY_BUFFER, kPuffer.farbe);
+        gl.bufferSubData(gl.ARRAY_BUFFER, 0, kFarbe);
+        gl.bindBuffer(gl.ARRAY_BUFFER, kPuffer.strich);
+        gl.bufferSubData(gl.ARRAY_BUFFER, 0, kStrich);
+        zeichnen();
+    }
+
+    var nPos = new Float32Array(nN * 2), nGroesse = new Float32Array(nN), nFarbe = new Float32Array(nN * 4);
+    var nRand = new Float32Array(nN * 4), nRandBreite = new Float32Array(nN), nSichtbar = new Float32Array(nN);
+    for (var i = 0; i < nN; i++) {
+        nPos[2 * i] = N.x[i];
+        nPos[2 * i + 1] = N.y[i];
+        nGroesse[i] = N.size[i];
+        nFarbe.set(rgba(N.color[i]), 4 * i);
+        nRand.set(N.border[i] ? rgba(N.border[i]) : rand(N.color[i]), 4 * i);
+        nRandBreite[i] = N.borderWidth[i];
+    }
+    var nPuffer = {pos: puffer(nPos), groesse: puffer(nGroesse), farbe: puffer(nFarbe), rand: puffer(nRand),
+                   randBreite: puffer(nRandBreite), sichtbar: puffer(nSichtbar)};
+
+    // --- Sichtbarkeit: nur bei Änderung der Filter, nicht je Bild ---------------------
+    function anwenden() {
+        var sichtbar = 0, grad = new Int32Array(nN);
+        for (var i = 0; i < nN; i++) nodeSichtbar[i] = katAktiv[nodeKat[i]] ? 1 : 0;
+        if (filter.auswahl >= 0 && !nodeSichtbar[filter.auswahl]) filter.auswahl = -1;
+        for (var e = 0; e < nE; e++) {
+            var s = E.from[e], t = E.to[e];
+            var ok = nodeSichtbar[s] && nodeSichtbar[t] && E.value[e] >= filter.betrag &&
+                     (filter.auswahl < 0 || s === filter.auswahl || t === filter.auswahl);
+            edgeSichtbar[e] = ok ? 1 : 0;
+            if (ok) { grad[s]++; grad[t]++; sichtbar++; }
+            kSichtbar.fill(ok ? 1 : 0, e * ECKEN, (e + 1) * ECKEN);
+        }
+        for (var i = 0; i < nN; i++) {
+            if (filter.isoliert || filter.auswahl >= 0) nodeSichtbar[i] = nodeSichtbar[i] && (grad[i] > 0 || i === filter.auswahl) ? 1 : 0;
+            nSichtbar[i] = nodeSichtbar[i];
+        }
+        gl.bindBuffer(gl.ARRAY_BUFFER, kPuffer.sichtbar);
+        gl.bufferSubData(gl.ARRAY_BUFFER, 0, kSichtbar);
+        gl.bindBuffer(gl.ARRAY_BUFFER, nPuffer.sichtbar);
+        gl.bufferSubData(gl.ARRAY_BUFFER, 0, nSichtbar);
+        document.getElementById("filter-anzahl").textContent =
+            sichtbar.toLocaleString("de-DE") + " von " + nE.toLocaleString("de-DE") + " Kanten sichtbar";
+        zeichnen();
+    }
+
+    // --- Kamera und Zeichnen ------------------------------------------------------
+    var kamera = {massstab: 1, x: 0, y: 0};
+    var pixel = window.devicePixelRatio || 1;
+    var maxPunkt = gl.getParameter(gl.ALIASED_POINT_SIZE_RANGE)[1];
+
+    function einpassen() {
+        var minX = Infinity, minY = Infinity, maxX = -Infinity, maxY = -Infinity;
+        for (var i = 0; i < nN; i++) {
+            minX = Math.min(minX, N.x[i] - N.size[i]); maxX = Math.max(maxX, N.x[i] + N.size[i]);
+            minY = Math.min(minY, N.y[i] - N.size[i]); maxY = Math.max(maxY, N.y[i] + N.size[i]);
+        }
+        if (!nN) { minX = minY = -1; maxX = maxY = 1; }
+        var w = glCanvas.clientWidth, h = glCanvas.clientHeight;
+        kamera.massstab = 0.9 * Math.min(w / (maxX - minX || 1), h / (maxY - minY || 1));
+        kamera.x = w / 2 - (minX + maxX) / 2 * kamera.massstab;
+        kamera.y = h / 2 - (minY + maxY) / 2 * kamera.massstab;
+        zeichnen();
+    }
+
+    function attribut(prog, name, puffer, groesse) {
+        var ort = gl.getAttribLocation(prog, name);
+        gl.bindBuffer(gl.ARRAY_BUFFER, puffer);
+        gl.enableVertexAttribArray(ort);
+        gl.vertexAttribPointer(ort, groesse, gl.FLOAT, false, 0, 0);
+        return ort;
+    }
+    function kameraSetzen(prog) {
+        gl.useProgram(prog);
+        gl.uniform2f(gl.getUniformLocation(prog, "uAufloesung"), glCanvas.width, glCanvas.height);
+        gl.uniform2f(gl.getUniformLocation(prog, "uVersatz"), kamera.x * pixel, kamera.y * pixel);
+        gl.uniform1f(gl.getUniformLocation(prog, "uMassstab"), kamera.massstab * pixel);
+    }
+
+    var geplant = false;
+    function zeichnen() {
+        if (geplant) return;
+        geplant = true;
+        requestAnimationFrame(bild);
+    }
+    function bild() {
+        geplant = false;
+        var w = glCanvas.clientWidth, h = glCanvas.clientHeight;
+        if (glCanvas.width !== Math.round(w * pixel) || glCanvas.height !== Math.round(h * pixel)) {
+            glCanvas.width = labelCanvas.width = Math.round(w * pixel);
+            glCanvas.height = labelCanvas.height = Math.round(h * pixel);
+        }
+        gl.viewport(0, 0, glCanvas.width, glCanvas.height);
+        gl.clearColor(1, 1, 1, 1);
+        gl.clear(gl.COLOR_BUFFER_BIT);
+        gl.enable(gl.BLEND);
+        gl.blendFunc(gl.SRC_ALPHA, gl.ONE_MINUS_SRC_ALPHA);
+
+        kameraSetzen(kantenProgramm);
+        var orte = [attribut(kantenProgramm, "aPos", kPuffer.pos, 2), attribut(kantenProgramm, "aFarbe", kPuffer.farbe, 4),
+                    attribut(kantenProgramm, "aStrich", kPuffer.strich, 1), attribut(kantenProgramm, "aSichtbar", kPuffer.sichtbar, 1)];
+        gl.drawArrays(gl.TRIANGLES, 0, nE * ECKEN);
+        orte.forEach(function(o) { gl.disableVertexAttribArray(o); });
+
+        kameraSetzen(knotenProgramm);
+        gl.uniform1f(gl.getUniformLocation(knotenProgramm, "uPixel"), 1.0);
+        gl.uniform1f(gl.getUniformLocation(knotenProgramm, "uMaxPunkt"), maxPunkt);
+        orte = [attribut(knotenProgramm, "aPos", nPuffer.pos, 2), attribut(knotenProgramm, "aGroesse", nPuffer.groesse, 1),
+                attribut(knotenProgramm, "aFarbe", nPuffer.farbe, 4), attribut(knotenProgramm, "aRand", nPuffer.rand, 4),
+                attribut(knotenProgramm, "aRandBreite", nPuffer.randBreite, 1), attribut(knotenProgramm, "aSichtbar", nPuffer.sichtbar, 1)];
+        gl.drawArrays(gl.POINTS, 0, nN);
+        orte.forEach(function(o) { gl.disableVertexAttribArray(o); });
+
+        beschriften(w, h);
+    }
+
+    // Beschriftung nur für ausreichend große Knoten im sichtbaren Ausschnitt
+    function beschriften(w, h) {
+        labelCtx.setTransform(pixel, 0, 0, pixel, 0, 0);
+        labelCtx.clearRect(0, 0, w, h);
+        labelCtx.font = "12px Arial";
+        labelCtx.textAlign = "center";
+        labelCtx.fillStyle = "#343434";
+        var anzahl = 0;
+        for (var i = 0; i < nN && anzahl < 2000; i++) {
+            if (!nodeSichtbar[i]) continue;
+            var r = N.size[i] * kamera.massstab;
+            if (r < 6) continue;
+            var x = N.x[i] * kamera.massstab + kamera.x, y = N.y[i] * kamera.massstab + kamera.y;
+            if (x < -50 || y < -50 || x > w + 50 || y > h + 50) continue;
+            labelCtx.fillText(N.label[i], x, y + r + 12);
+            anzahl++;
+        }
+    }
+
+    // --- Treffer unter dem Mauszeiger ---------------------------------------------
+    function welt(mx, my) {
+        return [(mx - kamera.x) / kamera.massstab, (my - kamera.y) / kamera.massstab];
+    }
+    function knotenBei(mx, my) {
+        var p = welt(mx, my), beste = -1, besterAbstand = Infinity;
+        for (var i = 0; i < nN; i++) {
+            if (!nodeSichtbar[i]) continue;
+            var dx = N.x[i] - p[0], dy = N.y[i] - p[1];
+            var d = Math.sqrt(dx * dx + dy * dy) - N.size[i] - N.borderWidth[i];
+            if (d < besterAbstand) { besterAbstand = d; beste = i; }
+        }
+        return besterAbstand * kamera.massstab <= 2 ? beste : -1;
+    }
+    function kanteBei(mx, my) {
+        var p = welt(mx, my), beste = -1, besterAbstand = Infinity;
+        for (var e = 0; e < nE; e++) {
+            if (!edgeSichtbar[e]) continue;
+            var o = e * ECKEN * 2;
+            var ax = (kPos[o] + kPos[o + 2]) / 2, ay = (kPos[o + 1] + kPos[o + 3]) / 2;
+            var bx = kPos[o + 24 + 4], by = kPos[o + 24 + 5];
+            var vx = bx - ax, vy = by - ay, l2 = vx * vx + vy * vy;
+            if (l2 === 0) continue;
+            var t = Math.max(0, Math.min(1, ((p[0] - ax) * vx + (p[1] - ay) * vy) / l2));
+            var dx = ax + t * vx - p[0], dy = ay + t * vy - p[1];
+            var d = Math.sqrt(dx * dx + dy * dy) - E.width[e] / 2;
+            if (d < besterAbstand) { besterAbstand = d; beste = e; }
+        }
+        return besterAbstand * kamera.massstab <= 4 ? beste : -1;
+    }
+
+    var tooltip = document.getElementById("graph-tooltip");
+    var maus = null, ziehen = null, gezogen = false;
+    function tooltipZeigen() {
+        if (!maus || ziehen) { tooltip.style.display = "none"; return; }
+        var i = knotenBei(maus.x, maus.y), text = null;
+        if (i >= 0) text = N.title[i];
+        else {
+            var e = kanteBei(maus.x, maus.y);
+            if (e >= 0) text = E.title[e];
+        }
+        glCanvas.style.cursor = text !== null ? "pointer" : "default";
+        if (!text) { tooltip.style.display = "none"; return; }
+        tooltip.textContent = text;
+        tooltip.style.display = "block";
+        var x = maus.x + 15, y = maus.y + 15;
+        if (x + tooltip.offsetWidth > window.innerWidth) x = Math.max(0, maus.x - tooltip.offsetWidth - 15);
+        if (y + tooltip.offsetHeight > window.innerHeight) y = Math.max(0, window.innerHeight - tooltip.offsetHeight);
+        tooltip.style.left = x + "px";
+        tooltip.style.top = y + "px";
+    }
+    var tooltipGeplant = false;
+    function tooltipPlanen() {
+        if (tooltipGeplant) return;
+        tooltipGeplant = true;
+        requestAnimationFrame(function() { tooltipGeplant = false; tooltipZeigen(); });
+    }
+
+    glCanvas.addEventListener("mousedown", function(ev) {
+        ziehen = {x: ev.clientX, y: ev.clientY, kx: kamera.x, ky: kamera.y};
+        gezogen = false;
+    });
+    window.addEventListener("mouseup", function(ev) {
+        if (ziehen && !gezogen) {
+            var i = knotenBei(ev.clientX, ev.clientY);
+            filter.auswahl = i === filter.auswahl ? -1 : i;
+            anwenden();
+        }
+        ziehen = null;
+    });
+    window.addEventListener("mousemove", function(ev) {
+        maus = {x: ev.clientX, y: ev.clientY};
+        if (ziehen) {
+            var dx = ev.clientX - ziehen.x, dy = ev.clientY - ziehen.y;
+            if (Math.abs(dx) + Math.abs(dy) > 3) gezogen = true;
+            kamera.x = ziehen.kx + dx;
+            kamera.y = ziehen.ky + dy;
+            zeichnen();
+        }
+        tooltipPlanen();
+    });
+    glCanvas.addEventListener("mouseleave", function() { maus = null; tooltipPlanen(); });
+    glCanvas.addEventListener("wheel", function(ev) {
+        ev.preventDefault();
+        var faktor = Math.exp(-ev.deltaY * 0.0015);
+        kamera.x = ev.clientX - (ev.clientX - kamera.x) * faktor;
+        kamera.y = ev.clientY - (ev.clientY - kamera.y) * faktor;
+        kamera.massstab *= faktor;
+        zeichnen();
+        tooltipPlanen();
+    }, {passive: false});
+    // Doppelklick: Kontenseite des Kontos öffnen, sonst Ansicht einpassen
+    glCanvas.addEventListener("dblclick", function(ev) {
+        var i = knotenBei(ev.clientX, ev.clientY);
+        if (i >= 0 && N.drilldown[i]) window.open(N.drilldown[i], "_blank");
+        else einpassen();
+    });
+    window.addEventListener("resize", zeichnen);
+
+    // --- Bedienelemente der Filter --------------------------------------------------
+    var katBox = document.getElementById("filter-kategorien");
+    kategorien.forEach(function(kat, k) {
+        var label = document.createElement("label");
+        var box = document.createElement("input");
+        box.type = "checkbox";
+        box.checked = true;
+        box.addEventListener("change", function() { katAktiv[k] = box.checked; anwenden(); });
+        var farbe = document.createElement("span");
+        farbe.className = "color-box";
+        farbe.style.background = kategorieFarbe[kat];
+        label.appendChild(box);
+        label.appendChild(farbe);
+        label.appendChild(document.createTextNode(kat));
+        katBox.appendChild(label);
+    });
+    // Betragsfeld mit kubisch skaliertem Regler (kleine Beträge fein einstellbar)
+    function betragRegler(feldId, reglerId, start, setzen) {
+        var feld = document.getElementById(feldId), regler = document.getElementById(reglerId);
+        function reglerSetzen(wert) {
+            regler.value = maxWert > 0 ? Math.round(1000 * Math.cbrt(Math.min(wert / maxWert, 1))) : 0;
+        }
+        regler.addEventListener("input", function() {
+            var wert = Math.round(maxWert * Math.pow(regler.value / 1000, 3));
+            feld.value = wert;
+            setzen(wert);
+        });
+        feld.addEventListener("change", function() {
+            var wert = Math.max(0, parseFloat(feld.value) || 0);
+            reglerSetzen(wert);
+            setzen(wert);
+        });
+        feld.value = Math.round(start);
+        reglerSetzen(start);
+    }
+    betragRegler("filter-betrag", "filter-betrag-slider", 0, function(wert) { filter.betrag = wert; anwenden(); });
+    betragRegler("filter-schwelle", "filter-schwelle-slider", daten.schwelle, umfaerben);
+    document.getElementById("filter-isoliert").addEventListener("change", function(ev) {
+        filter.isoliert = ev.target.checked;
+        anwenden();
+    });
+
+    einpassen();
+    anwenden();
+})();
+</script>
+</body>
+</html>
+"""
@@ -1,4 +1,14 @@
+import numpy as np
 import pandas as pd
+from datetime import datetime
+from typing import Optional
+
+from network_analysis.journal_segments import JournalSegments
+
+# "fehler": mehr als eine Div-Zeile je JOURNAL_NR bricht ab (ValueError);
+# "proportional": solche Buchungssätze werden anteilig aufgeteilt (siehe
+# ``_allocate_div_rows_proportionally``), nur mehrdeutige werden ausgesondert.
+DIV_MODI = ("fehler", "proportional")
 
 def replicate_div_rows(
         df: pd.DataFrame,
@@ -9,11 +19,46 @@ def replicate_div_rows(
         soll,
         haben,
         saldo,
-        journal_nr
+        journal_nr,
+        segments: Optional[JournalSegments] = None,
+        div_modus: str = "fehler",
+        tol: float = 1,
         ) -> pd.DataFrame:
+    """Ersetzt Div-Zeilen (und Zeilen ohne Gegenkonto) durch je eine Kopie pro Referenzbuchung.
+    ``segments`` (``JournalSegments`` von ``df``) wird sonst hier erstellt.
+
+    ``div_modus`` (siehe ``DIV_MODI``) regelt Buchungssätze mit mehreren Div-Zeilen;
+    ``tol`` ist die Toleranz, mit der sich deren Soll- und Habenseite ausgleichen müssen."""
+    df_prep, _, _ = _replicate_div_rows(df, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, journal_nr,
+                                        segments, div_modus=div_modus, tol=tol)
+    return df_prep
+
+
+def _replicate_div_rows(df, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, journal_nr, segments=None,
+                        div_modus="fehler", tol=1, report=True) -> tuple:
+    """Wie ``replicate_div_rows``, gibt zusätzlich den fortgeschriebenen Journalindex des Ergebnisses und
+    die ausgesonderten mehrdeutigen Buchungssätze zurück (ohne ``report`` werden diese nicht ausgegeben)."""
+    if div_modus not in DIV_MODI:
+        raise ValueError(f"`div_modus` muss einer von {DIV_MODI} sein.")
+    if segments is None:
+        segments = JournalSegments.from_frame(df, journal_nr)
+    segments.check(df)
     df = _mark_rows_with_div_or_no_gkto(df, gkto_nr=gkto_nr)
-    _test_number_of_div_rows_per_journalnumber(df, journal_nr)
-    df_copies = _find_references_and_replicate_div_rows(df, 
+
+    if div_modus == "proportional":
+        df_copies, div_pos, mehrdeutig = _allocate_div_rows_proportionally(
+            df, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo, segments, tol=tol
+        )
+        df_mehrdeutig = df[mehrdeutig[segments.codes]].drop(columns="is_div")
+        if report:
+            _report_ambiguous_journals(df_mehrdeutig, journal_nr)
+        df_prep, segments = _create_new_journal_inclouding_div_replicas_exclouding_original_div_rows(
+            df, df_copies, journal_nr=journal_nr, segments=segments, div_pos=div_pos, mehrdeutig=mehrdeutig
+        )
+        return df_prep, segments, df_mehrdeutig
+
+    _test_number_of_div_rows_per_journalnumber(df, journal_nr, segments)
+    df_copies, div_pos = _find_references_and_replicate_div_rows(df,
                                                         kto_nr=kto_nr, 
                                                         kto_name=kto_name, 
                                                         gkto_nr=gkto_nr, 
@@ -21,68 +66,215 @@ def replicate_div_rows(
                                                         soll=soll, 
                                                         haben=haben, 
                                                         saldo=saldo, 
-                                                        journal_nr=journal_nr)
-    df_prep = _create_new_journal_inclouding_div_replicas_exclouding_original_div_rows(df, df_copies, journal_nr=journal_nr)
-    return df_prep
+                                                        journal_nr=journal_nr,
+                                                        segments=segments)
+    df_prep, segments = _create_new_journal_inclouding_div_replicas_exclouding_original_div_rows(
+        df, df_copies, journal_nr=journal_nr, segments=segments, div_pos=div_pos
+    )
+    return df_prep, segments, df.iloc[:0].drop(columns="is_div")
 
 def _mark_rows_with_div_or_no_gkto(df: pd.DataFrame, gkto_nr: str) -> pd.DataFrame:
-    """Markiert Zeilen mit Div-Konto oder ohne Gegenkonto für die Gegenkontoanalyse."""
+    """Markiert Zeilen mit Div-Konto oder ohne Gegenkonto für die Gegenkontoanalyse.
+    Die Spalte "is_div" wird an einer flachen Kopie ergänzt, das übergebene Journal bleibt unverändert."""
     is_div_konto = df[gkto_nr].str.strip().str.fullmatch(r"(?i)div\.?")
     is_missing_gkto = df[gkto_nr].isna() | (df[gkto_nr].str.strip() == "")
+    df = df.copy(deep=False)
     df["is_div"] = is_div_konto | is_missing_gkto
     return df
 
-def _test_number_of_div_rows_per_journalnumber(df: pd.DataFrame, journal_nr) -> None:
+def _test_number_of_div_rows_per_journalnumber(df: pd.DataFrame, journal_nr, segments: Optional[JournalSegments] = None) -> None:
     """Testet, ob es für jede JOURNAL_NR maximal eine Div-Zeile gibt."""
-    div_counts = df.groupby(journal_nr)["is_div"].sum()
-    if (div_counts > 1).any():
+    if segments is None:
+        segments = JournalSegments.from_frame(df, journal_nr)
+    div_counts = segments.sum(df["is_div"].to_numpy(dtype=bool))
+    if (div_counts[segments.valid] > 1).any():
         raise ValueError("Nicht für jede JOURNAL_NR gibt es genau eine Div-Zeile. "
                         "Bitte Journalaufbereitung prüfen.")
         
-def _find_references_and_replicate_div_rows(df: pd.DataFrame, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, journal_nr, saldo=None, ) -> pd.DataFrame:
-    """Findet für jede Journalnummer mit Div-Flag, die korrespondierdenen Gegenbuchungen (Referenzen) der Div-Buchung und kopiert letztere mit den Referenzwerten"""
-    copies = []
-    for jid, grp in df.groupby(journal_nr, sort=False):
-        # finde die eine Div-Zeile
-        div = grp.loc[grp["is_div"]]
-        if len(div)!=1:
-            continue  # überspringen, falls 0 oder >1 Div-Zeilen
-        div = div.iloc[0]  # Series mit den Div-Feldern
-
-        # finde alle Zeilen, deren GKTO_NR auf genau dieses Div-Konto zeigt
-        refs = grp[(~grp["is_div"]) & (grp[gkto_nr] == div[kto_nr])]
-        if refs.empty:
-            continue
-
-        # für jede Referenz eine Kopie der Div-Zeile, befüllt mit ref-Daten
-        for _, r in refs.iterrows():
-            copies.append({
-                **div.drop("is_div").to_dict(),  # alle Original-Spalten der Div-Zeile
-                gkto_nr:    r[kto_nr],     # Gegenkonto = das referenzierende Konto
-                gkto_name:   r[kto_name],    # optional: leer oder aus r übernehmen
-                soll:       r[haben],         # Betrag aus der Referenz-Zeile
-                haben:      r[soll],
-                saldo:  -r[saldo],
-                "is_div":     False              
-            })
-    df_copies = pd.DataFrame(copies)
+def _find_references_and_replicate_div_rows(df: pd.DataFrame, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, journal_nr, saldo=None, segments=None) -> tuple:
+    """Findet für jede Journalnummer mit Div-Flag, die korrespondierdenen Gegenbuchungen (Referenzen) der Div-Buchung und kopiert letztere mit den Referenzwerten.
+
+    Gibt die Kopien (je Referenz eine, in Zeilenreihenfolge der Referenzen) und die Positionen der jeweils kopierten Div-Zeile zurück."""
+    if segments is None:
+        segments = JournalSegments.from_frame(df, journal_nr)
+    is_div = df["is_div"].to_numpy(dtype=bool)
+
+    # die eine Div-Zeile je Journalnummer (Journale mit 0 oder >1 Div-Zeilen werden übersprungen)
+    div_rows = np.flatnonzero(is_div)
+    eine_div = (segments.sum(is_div) == 1) & segments.valid
+    div_je_segment = np.full(segments.n_segments, -1, dtype=np.int64)
+    div_je_segment[segments.codes[div_rows]] = div_rows
+    div_je_segment[~eine_div] = -1
+    div_je_zeile = segments.broadcast(div_je_segment)
+
+    # alle Zeilen, deren GKTO_NR auf genau dieses Div-Konto zeigt
+    kandidaten = np.flatnonzero(~is_div & (div_je_zeile >= 0))
+    gkto = df[gkto_nr].iloc[kandidaten].reset_index(drop=True)
+    div_kto = df[kto_nr].iloc[div_je_zeile[kandidaten]].reset_index(drop=True)
+    refs = kandidaten[(gkto == div_kto).fillna(False).to_numpy(dtype=bool)]
+    div_pos = div_je_zeile[refs]
+
+    # für jede Referenz eine Kopie der Div-Zeile, befüllt mit ref-Daten
+    ref = df.iloc[refs]
+    df_copies = _copy_div_rows(df, div_pos, {
+        gkto_nr: ref[kto_nr].to_numpy(),       # Gegenkonto = das referenzierende Konto
+        gkto_name: ref[kto_name].to_numpy(),
+        soll: ref[haben].to_numpy(),           # Betrag aus der Referenz-Zeile
+        haben: ref[soll].to_numpy(),
+        saldo: -ref[saldo].to_numpy(),
+    })
+    return df_copies, div_pos
+
+def _copy_div_rows(df: pd.DataFrame, div_pos: np.ndarray, werte: dict, anteile=()) -> pd.DataFrame:
+    """Kopien der Div-Zeilen an ``div_pos`` mit den Spaltenwerten aus ``werte`` (je Kopie ein Wert).
+    Die Spalten ``anteile`` enthalten anteilige Beträge und werden bei ganzzahligem Typ als
+    Gleitkommazahl übernommen, statt die Anteile abzuschneiden."""
+    df_copies = df.iloc[div_pos].reset_index(drop=True)
+    for col, values in werte.items():
+        dtype = df[col].dtype
+        if col in anteile and pd.api.types.is_integer_dtype(dtype):
+            dtype = "Float64" if isinstance(dtype, pd.api.extensions.ExtensionDtype) else "float64"
+        df_copies[col] = pd.Series(values).astype(dtype)
+    df_copies["is_div"] = False
     return df_copies
 
-def _create_new_journal_inclouding_div_replicas_exclouding_original_div_rows(df: pd.DataFrame, df_copies: pd.DataFrame, journal_nr) -> pd.DataFrame:
+def _repeat_pairs(links: np.ndarray, anzahl: np.ndarray, start: np.ndarray) -> tuple:
+    """Alle Paare (i, start[i] + k) mit k < anzahl[i], in Reihenfolge von ``links``."""
+    k = anzahl
+    i = np.repeat(np.arange(len(links)), k)
+    offs = np.arange(k.sum()) - np.repeat(np.cumsum(k) - k, k)
+    return i, np.repeat(start, k) + offs
+
+def _allocate_div_rows_proportionally(df: pd.DataFrame, kto_nr, kto_name, gkto_nr, gkto_name, soll, haben, saldo,
+                                      segments: JournalSegments, tol: float = 1) -> tuple:
+    """
+    Löst Buchungssätze mit beliebig vielen Div-Zeilen in einem Durchlauf auf:
+
+    1. Div-Zeilen, auf deren Konto andere Zeilen des Buchungssatzes als Gegenkonto
+       verweisen (Referenzen), werden wie bisher je Referenz kopiert; teilen sich
+       mehrere Div-Zeilen dasselbe Konto, wird jede Referenz im Verhältnis ihrer
+       Beträge auf sie aufgeteilt.
+    2. Die übrigen Div-Zeilen werden zwischen Soll- und Habenseite des Buchungssatzes
+       anteilig verteilt: Zeile i der Sollseite erhält je Zeile j der Habenseite eine
+       Kopie mit Gegenkonto j über Betrag_i * |Betrag_j| / Summe Habenseite, und
+       umgekehrt; die Kopien sind also spiegelbildlich.
+
+    Mehrdeutig sind Buchungssätze, deren übrige Div-Zeilen sich nicht (bis auf ``tol``)
+    ausgleichen oder nur eine Seite haben, sowie Div-Konten mit mehreren Zeilen
+    gemischter Vorzeichen bzw. Summe 0. Gibt die Kopien, deren Quell-Div-Zeilen und
+    die Maske der mehrdeutigen Segmente zurück.
+    """
+    n = len(df)
+    codes = segments.codes
+    is_div = df["is_div"].to_numpy(dtype=bool)
+    mit_journal = segments.valid[codes]
+    konten, _ = pd.factorize(pd.concat([df[kto_nr], df[gkto_nr]], ignore_index=True))
+    kto, gkto = konten[:n], konten[n:]
+    betrag = np.nan_to_num(df[saldo].to_numpy(dtype="float64", na_value=np.nan))
+    mehrdeutig = np.zeros(segments.n_segments, dtype=bool)
+
+    # 1. Div-Gruppen (Journal, Div-Konto) und ihre Referenzen
+    n_konten = int(konten.max()) + 2 if n else 1
+    div = np.flatnonzero(is_div & mit_journal)
+    gruppen, div_gruppe = np.unique(codes[div] * n_konten + kto[div] + 1, return_inverse=True)
+    kandidaten = np.flatnonzero(~is_div & mit_journal & (gkto >= 0))
+    ref_schluessel = codes[kandidaten] * n_konten + gkto[kandidaten] + 1
+    pos = np.minimum(np.searchsorted(gruppen, ref_schluessel), max(len(gruppen) - 1, 0))
+    treffer = (gruppen[pos] == ref_schluessel) if len(gruppen) else np.zeros(len(kandidaten), dtype=bool)
+    refs, ref_gruppe = kandidaten[treffer], pos[treffer]
+
+    n_gruppen = len(gruppen)
+    anzahl = np.bincount(div_gruppe, minlength=n_gruppen)
+    summe = np.bincount(div_gruppe, weights=betrag[div], minlength=n_gruppen)
+    hat_ref = np.bincount(ref_gruppe, minlength=n_gruppen) > 0
+    gemischt = (
+        (np.bincount(div_gruppe, weights=betrag[div] > 0, minlength=n_gruppen) > 0)
+        & (np.bincount(div_gruppe, weights=betrag[div] < 0, minlength=n_gruppen) > 0)
+    ) | (summe == 0)
+    mehrdeutig[codes[div[(hat_ref & (anzahl > 1) & gemischt)[div_gruppe]]]] = True
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gewicht = np.where(anzahl[div_gruppe] == 1, 1.0, betrag[div] / summe[div_gruppe])
+
+    reihenfolge = np.argsort(div_gruppe, kind="stable")
+    i, k = _repeat_pairs(refs, anzahl[ref_gruppe], (np.cumsum(anzahl) - anzahl)[ref_gruppe])
+    ref_rep, d = refs[i], reihenfolge[k]
+    w = gewicht[d]
+    quellen = [div[d]]
+    werte = [{
+        gkto_nr: df[kto_nr].to_numpy()[ref_rep],
+        gkto_name: df[kto_name].to_numpy()[ref_rep],
+        soll: df[haben].to_numpy(dtype="float64", na_value=np.nan)[ref_rep] * w,
+        haben: df[soll].to_numpy(dtype="float64", na_value=np.nan)[ref_rep] * w,
+        saldo: -df[saldo].to_numpy(dtype="float64", na_value=np.nan)[ref_rep] * w,
+    }]
+
+    # 2. Div-Zeilen ohne Referenz: anteilig zwischen Soll- und Habenseite
+    rest = div[~hat_ref[div_gruppe]]
+    p, q = rest[betrag[rest] > 0], rest[betrag[rest] < 0]
+    summe_p = np.bincount(codes[p], weights=betrag[p], minlength=segments.n_segments)
+    summe_q = np.bincount(codes[q], weights=-betrag[q], minlength=segments.n_segments)
+    mit_rest = np.bincount(codes[np.concatenate([p, q])], minlength=segments.n_segments) > 0
+    mehrdeutig |= mit_rest & ((summe_p == 0) | (summe_q == 0) | (np.abs(summe_p - summe_q) > tol))
+
+    q = q[np.argsort(codes[q], kind="stable")]
+    n_q = np.bincount(codes[q], minlength=segments.n_segments)
+    i, k = _repeat_pairs(p, n_q[codes[p]], (np.cumsum(n_q) - n_q)[codes[p]])
+    p_rep, q_rep = p[i], q[k]
+    seg = codes[p_rep]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        anteil_q = -betrag[q_rep] / summe_q[seg]      # Anteil der Habenzeile an der Habenseite
+        anteil_p = betrag[p_rep] / summe_p[seg]       # Anteil der Sollzeile an der Sollseite
+    gegenseite = np.argsort(q_rep, kind="stable")
+    for zeile, partner, anteil in ((p_rep, q_rep, anteil_q), (q_rep[gegenseite], p_rep[gegenseite], anteil_p[gegenseite])):
+        quellen.append(zeile)
+        werte.append({
+            gkto_nr: df[kto_nr].to_numpy()[partner],
+            gkto_name: df[kto_name].to_numpy()[partner],
+            soll: df[soll].to_numpy(dtype="float64", na_value=np.nan)[zeile] * anteil,
+            haben: df[haben].to_numpy(dtype="float64", na_value=np.nan)[zeile] * anteil,
+            saldo: df[saldo].to_numpy(dtype="float64", na_value=np.nan)[zeile] * anteil,
+        })
+
+    div_pos = np.concatenate(quellen)
+    behalten = ~mehrdeutig[codes[div_pos]]
+    werte = {col: np.concatenate([w[col] for w in werte])[behalten] for col in werte[0]}
+    div_pos = div_pos[behalten]
+    return _copy_div_rows(df, div_pos, werte, anteile=(soll, haben, saldo)), div_pos, mehrdeutig
+
+def _report_ambiguous_journals(output: pd.DataFrame, journal_nr) -> None:
+    """Gibt die mehrdeutigen Buchungssätze aus und schreibt sie in eine Excel-Datei."""
+    if output.empty:
+        return
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"Journalnummern_mehrdeutig_{timestamp}.xlsx"
+    print(f"Hinweis: {output[journal_nr].nunique()} JOURNAL_NR mit mehreren Div-Zeilen konnten nicht eindeutig "
+          f"aufgeteilt werden, werden nicht berücksichtigt und wurden nach '{filename}' exportiert.")
+    output.to_excel(filename, index=False)
+
+def _create_new_journal_inclouding_div_replicas_exclouding_original_div_rows(df: pd.DataFrame, df_copies: pd.DataFrame, journal_nr, segments: JournalSegments, div_pos: np.ndarray, mehrdeutig: Optional[np.ndarray] = None) -> tuple:
     """Erstellt ein neues Journal, das die Original-Div-Zeilen und deren Repliken enthält.
         df_prep enthält am Ende:
         • alle ursprünglichen Zeilen (inkl. Div-Zeilen)
-        • plus für jede Referenz-Zeile eine *aufgesplittete* Div-Kopie"""
+        • plus für jede Referenz-Zeile eine *aufgesplittete* Div-Kopie
+
+    Sortiert wird über die Segmentnummern (stabil nach JOURNAL_NR und is_div) statt erneut über
+    die Journalnummern; zurückgegeben werden das Journal und dessen Journalindex. Segmente in
+    ``mehrdeutig`` entfallen ganz."""
 
     df_prep = pd.concat([df, df_copies], ignore_index=True, sort=False)
+    codes = np.concatenate([segments.codes, segments.codes[div_pos]])
+    is_div = df_prep["is_div"].to_numpy(dtype=bool)
 
-    # (optional) sortieren nach JOURNAL_NR, damit alles zusammenbleibt
-    df_prep = df_prep.sort_values([journal_nr,"is_div"], ascending=[True, True])
+    # sortieren nach JOURNAL_NR, damit alles zusammenbleibt
+    order = np.lexsort((is_div, codes))
 
     # Aus df_prep alle ORIGINAL-Div-Zeilen (is_div==True) rauswerfen
-    df_prep = df_prep.loc[~df_prep["is_div"]].copy()
+    order = order[~is_div[order]]
+    if mehrdeutig is not None:
+        order = order[~mehrdeutig[codes[order]]]
+    df_prep = df_prep.iloc[order]
 
-    # Optional: is_div-Spalte kannst du jetzt entfernen, wenn du sie nicht mehr brauchst
+    # is_div-Spalte wird nicht mehr gebraucht
     df_prep = df_prep.drop(columns="is_div")
     
-    return df_prep
\ No newline at end of file
+    return df_prep, JournalSegments.from_codes(codes[order], segments.keys)
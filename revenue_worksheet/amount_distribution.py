@@ -0,0 +1,262 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from scipy import stats
+from typing import Callable, Iterable, Optional, Union
+
+from monetary_unit_sampling.monetary_unit_sampling import iter_journal_chunks
+
+__all__ = [
+    "get_amount_distribution",
+    "get_amount_distribution_streaming",
+    "TESTS",
+]
+
+# Erwartete Anteile je Test: Benford für die ersten (zwei) Ziffern, Gleichverteilung für die letzte
+TESTS = {
+    "erste_ziffer": pd.Series(np.log10(1 + 1 / np.arange(1, 10)), index=np.arange(1, 10)),
+    "erste_zwei_ziffern": pd.Series(np.log10(1 + 1 / np.arange(10, 100)), index=np.arange(10, 100)),
+    "letzte_ziffer": pd.Series(np.full(10, 0.1), index=np.arange(10)),
+}
+
+# MAD-Grenzen nach Nigrini: enge, akzeptable, marginale Konformität
+_MAD_GRENZEN = {
+    "erste_ziffer": (0.006, 0.012, 0.015),
+    "erste_zwei_ziffern": (0.0012, 0.0018, 0.0022),
+}
+_BEWERTUNGEN = ["enge Konformität", "akzeptable Konformität", "marginale Konformität", "keine Konformität"]
+
+_ZEHNERPOTENZEN = 10 ** np.arange(19, dtype=np.int64)
+
+GESAMT = "Gesamt"
+JAHR = "Jahr"
+_MONATE = np.array(["ohne Datum"] + [f"{m:02d}" for m in range(1, 13)], dtype=object)
+
+
+class _Zaehler:
+    """
+    Additive Häufigkeiten je Sparte und Monat (Ziffern je Test und Beträge in Cent).
+    Chunks werden über ``add`` einzeln gezählt, ``ergebnis`` fasst zusammen.
+    """
+
+    def __init__(self, col_saldo, col_datum, col_sparte, col_kategorie, kategorien, min_betrag):
+        self.col_saldo = col_saldo
+        self.col_datum = col_datum
+        self.col_sparte = col_sparte
+        self.col_kategorie = col_kategorie
+        self.kategorien = list(kategorien)
+        self.min_cent = int(round(min_betrag * 100))
+        self.ziffern = {test: [] for test in TESTS}
+        self.betraege = []
+
+    def add(self, df: pd.DataFrame, betrag: Optional[pd.Series] = None, monat: Optional[pd.Series] = None) -> None:
+        maske = df[self.col_kategorie].isin(self.kategorien).to_numpy(dtype=bool)
+        df = df.loc[maske]
+        if betrag is None:
+            betrag = pd.to_numeric(df[self.col_saldo], errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        else:
+            betrag = betrag.to_numpy(dtype="float64", na_value=np.nan)[maske]
+        betrag = np.abs(betrag)
+        cent = np.round(np.nan_to_num(betrag, nan=0.0) * 100).astype(np.int64)
+        gueltig = cent >= max(self.min_cent, 1)
+        if not gueltig.any():
+            return
+        cent = cent[gueltig]
+
+        if monat is None:
+            monat = pd.to_datetime(df[self.col_datum], errors="coerce").dt.month.to_numpy(dtype="float64", na_value=0)
+        else:
+            monat = monat.to_numpy(dtype="float64", na_value=0)[maske]
+        sparte = df[self.col_sparte].astype("string").fillna("ohne Sparte").to_numpy(dtype=object)
+        gruppe = pd.MultiIndex.from_arrays(
+            [sparte[gueltig], _MONATE[monat[gueltig].astype(np.int64)]], names=["sparte", "monat"]
+        )
+        codes, gruppen = pd.factorize(gruppe)
+
+        # Ziffern ganzzahlig: Stellenzahl über die Zehnerpotenzen, keine Umwandlung in Text
+        stelle = np.searchsorted(_ZEHNERPOTENZEN, cent, side="right") - 1
+        ziffern = {
+            "erste_ziffer": cent // _ZEHNERPOTENZEN[stelle],
+            "erste_zwei_ziffern": cent // _ZEHNERPOTENZEN[np.maximum(stelle - 1, 0)],
+            "letzte_ziffer": (cent // 100) % 10,
+        }
+        zweistellig = cent >= 10
+        for test, werte in ziffern.items():
+            auswahl = zweistellig if test == "erste_zwei_ziffern" else slice(None)
+            self.ziffern[test].append(_count(codes[auswahl], gruppen, werte[auswahl], "ziffer"))
+        self.betraege.append(_count(codes, gruppen, cent, "cent"))
+
+    def ergebnis(self) -> dict:
+        ziffern, konformitaet = [], []
+        for test, erwartet in TESTS.items():
+            anzahl = _mit_summen(_sum_counts(self.ziffern[test], "ziffer"), "ziffer")
+            tabelle = (
+                anzahl.unstack("ziffer", fill_value=0)
+                .reindex(columns=erwartet.index, fill_value=0)
+            )
+            n = tabelle.sum(axis=1).to_numpy(dtype="float64")
+            beobachtet = tabelle.to_numpy(dtype="float64")
+            with np.errstate(divide="ignore", invalid="ignore"):
+                anteil = beobachtet / n[:, None]
+                chi2 = ((beobachtet - n[:, None] * erwartet.to_numpy()) ** 2 / (n[:, None] * erwartet.to_numpy())).sum(axis=1)
+            mad = np.abs(anteil - erwartet.to_numpy()).mean(axis=1)
+
+            lang = pd.DataFrame({
+                "sparte": np.repeat(tabelle.index.get_level_values("sparte"), len(erwartet)),
+                "monat": np.repeat(tabelle.index.get_level_values("monat"), len(erwartet)),
+                "test": test,
+                "ziffer": np.tile(erwartet.index, len(tabelle)),
+                "anzahl": beobachtet.ravel().astype(np.int64),
+                "anteil": anteil.ravel(),
+                "erwartet": np.tile(erwartet.to_numpy(), len(tabelle)),
+            })
+            ziffern.append(lang)
+            konformitaet.append(pd.DataFrame({
+                "sparte": tabelle.index.get_level_values("sparte"),
+                "monat": tabelle.index.get_level_values("monat"),
+                "test": test,
+                "n": n.astype(np.int64),
+                "mad": mad,
+                "chi2": chi2,
+                "p_wert": stats.chi2.sf(chi2, len(erwartet) - 1),
+                "bewertung": _get_bewertung(test, mad),
+            }))
+
+        return {
+            "konformitaet": pd.concat(konformitaet, ignore_index=True),
+            "duplikate": _get_duplikate(_mit_summen(_sum_counts(self.betraege, "cent"), "cent")),
+            "ziffern": pd.concat(ziffern, ignore_index=True),
+        }
+
+
+def _count(codes: np.ndarray, gruppen: pd.MultiIndex, werte: np.ndarray, name: str) -> pd.Series:
+    """Häufigkeit je (Sparte, Monat, Wert) eines Chunks."""
+    basis = int(werte.max()) + 1 if len(werte) else 1
+    schluessel, anzahl = np.unique(codes.astype(np.int64) * basis + werte, return_counts=True)
+    code, wert = np.divmod(schluessel, basis)
+    gruppe = gruppen[code]
+    index = pd.MultiIndex.from_arrays(
+        [gruppe.get_level_values(0), gruppe.get_level_values(1), wert],
+        names=["sparte", "monat", name],
+    )
+    return pd.Series(anzahl, index=index)
+
+
+def _sum_counts(teile: list, name: str) -> pd.Series:
+    """Summiert die Häufigkeiten aller Chunks."""
+    if not teile:
+        leer = pd.MultiIndex.from_arrays([[], [], []], names=["sparte", "monat", name])
+        return pd.Series([], index=leer, dtype=np.int64)
+    return pd.concat(teile).groupby(level=["sparte", "monat", name]).sum()
+
+
+def _mit_summen(anzahl: pd.Series, name: str) -> pd.Series:
+    """Ergänzt die Summen über alle Monate ("Jahr") und über alle Sparten ("Gesamt")."""
+    je_sparte = anzahl.groupby(level=["sparte", name]).sum()
+    je_monat = anzahl.groupby(level=["monat", name]).sum()
+    gesamt = anzahl.groupby(level=name).sum()
+    teile = [
+        anzahl,
+        pd.concat({JAHR: je_sparte}, names=["monat"]).reorder_levels(["sparte", "monat", name]),
+        pd.concat({GESAMT: je_monat}, names=["sparte"]),
+        pd.concat({(GESAMT, JAHR): gesamt}, names=["sparte", "monat"]),
+    ]
+    return pd.concat(teile).sort_index()
+
+
+def _get_bewertung(test: str, mad: np.ndarray) -> np.ndarray:
+    if test not in _MAD_GRENZEN:
+        return np.full(len(mad), None, dtype=object)
+    stufe = np.searchsorted(np.array(_MAD_GRENZEN[test]), mad, side="right")
+    return np.where(np.isnan(mad), None, np.array(_BEWERTUNGEN, dtype=object)[np.minimum(stufe, 3)])
+
+
+def _get_duplikate(anzahl: pd.Series) -> pd.DataFrame:
+    """Kennzahlen mehrfach vorkommender Beträge je Sparte und Monat."""
+    gruppen = anzahl.groupby(level=["sparte", "monat"], sort=True)
+    ergebnis = pd.DataFrame({
+        "n": gruppen.sum(),
+        "verschiedene_betraege": gruppen.size(),
+        "buchungen_mit_mehrfachem_betrag": anzahl.where(anzahl > 1, 0).groupby(level=["sparte", "monat"]).sum(),
+    })
+    ergebnis["anteil_mehrfach"] = ergebnis["buchungen_mit_mehrfachem_betrag"] / ergebnis["n"]
+
+    # häufigster Betrag je Gruppe, bei Gleichstand der kleinste
+    haeufigster = (
+        anzahl.rename("haeufigkeit").reset_index()
+        .sort_values("haeufigkeit", ascending=False, kind="stable")
+        .drop_duplicates(["sparte", "monat"])
+        .set_index(["sparte", "monat"])
+    )
+    ergebnis["haeufigster_betrag"] = haeufigster["cent"] / 100
+    ergebnis["haeufigkeit"] = haeufigster["haeufigkeit"]
+    return ergebnis.reset_index()
+
+
+def get_amount_distribution(
+    df: pd.DataFrame,
+    col_saldo: str,
+    col_datum: str,
+    col_sparte: str = "sparte",
+    col_kategorie: str = "kategorie",
+    kategorien: Iterable[str] = ("u",),
+    min_betrag: float = 10,
+    betrag: Optional[pd.Series] = None,
+    monat: Optional[pd.Series] = None,
+) -> dict:
+    """
+    Ziffern- und Betragsverteilung der Buchungen mit Kategorie in ``kategorien``
+    (Standard Umsatzerlöse) und absolutem Betrag ab ``min_betrag``, je Sparte und
+    Monat sowie in Summe über das Jahr ("Jahr") bzw. alle Sparten ("Gesamt").
+
+    Gibt ein dict mit drei DataFrames zurück:
+    - "konformitaet": je Gruppe und Test Anzahl, MAD, Chi-Quadrat, p-Wert und
+      Bewertung (MAD-Grenzen nach Nigrini, nur für die ersten Ziffern)
+    - "duplikate": Anteil der Buchungen mit mehrfach vorkommendem Betrag und der häufigste Betrag
+    - "ziffern": beobachtete und erwartete Anteile je Ziffer
+
+    Tests: erste Ziffer, erste zwei Ziffern (Benford) und letzte Ziffer vor dem
+    Komma (Gleichverteilung). Die Ziffern werden ganzzahlig aus den Beträgen in
+    Cent bestimmt.
+
+    ``betrag`` (numerisch) und ``monat`` (Buchungsmonat) je Zeile von ``df``
+    ersetzen das Umwandeln von ``col_saldo`` bzw. ``col_datum``.
+    """
+    zaehler = _Zaehler(col_saldo, col_datum, col_sparte, col_kategorie, kategorien, min_betrag)
+    zaehler.add(df, betrag, monat)
+    return zaehler.ergebnis()
+
+
+def get_amount_distribution_streaming(
+    chunks: Union[str, Path, Callable[[], Iterable[pd.DataFrame]]],
+    col_saldo: str,
+    col_datum: str,
+    col_sparte: str = "sparte",
+    col_kategorie: str = "kategorie",
+    kategorien: Iterable[str] = ("u",),
+    min_betrag: float = 10,
+    prepare: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+    chunksize: int = 1_000_000,
+) -> dict:
+    """
+    Wie ``get_amount_distribution`` für Journale, die nicht in den Speicher passen.
+
+    ``chunks`` ist ein Pfad zu einer CSV-/Parquet-Datei oder eine Funktion, die
+    einen Iterator über DataFrame-Chunks liefert. ``prepare`` wird auf jeden
+    Chunk angewendet, z.B. um Kategorie und Sparte über das Mapping zu ergänzen
+    (``lambda c: _initially_map_and_filter_df(c, col_konto, None, lookup=lookup)``).
+    Im Speicher gehalten werden nur ein Chunk und die Häufigkeiten; das Ergebnis
+    ist identisch mit der In-Memory-Variante.
+    """
+    if isinstance(chunks, (str, Path)):
+        path = chunks
+        get_chunks = lambda: iter_journal_chunks(path, chunksize)
+    elif callable(chunks):
+        get_chunks = chunks
+    else:
+        raise TypeError("`chunks` muss ein Pfad oder eine Funktion sein, die Chunks liefert.")
+
+    zaehler = _Zaehler(col_saldo, col_datum, col_sparte, col_kategorie, kategorien, min_betrag)
+    for chunk in get_chunks():
+        zaehler.add(prepare(chunk) if prepare is not None else chunk)
+    return zaehler.ergebnis()
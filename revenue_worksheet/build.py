@@ -1,3 +1,5 @@
+import warnings
+import numpy as np
 import pandas as pd
 from typing import Union
 from pathlib import Path
@@ -5,10 +7,16 @@ from revenue_worksheet.umsatzanalyse_with_template import (
     create_arbeitspapier_from_template_with_sections,
 )
 from typing import Optional
+from revenue_worksheet.amount_distribution import get_amount_distribution
+from revenue_worksheet.cut_off import DateIndex, get_cut_off_sample, get_stichtag
+from revenue_worksheet.intermediates import hash_dataframe, hash_parts, load_or_compute
+from instrumentation.run_report import profiled_run, stage
 from monetary_unit_sampling.monetary_unit_sampling import (
     mus_sampling_with_given_sample_size,
 )
 
+TEMPLATE_PATH = Path(__file__).parent / "template_umsatzanalyse_mit_sparten.xlsx"
+
 
 def build_working_paper(
     df1: pd.DataFrame,
@@ -18,87 +26,245 @@ def build_working_paper(
     col_datum: str,
     mapping_path: Union[str, Path],
     output_path: Union[str, Path] = "arbeitspapier.xlsx",
-    template_path: Union[str, Path] = "revenue_worksheet\template_umsatzanalyse_mit_sparten.xlsx",
+    template_path: Union[str, Path] = TEMPLATE_PATH,
     df3: pd.DataFrame = None,
     mus_sample_size: int = 10,
     cut_off_sample_size: int = 10,
     materiality: int = 0,
+    cache_dir: Optional[Union[str, Path]] = None,
+    run_report_path: Optional[Union[str, Path]] = None,
+    jet_hits: Optional[pd.DataFrame] = None,
+    betragsanalyse: bool = False,
+    geschaeftsjahresende: str = "12-31",
+    stichtag: Optional[str] = None,
+    cut_off_tage: tuple = (16, 15),
+    intermediates: Optional[dict] = None,
 ) -> None:
+    """Erstellt das Arbeitspapier zur Umsatzanalyse aus Vorjahr (df1), Berichtsjahr (df2)
+    und optional Folgejahr (df3).
+
+    Mit ``cache_dir`` werden die Zwischenergebnisse je Jahr (gemapptes Journal,
+    Monatssummen je Sparte, Cut-off-Fenster) dort abgelegt, geschlüsselt über den
+    Hash von Journal und Mapping. Ein erneuter Lauf berechnet nur die Jahre neu,
+    deren Journal (oder das Mapping) sich geändert hat.
+
+    Mit ``run_report_path`` werden Laufzeit, Speicher und Zeilenzahlen je Stufe
+    gemessen und als JSON dorthin geschrieben.
+
+    ``jet_hits`` (Trefferliste aus ``network_analysis.journal_entry_tests``) wird
+    auf dem Tabellenblatt "JET" ausgegeben. Mit ``betragsanalyse`` werden Ziffern-
+    (Benford) und Betragsverteilung der Umsatzbuchungen des Berichtsjahres je
+    Sparte und Monat auf dem Tabellenblatt "Betragsanalyse" ergänzt.
+
+    Die Cut-off-Stichprobe umfasst die Umsatzbuchungen ``cut_off_tage[0]`` Tage vor
+    bis einschließlich ``stichtag`` im Berichtsjahr und bis ``cut_off_tage[1]`` Tage
+    danach im Folgejahr. Ohne ``stichtag`` ist das der ``geschaeftsjahresende``
+    (Monat-Tag) des Geschäftsjahres, in das die meisten Buchungen des
+    Berichtsjahres fallen; Standard ist wie bisher 15.12. bis 15.01. Enthält ein
+    Fenster keine einzige Buchung (z.B. bei unterjährigen Journalen), wird gewarnt
+    und die Stichprobe dieses Fensters bleibt leer; ein abweichender Stichtag lässt
+    sich mit ``stichtag`` angeben.
+
+    ``mapping_path`` kann auch die bereits eingelesene Mappingtabelle sein.
+    ``intermediates`` ({"vorjahr": {...}, "berichtsjahr": {...}, "folgejahr": {...}})
+    nimmt die Zwischenergebnisse je Jahr auf (siehe ``_get_year_intermediates``):
+    vorhandene werden übernommen, fehlende berechnet und dort ergänzt. So teilen
+    sich mehrere Läufe, z.B. über ``auditrevenue.engagement.Engagement``, das
+    gemappte Journal sowie die einmal umgewandelten Beträge und Belegdaten.
+    """
+    if intermediates is None:
+        intermediates = {}
+
+    with profiled_run(run_report_path):
+        with stage("load_mapping") as st:
+            mapping = _get_mapping(mapping_path)
+            st.rows_out = len(mapping)
+        lst_sparten = _get_list_of_sections(mapping)
+        mapping_hash = hash_dataframe(mapping)
+        lookup = _compile_mapping(mapping)
+
+        year1 = _get_year_intermediates(
+            df1, col_konto, col_saldo, col_datum, lookup, mapping_hash, lst_sparten,
+            cache_dir=cache_dir,
+            result=intermediates.setdefault("vorjahr", {}),
+        )
+        year2 = _get_year_intermediates(
+            df2, col_konto, col_saldo, col_datum, lookup, mapping_hash, lst_sparten,
+            cache_dir=cache_dir,
+            dates=True,
+            result=intermediates.setdefault("berichtsjahr", {}),
+        )
+        if stichtag is None:
+            stichtag = get_stichtag(year2["dates"], geschaeftsjahresende)
+        tage_vor, tage_nach = cut_off_tage
+
+        # Tupel (Berichtsjahr, Vorjahr) je Sparte, beginnend mit der Gesamtübersicht
+        df_list_of_touples = list(zip(year2["monthly"], year1["monthly"]))
+
+        df2_mapped_only_ue = _filter_for_mus_sample(
+            df=year2["mapped"],
+            saldo_col=col_saldo,
+            materiality=materiality,
+            betrag=_get_betrag(year2, col_saldo),
+        )
+        with stage("mus_sample", rows_in=len(df2_mapped_only_ue)):
+            mus_sample = mus_sampling_with_given_sample_size(
+                data=df2_mapped_only_ue,
+                amount_col=col_saldo,
+                sample_size=mus_sample_size,
+                mode="filter",
+            )
 
-    mapping = _get_mapping(mapping_path)
-    lst_sparten = _get_list_of_sections(mapping)
-
-    df1_mapped = _initially_map_and_filter_df(df1, col_konto, mapping)
-    df2_mapped = _initially_map_and_filter_df(df2, col_konto, mapping)
-    if df3 is not None:
-        df3_mapped = _initially_map_and_filter_df(df3, col_konto, mapping)
-
-    df_list_of_touples = _get_all_dfs(
-        lst_sparten,
-        df1_mapped,
-        df2_mapped,
-        col_kategorie="kategorie",
-        col_sparte="sparte",
-        col_saldo=col_saldo,
-        col_datum=col_datum,
-    )
+        rows2 = year2["dates"].window(stichtag, tage_vor=tage_vor)
+        _check_cut_off_window(rows2, "Berichtsjahres", stichtag)
+        with stage("mus_cut_off_sample", rows_in=len(rows2)):
+            cut_off_sample_df2 = get_cut_off_sample(
+                year2["mapped"], rows2, col_saldo, cut_off_sample_size,
+                date_col=col_datum,
+                materiality=materiality,
+                betrag=_get_betrag(year2, col_saldo),
+            )
 
-    df2_mapped_only_ue = _filter_for_mus_sample(
-        df=df2_mapped, 
-        saldo_col=col_saldo, 
-        materiality=materiality
-    )
-    mus_sample = mus_sampling_with_given_sample_size(
-        data=df2_mapped_only_ue,
-        amount_col=col_saldo,
-        sample_size=mus_sample_size,
-        mode="filter",
-    )
+        amount_distribution = None
+        if betragsanalyse:
+            with stage("amount_distribution", rows_in=len(year2["mapped"])):
+                amount_distribution = get_amount_distribution(
+                    year2["mapped"], col_saldo, col_datum, col_sparte="sparte", col_kategorie="kategorie",
+                    betrag=_get_betrag(year2, col_saldo), monat=_get_datum(year2, col_datum).dt.month,
+                )
+
+        if df3 is not None:
+            year3 = _get_year_intermediates(
+                df3, col_konto, col_saldo, col_datum, lookup, mapping_hash, lst_sparten,
+                cache_dir=cache_dir,
+                monthly=False,
+                dates=True,
+                result=intermediates.setdefault("folgejahr", {}),
+            )
+            rows3 = year3["dates"].between(np.datetime64(stichtag, "D") + 1, np.datetime64(stichtag, "D") + tage_nach)
+            _check_cut_off_window(rows3, "Folgejahres", stichtag)
+            with stage("mus_cut_off_sample", rows_in=len(rows3)):
+                cut_off_sample_df3 = get_cut_off_sample(
+                    year3["mapped"], rows3, col_saldo, cut_off_sample_size,
+                    date_col=col_datum,
+                    materiality=materiality,
+                    betrag=_get_betrag(year3, col_saldo),
+                )
+            cut_off_sample = pd.concat(
+                [cut_off_sample_df2, cut_off_sample_df3], ignore_index=True
+            )
+        else:
+            cut_off_sample = cut_off_sample_df2
+
+        with stage("save_workbook"):
+            create_arbeitspapier_from_template_with_sections(
+                df_list_of_touples,
+                template_path,
+                output_path,
+                mus_sample,
+                cut_off_sample,
+                jet_hits=jet_hits,
+                betragsanalyse=amount_distribution,
+            )
 
-    df2_mapped_only_ue_only_dec = _filter_for_mus_cut_off_sample_dec(
-        df=df2_mapped_only_ue,
-        date_col=col_datum,
-        saldo_col=col_saldo,
-        materiality=materiality,
-    )
 
-    cut_off_sample_df2 = mus_sampling_with_given_sample_size(
-        data=df2_mapped_only_ue_only_dec,
-        amount_col=col_saldo,
-        sample_size=cut_off_sample_size,
-        mode="filter",
-    )
+def _get_year_intermediates(
+    df: pd.DataFrame,
+    col_konto: str,
+    col_saldo: str,
+    col_datum: str,
+    lookup: pd.DataFrame,
+    mapping_hash: str,
+    lst_sparten: list,
+    cache_dir: Optional[Union[str, Path]] = None,
+    monthly: bool = True,
+    dates: bool = False,
+    result: Optional[dict] = None,
+) -> dict:
+    """Berechnet die Zwischenergebnisse eines Jahres oder lädt sie aus ``cache_dir``:
+    - "mapped":  das gemappte und gefilterte Journal
+    - "monthly": Monatssummen, Gesamtübersicht gefolgt von je einer je Sparte
+    - "dates":   sortierter Datumsindex (``DateIndex``) des gemappten Journals für die Cut-off-Fenster
+
+    Bei Bedarf ergänzt ``_get_betrag`` und ``_get_datum`` die einmal umgewandelten
+    Beträge bzw. Belegdaten des gemappten Journals ("betrag", "datum").
+
+    Mit ``result`` (dict) werden dort vorhandene Ergebnisse übernommen und die
+    fehlenden ergänzt; gehören sie zu anderem Mapping oder anderen Spalten, wird
+    neu berechnet. Das Journal selbst muss dasselbe sein.
+    """
+    if result is None:
+        result = {}
+    params = (mapping_hash, col_konto, col_saldo, col_datum)
+    if result.get("params") != params:
+        result.clear()
+        result["params"] = params
+    if "year_key" not in result:
+        result["year_key"] = hash_parts(hash_dataframe(df), *params)
+    year_key = result["year_key"]
+
+    if "mapped" not in result:
+        with stage("map_journal", rows_in=len(df)) as st:
+            result["mapped"] = load_or_compute(
+                cache_dir, "mapped", year_key,
+                lambda: _initially_map_and_filter_df(df, col_konto, mapping=None, lookup=lookup),
+            )
+            st.rows_out = len(result["mapped"])
+
+    if monthly and "monthly" not in result:
+        with stage("monthly_aggregation", rows_in=len(result["mapped"])):
+            result["monthly"] = load_or_compute(
+                cache_dir, "monthly", year_key,
+                lambda: _get_monthly_dfs(
+                    lst_sparten,
+                    result["mapped"],
+                    col_kategorie="kategorie",
+                    col_sparte="sparte",
+                    col_saldo=col_saldo,
+                    col_datum=col_datum,
+                    monat=_get_datum(result, col_datum).dt.month,
+                ),
+            )
 
-    if df3 is not None:
-        df3_mapped_only_ue_only_jan = _filter_for_mus_cut_off_sample_jan(
-            df=df3_mapped, 
-            date_col=col_datum, 
-            saldo_col=col_saldo, 
-            materiality=materiality
-        )
-        cut_off_sample_df3 = mus_sampling_with_given_sample_size(
-            data=df3_mapped_only_ue_only_jan,
-            amount_col=col_saldo,
-            sample_size=cut_off_sample_size,
-            mode="filter",
-        )
-        cut_off_sample = pd.concat(
-            [cut_off_sample_df2, cut_off_sample_df3], ignore_index=True
+    if dates and "dates" not in result:
+        with stage("date_index", rows_in=len(result["mapped"])):
+            result["dates"] = load_or_compute(
+                cache_dir, "dates", year_key,
+                lambda: DateIndex.from_column(_get_datum(result, col_datum)),
+            )
+
+    return result
+
+
+def _get_betrag(year: dict, col_saldo: str) -> pd.Series:
+    """Beträge des gemappten Journals (numerisch, einmal je Jahr umgewandelt)."""
+    if "betrag" not in year:
+        year["betrag"] = pd.to_numeric(year["mapped"][col_saldo], errors="coerce")
+    return year["betrag"]
+
+
+def _get_datum(year: dict, col_datum: str) -> pd.Series:
+    """Belegdaten des gemappten Journals (datetime64, einmal je Jahr umgewandelt)."""
+    if "datum" not in year:
+        year["datum"] = pd.to_datetime(year["mapped"][col_datum], errors="coerce")
+    return year["datum"]
+
+
+def _check_cut_off_window(rows: np.ndarray, jahr: str, stichtag) -> None:
+    """Ein leeres Cut-off-Fenster deutet auf einen falschen Stichtag hin, die Stichprobe bleibt dann leer."""
+    if len(rows) == 0:
+        warnings.warn(
+            f"Das Cut-off-Fenster des {jahr} um den Stichtag {np.datetime64(stichtag, 'D')} enthält keine "
+            f"Buchungen, die Cut-off-Stichprobe dafür bleibt leer. Bitte Stichtag (`stichtag`) bzw. "
+            f"Geschäftsjahresende prüfen.",
+            stacklevel=3,
         )
-    else:
-        cut_off_sample = cut_off_sample_df2
-
-    create_arbeitspapier_from_template_with_sections(
-        df_list_of_touples,
-        template_path,
-        output_path,
-        mus_sample,
-        cut_off_sample,
-    )
 
 
 def _get_mapping(path) -> pd.DataFrame:
     """returns df with cols: kto_nr, kto_name, kto_categorie (ue, ma) and kto_section (sparte, o.ae.)"""
+    if isinstance(path, pd.DataFrame):
+        return path
     df = pd.read_excel(path, dtype="string")
     return df
 
@@ -115,163 +281,140 @@ def _get_list_of_sections(mapping: pd.DataFrame) -> list:
     return list_clean
 
 
-def _initially_map_and_filter_df(
-    df: pd.DataFrame,
-    col_kto: str,
+def _compile_mapping(
     mapping: pd.DataFrame,
     umsatzkennzeichen: str = "u",
     materialkennzeichen: str = "m",
-):
-    """In der Mappingtabelle steht kto, kto_name, kennzeichen und sparte (Namen verschieden nur mit Spaltenindex arbeiten).
-    der df (Buchungsjournal) soll um die Kategorie und sparte, die man aus der mapping datei lesen kann, erweitert werden. joinen kann man df[col_kto] und mapping[0]
-
-    Am ende soll der df wieder ausgegeben werden, nur dass jetzt rechts auch noch die kategorie und sparte je konto zu finden ist.
+) -> pd.DataFrame:
+    """Verdichtet die Mappingtabelle einmalig zu einem Lookup Konto -> kategorie, sparte.
 
-    zuletzt wird der df auf nur kennzeichen == Umsatzkennzeichen oder Materaialkennzeichen gefiltert.
+    Enthält nur die Konten mit Umsatz- oder Materialkennzeichen, der Index (Konto) ist
+    eindeutig. Die many-to-one-Prüfung des Joins erfolgt hier einmal für das Mapping.
     """
     kto_map_col = mapping.columns[0]
-    name_map_col = mapping.columns[1]
     kennz_map_col = mapping.columns[2]
     sparte_map_col = mapping.columns[3]
 
-    df_merged = df.merge(
-        mapping,
-        how="left",
-        left_on=col_kto,
-        right_on=kto_map_col,
-        validate="many_to_one",
-    )
-    mask = df_merged[kennz_map_col].isin([umsatzkennzeichen, materialkennzeichen])
-    df_filt = df_merged.loc[mask].copy()
+    if not mapping[kto_map_col].is_unique:
+        raise pd.errors.MergeError(
+            "Merge keys are not unique in right dataset; not a many-to-one merge"
+        )
 
-    df_filt = df_filt.assign(
-        kategorie=df_filt[kennz_map_col],  # die Spalten heißen jetzt "kategorie"
-        sparte=df_filt[sparte_map_col],  # und "sparte".
-    )
-    df_result = df_filt.drop(
-        columns=[kto_map_col, name_map_col, kennz_map_col, sparte_map_col]
+    relevant = mapping.loc[
+        mapping[kennz_map_col].isin([umsatzkennzeichen, materialkennzeichen])
+    ]
+    return pd.DataFrame(
+        {
+            "kategorie": relevant[kennz_map_col].array,
+            "sparte": relevant[sparte_map_col].array,
+        },
+        index=pd.Index(relevant[kto_map_col].array),
     )
-    return df_result
 
 
-def _filter_for_mus_sample(
+def _initially_map_and_filter_df(
     df: pd.DataFrame,
-    saldo_col: str = "SALDO_S_H",
-    filter_col: str = "kategorie",
+    col_kto: str,
+    mapping: Optional[pd.DataFrame],
     umsatzkennzeichen: str = "u",
-    materiality: int = 0,
+    materialkennzeichen: str = "m",
+    lookup: Optional[pd.DataFrame] = None,
 ):
-    """Filtert das Journal auf:
-    - nur Umsatzerlöse anhand des Kennzeichens in der Spalte "kategorie"
-    - nur Buchungen mit absolutem Betrag größer als materiality
-    """
-    mask_kategorie = df[filter_col].isin([umsatzkennzeichen])
-    df[saldo_col] = pd.to_numeric(df[saldo_col], errors="coerce")
-    mask_betrag = df[saldo_col].abs() > materiality
-    df_filt = df.loc[mask_kategorie & mask_betrag].copy()
-    return df_filt
+    """In der Mappingtabelle steht kto, kto_name, kennzeichen und sparte (Namen verschieden nur mit Spaltenindex arbeiten).
+    der df (Buchungsjournal) soll um die Kategorie und sparte, die man aus der mapping datei lesen kann, erweitert werden. joinen kann man df[col_kto] und mapping[0]
+
+    Am ende soll der df wieder ausgegeben werden, nur dass jetzt rechts auch noch die kategorie und sparte je konto zu finden ist.
 
+    zuletzt wird der df auf nur kennzeichen == Umsatzkennzeichen oder Materaialkennzeichen gefiltert.
 
-def _filter_for_mus_cut_off_sample_dec(
-    df: pd.DataFrame,
-    saldo_col: str = "SALDO_S_H",
-    date_col: str = "BELEG_DAT",
-    filter_col: str = "kategorie",
-    umsatzkennzeichen: str = "u",
-    materiality: int = 0,
-):
-    """Filtert das Journal auf:
-    - nur Umsatzerlöse anhand des Kennzeichens in der Spalte "kategorie"
-    - nur Buchungen ab dem 15. Dezember (unabhängig vom Jahr)
-    - nur Buchungen mit absolutem Betrag größer als materiality
+    Statt eines vollständigen Merges wird über den Lookup aus ``_compile_mapping``
+    (optional vorab übergeben als ``lookup``) nur auf die relevanten Zeilen projiziert.
     """
-    tmp = pd.to_datetime(df[date_col], errors="coerce")
-    df = df.drop(columns=[date_col])
-    df[date_col] = tmp
-    mask_datum = df[date_col].dt.month.eq(12) & df[date_col].dt.day.ge(15)
-    mask_kategorie = df[filter_col].isin([umsatzkennzeichen])
-    df[saldo_col] = pd.to_numeric(df[saldo_col], errors="coerce")
-    mask_betrag = df[saldo_col].abs() > materiality
-    df_filt = df.loc[mask_kategorie & mask_datum & mask_betrag].copy()
-    return df_filt
+    if lookup is None:
+        lookup = _compile_mapping(mapping, umsatzkennzeichen, materialkennzeichen)
+
+    # get_indexer findet bei Zahl gegen Text stillschweigend nichts, der Merge brach hier ab
+    konten = df[col_kto]
+    if pd.api.types.is_numeric_dtype(konten.dtype) != pd.api.types.is_numeric_dtype(lookup.index.dtype):
+        raise ValueError(
+            f"You are trying to merge on {konten.dtype} and {lookup.index.dtype} columns for key "
+            f"'{col_kto}'. If you wish to proceed you should use pd.concat"
+        )
+
+    pos = lookup.index.get_indexer(konten)
+    rows = np.flatnonzero(pos >= 0)
+    pos = pos[rows]
+
+    df_result = df.iloc[rows].copy()
+    df_result.index = rows  # Zeilenpositionen, wie nach dem Merge
+    df_result["kategorie"] = lookup["kategorie"].array.take(pos)
+    df_result["sparte"] = lookup["sparte"].array.take(pos)
+    return df_result
 
 
-def _filter_for_mus_cut_off_sample_jan(
+def _filter_for_mus_sample(
     df: pd.DataFrame,
     saldo_col: str = "SALDO_S_H",
-    date_col: str = "BELEG_DAT",
     filter_col: str = "kategorie",
     umsatzkennzeichen: str = "u",
     materiality: int = 0,
+    betrag: Optional[pd.Series] = None,
 ):
     """Filtert das Journal auf:
     - nur Umsatzerlöse anhand des Kennzeichens in der Spalte "kategorie"
-    - nur Buchungen bis einschließlich 15. Januar (unabhängig vom Jahr)
     - nur Buchungen mit absolutem Betrag größer als materiality
+
+    ``betrag`` sind die bereits numerischen Beträge von ``df[saldo_col]``; das
+    übergebene Journal wird nicht verändert, nur die gefilterte Kopie erhält
+    die numerischen Beträge.
     """
-    tmp = pd.to_datetime(df[date_col], errors="coerce")
-    df = df.drop(columns=[date_col])
-    df[date_col] = tmp
-    mask_datum = df[date_col].dt.month.eq(1) & df[date_col].dt.day.le(15)
+    if betrag is None:
+        betrag = pd.to_numeric(df[saldo_col], errors="coerce")
     mask_kategorie = df[filter_col].isin([umsatzkennzeichen])
-    df[saldo_col] = pd.to_numeric(df[saldo_col], errors="coerce")
-    mask_betrag = df[saldo_col].abs() > materiality
-    df_filt = df.loc[mask_kategorie & mask_datum & mask_betrag].copy()
+    mask_betrag = betrag.abs() > materiality
+    mask = mask_kategorie & mask_betrag
+    df_filt = df.loc[mask].copy()
+    df_filt[saldo_col] = betrag.loc[mask]
     return df_filt
 
 
-def _get_all_dfs(
+def _get_monthly_dfs(
     lst_sparten: list,
-    df1: pd.DataFrame,
-    df2: pd.DataFrame,
+    df: pd.DataFrame,
     col_kategorie: str,
     col_sparte: str,
     col_saldo: str,
     col_datum: str,
-    umsatzkennzeichen: str = "u",
-    materialkennzeichen: str = "m",
+    monat: Optional[pd.Series] = None,
 ) -> list:
-    """Generates a list of toupels each containig df1 and df2 calculatet by section"""
-    list = []
-
-    year1 = _calculate_one_df(
-        df=df1,
-        col_sparte=col_sparte,
-        col_kategorie=col_kategorie,
-        col_saldo=col_saldo,
-        col_datum=col_datum,
-        sparte_value=None,
-    )
-    year2 = _calculate_one_df(
-        df=df2,
-        col_sparte=col_sparte,
-        col_kategorie=col_kategorie,
-        col_saldo=col_saldo,
-        col_datum=col_datum,
-        sparte_value=None,
-    )
-    list.append((year2, year1))
+    """Generates a list of monthly overviews of one year: the total first, then one per section.
+    The booking month (``monat``) is derived once from ``col_datum`` unless given."""
+    if monat is None:
+        monat = pd.to_datetime(df[col_datum], errors="coerce").dt.month
+    list = [
+        _calculate_one_df(
+            df=df,
+            col_sparte=col_sparte,
+            col_kategorie=col_kategorie,
+            col_saldo=col_saldo,
+            col_datum=col_datum,
+            sparte_value=None,
+            monat=monat,
+        )
+    ]
 
-    if len(lst_sparten) > 0:
-        for section in lst_sparten:
-            result1 = _calculate_one_df(
-                df=df1,
-                col_sparte=col_sparte,
-                col_kategorie=col_kategorie,
-                col_saldo=col_saldo,
-                col_datum=col_datum,
-                sparte_value=str(section),
-            )
-            result2 = _calculate_one_df(
-                df=df2,
+    for section in lst_sparten:
+        list.append(
+            _calculate_one_df(
+                df=df,
                 col_sparte=col_sparte,
                 col_kategorie=col_kategorie,
                 col_saldo=col_saldo,
                 col_datum=col_datum,
                 sparte_value=str(section),
+                monat=monat,
             )
-            toupel = (result2, result1)
-            list.append(toupel)
+        )
     return list
 
 
@@ -284,24 +427,20 @@ def _calculate_one_df(
     sparte_value: Optional[str] = None,
     umsatzkennzeichen: str = "u",
     materialkennzeichen: str = "m",
+    monat: Optional[pd.Series] = None,
 ) -> pd.DataFrame:
     """
     12-Zeilen-Übersicht der Monatssummen für Umsatzerlöse (u) und Materialaufwand (m).
+    ``monat`` (Buchungsmonat je Zeile von ``df``) ersetzt das Umwandeln von ``col_datum``.
     """
 
-    # 0) Kopie um SettingWithCopyWarnings zu vermeiden
-
-    df = df.copy()
-
-    # --- fix für FutureWarning: StringDtype mit datetime64 tauschen ---
+    # 1) Monat extrahieren (ohne Kopie des Journals)
 
-    tmp = pd.to_datetime(df[col_datum], errors="coerce")
-    df = df.drop(columns=[col_datum])
-    df[col_datum] = tmp
-
-    # 1) Monat extrahieren
-
-    df.loc[:, "Monat"] = df[col_datum].dt.month
+    if monat is None:
+        monat = pd.to_datetime(df[col_datum], errors="coerce").dt.month
+    df = pd.DataFrame(
+        {col_sparte: df[col_sparte], col_kategorie: df[col_kategorie], col_saldo: df[col_saldo], "Monat": monat}
+    )
 
     # 3) Nach Sparte filtern (wenn gewünscht)
 
@@ -0,0 +1,125 @@
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from monetary_unit_sampling.monetary_unit_sampling import mus_sampling_with_given_sample_size
+
+__all__ = ["DateIndex", "get_abschlusstag", "get_stichtag", "get_cut_off_sample"]
+
+
+@dataclass(frozen=True)
+class DateIndex:
+    """
+    Einmal geparstes und sortiertes Belegdatum eines Journals.
+
+    ``tage`` enthält die Belegtage aufsteigend sortiert (Zeilen ohne gültiges
+    Datum fehlen), ``positionen`` die zugehörigen Zeilenpositionen im Journal.
+    Beliebige Datumsfenster werden per binärer Suche als Ausschnitt (ohne Kopie)
+    bestimmt.
+    """
+
+    tage: np.ndarray
+    positionen: np.ndarray
+    n_rows: int
+
+    @classmethod
+    def from_column(cls, datum: pd.Series) -> "DateIndex":
+        tage = pd.to_datetime(datum, errors="coerce").to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+        gueltig = np.flatnonzero(~np.isnat(tage))
+        reihenfolge = np.argsort(tage[gueltig], kind="stable")
+        return cls(tage=tage[gueltig][reihenfolge], positionen=gueltig[reihenfolge], n_rows=len(datum))
+
+    def between(self, start, ende) -> np.ndarray:
+        """Positionen der Zeilen mit ``start`` <= Belegtag <= ``ende`` (nach Datum sortiert)."""
+        lo = np.searchsorted(self.tage, np.datetime64(start, "D"), side="left")
+        hi = np.searchsorted(self.tage, np.datetime64(ende, "D"), side="right")
+        return self.positionen[lo:hi]
+
+    def window(self, stichtag, tage_vor: int = 0, tage_nach: int = 0) -> np.ndarray:
+        """Positionen der Zeilen von ``tage_vor`` Tagen vor bis ``tage_nach`` Tagen nach dem Stichtag (einschließlich)."""
+        stichtag = np.datetime64(stichtag, "D")
+        return self.between(stichtag - tage_vor, stichtag + tage_nach)
+
+    def windows(self, stichtag, tage: Iterable[int] = (5, 10, 15)) -> dict:
+        """Positionen je symmetrischem Fenster ±n Tage um den Stichtag, Schlüssel = n."""
+        return {n: self.window(stichtag, n, n) for n in tage}
+
+
+def _get_monat_tag(geschaeftsjahresende: str) -> tuple:
+    try:
+        monat, tag = (int(teil) for teil in geschaeftsjahresende.split("-"))
+        pd.Timestamp(2000, monat, tag)  # Schaltjahr: "02-29" ist zulässig
+    except ValueError:
+        raise ValueError(f"Ungültiges Geschäftsjahresende '{geschaeftsjahresende}', erwartet Monat-Tag wie '12-31'.")
+    return monat, tag
+
+
+def get_abschlusstag(jahr: int, geschaeftsjahresende: str = "12-31") -> np.datetime64:
+    """Abschlussstichtag im Kalenderjahr ``jahr``; "02-29" wird außerhalb von Schaltjahren zum 28.02."""
+    monat, tag = _get_monat_tag(geschaeftsjahresende)
+    tag = min(tag, pd.Timestamp(jahr, monat, 1).days_in_month)
+    return np.datetime64(pd.Timestamp(jahr, monat, tag).date(), "D")
+
+
+def get_stichtag(dates: DateIndex, geschaeftsjahresende: str = "12-31") -> np.datetime64:
+    """
+    Abschlussstichtag (Monat-Tag ``geschaeftsjahresende``, z.B. "06-30" bei
+    abweichendem Wirtschaftsjahr) des Geschäftsjahres, in das die meisten
+    Buchungen fallen. Einzelne Belegdaten aus Vor- oder Folgejahren im Journal
+    verschieben den Stichtag daher nicht.
+    """
+    if len(dates.tage) == 0:
+        raise ValueError("Das Journal enthält kein gültiges Belegdatum.")
+    monat, tag = _get_monat_tag(geschaeftsjahresende)
+    tage = pd.DatetimeIndex(dates.tage)
+    # Geschäftsjahr = Kalenderjahr des ersten Stichtags am oder nach dem Belegtag
+    jahr = tage.year.to_numpy() + ((tage.month.to_numpy() * 100 + tage.day.to_numpy()) > monat * 100 + tag)
+    jahre, anzahl = np.unique(jahr, return_counts=True)
+    return get_abschlusstag(int(jahre[np.argmax(anzahl)]), geschaeftsjahresende)
+
+
+def get_cut_off_sample(
+    df: pd.DataFrame,
+    rows: np.ndarray,
+    saldo_col: str,
+    sample_size: int,
+    date_col: Optional[str] = None,
+    filter_col: str = "kategorie",
+    umsatzkennzeichen: str = "u",
+    materiality: int = 0,
+    seed: Optional[int] = None,
+    betrag: Optional[pd.Series] = None,
+) -> pd.DataFrame:
+    """
+    MUS-Stichprobe über die Zeilen ``rows`` (z.B. aus ``DateIndex.window``), beschränkt auf
+    Umsatzerlöse mit absolutem Betrag größer als ``materiality``.
+
+    Kumuliert wird in Journalreihenfolge der Zeilen, das Ergebnis entspricht daher der
+    Stichprobe über das gefilterte Cut-off-Fenster. Kopiert werden nur die gezogenen
+    Zeilen; ``saldo_col`` wird numerisch ausgegeben, mit ``date_col`` wird deren
+    Belegdatum als Datum in die letzte Spalte gestellt (Aufbau wie bisher).
+    ``betrag`` sind die bereits numerischen Beträge von ``df[saldo_col]``.
+    """
+    rows = np.sort(rows)
+    kategorie = df[filter_col].iloc[rows].to_numpy(dtype=object, na_value=None)
+    if betrag is None:
+        betrag = pd.to_numeric(df[saldo_col].iloc[rows], errors="coerce")
+    else:
+        betrag = betrag.iloc[rows]
+    betrag = betrag.to_numpy(dtype="float64", na_value=np.nan)
+    auswahl = (kategorie == umsatzkennzeichen) & (np.abs(betrag) > materiality)
+    rows, betrag = rows[auswahl], betrag[auswahl]
+    if len(rows) == 0:
+        positionen = rows
+    else:
+        selection = mus_sampling_with_given_sample_size(
+            pd.Series(betrag), sample_size=sample_size, mode="select", seed=seed
+        )
+        positionen = selection.positions
+    sample = df.iloc[rows[positionen]].copy()
+    sample[saldo_col] = betrag[positionen]
+    if date_col is not None:
+        datum = pd.to_datetime(sample.pop(date_col), errors="coerce")
+        sample[date_col] = datum
+    return sample
@@ -0,0 +1,67 @@
+import hashlib
+import pandas as pd
+from pathlib import Path
+from typing import Any, Callable, Optional, Union
+
+__all__ = ["hash_dataframe", "hash_file", "hash_parts", "is_cached", "load_or_compute"]
+
+
+def hash_dataframe(df: pd.DataFrame) -> str:
+    """Inhaltshash eines DataFrames (Werte, Index, Spaltennamen und Datentypen)."""
+    h = hashlib.sha256()
+    h.update(repr(list(df.columns)).encode())
+    h.update(repr([str(dtype) for dtype in df.dtypes]).encode())
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def hash_file(path: Union[str, Path]) -> str:
+    """Inhaltshash einer Datei (z.B. eines Journalexports)."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(2**20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def hash_parts(*parts: Any) -> str:
+    """Kombiniert Hashes und Parameter zu einem Schlüssel für die Zwischenergebnisse."""
+    return hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+
+
+def _intermediate_path(cache_dir: Union[str, Path], name: str, key: str) -> Path:
+    return Path(cache_dir) / f"{name}_{key}.pkl"
+
+
+def is_cached(cache_dir: Optional[Union[str, Path]], name: str, key: str) -> bool:
+    """Liegt das Zwischenergebnis ``name`` zum Schlüssel ``key`` in ``cache_dir`` vor?"""
+    return cache_dir is not None and _intermediate_path(cache_dir, name, key).exists()
+
+
+def load_or_compute(
+    cache_dir: Optional[Union[str, Path]],
+    name: str,
+    key: str,
+    compute: Callable[[], Any],
+    refresh: bool = False,
+) -> Any:
+    """
+    Lädt das Zwischenergebnis ``name`` zum Schlüssel ``key`` aus ``cache_dir``
+    oder berechnet es mit ``compute`` und legt es dort ab.
+
+    Ohne ``cache_dir`` wird immer neu berechnet. Mit ``refresh`` wird neu
+    berechnet und ein vorhandenes Zwischenergebnis überschrieben.
+    """
+    if cache_dir is None:
+        return compute()
+
+    path = _intermediate_path(cache_dir, name, key)
+    if path.exists() and not refresh:
+        return pd.read_pickle(path)
+
+    result = compute()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    pd.to_pickle(result, tmp)
+    tmp.replace(path)  # erst nach vollständigem Schreiben sichtbar
+    return result
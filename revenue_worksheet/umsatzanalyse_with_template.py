@@ -76,8 +76,14 @@ def create_arbeitspapier_from_template_with_sections(
         output_path: Union[str, Path] = "arbeitspapier.xlsx",
         mus_sample: Union[pd.Series, pd.DataFrame] = None,
         cut_off_sample: Union[pd.Series, pd.DataFrame] = None,
+        jet_hits: pd.DataFrame = None,
+        betragsanalyse: dict = None,
     ) -> None:
-    """create_arbeitspapier_from_template_with_sections"""
+    """create_arbeitspapier_from_template_with_sections
+
+    Mit ``jet_hits`` (Trefferliste der Journal Entry Tests) wird zusätzlich das
+    Tabellenblatt "JET" angelegt, mit ``betragsanalyse`` (Ergebnis von
+    ``get_amount_distribution``) das Tabellenblatt "Betragsanalyse"."""
 
     template_path = Path(template_path)
     output_path = Path(output_path)
@@ -111,12 +117,22 @@ def create_arbeitspapier_from_template_with_sections(
 
     _add_sample_on_new_sheet(ws=wb.worksheets[3], sample=cut_off_sample)
 
+    if jet_hits is not None:
+        _add_sample_on_new_sheet(ws=wb.create_sheet("JET"), sample=jet_hits, start_row=1)
+
+    if betragsanalyse is not None:
+        ws_betrag = wb.create_sheet("Betragsanalyse")
+        start_row = 1
+        for key in ["konformitaet", "duplikate", "ziffern"]:
+            _add_sample_on_new_sheet(ws=ws_betrag, sample=betragsanalyse[key], start_row=start_row)
+            start_row += len(betragsanalyse[key]) + 3
+
     wb.save(output_path)
 
 
-def _add_sample_on_new_sheet(ws, sample: Union[pd.DataFrame, pd.Series]):
+def _add_sample_on_new_sheet(ws, sample: Union[pd.DataFrame, pd.Series], start_row: int = 18):
     """
-    Fügt das gegebene Sample (Series oder DataFrame) ab Zelle A18 in das zweite Worksheet ein.
+    Fügt das gegebene Sample (Series oder DataFrame) ab Zelle A``start_row`` (Standard A18) in das Worksheet ein.
 
     Parameters
     ----------
@@ -124,6 +140,8 @@ def _add_sample_on_new_sheet(ws, sample: Union[pd.DataFrame, pd.Series]):
         Ein beliebiges Tabellenblatt aus der Arbeitsmappe.
     sample : pd.Series oder pd.DataFrame
         Die zu schreibende Stichprobe.
+    start_row : int
+        Zeile der Überschrift.
     """
     target_ws = ws
 
@@ -136,12 +154,12 @@ def _add_sample_on_new_sheet(ws, sample: Union[pd.DataFrame, pd.Series]):
     else:
         raise TypeError("Sample muss eine pandas Series oder DataFrame sein.")
 
-    start_row = 18 # ab Zeile 18, Spalte A
     for r_idx, row in enumerate(
         dataframe_to_rows(df, index=df is sample, header=True), start=start_row
     ):
         for c_idx, value in enumerate(row, start=1):
-            target_ws.cell(row=r_idx, column=c_idx, value=value)
+            # fehlende Werte (z.B. Gegenkonto von Sammelbuchungen) als leere Zelle
+            target_ws.cell(row=r_idx, column=c_idx, value=None if value is pd.NA else value)
 
     from openpyxl.styles import Font
     hdr_font = Font(bold=True)